@@ -3,17 +3,19 @@
 使用 SenseVoice-Small 模型分析语音情感
 """
 
-import io
 import re
 import os
-import io
 import torch
-import torchaudio
 import numpy as np
-from typing import Dict, Tuple, List, Any
+from typing import Dict, Tuple, List, Any, BinaryIO, Optional, Union
 from funasr import AutoModel
 import logging
-import torch.nn.functional as F
+from preprocess import default_preprocessor
+from sensevoice_tags import summarize_text
+from backends import (
+    CAMPP_BACKENDS, SENSEVOICE_BACKENDS, OnnxSenseVoice, TorchSenseVoice,
+    backend_from_env, funasr_inference, model_lock, quantize_int8, set_funasr_threads
+)
 try:
     import jieba
     import jieba.analyse
@@ -26,90 +28,121 @@ logger = logging.getLogger(__name__)
 class SpeakerVerifier:
     """声纹识别器"""
     
-    def __init__(self, model_path="damo/speech_campplus_sv_zh-cn_16k-common"):
-        """初始化声纹模型"""
-        logger.info(f"Loading Speaker Verification model from: {model_path}")
+    def __init__(self, model_path="damo/speech_campplus_sv_zh-cn_16k-common", backend=None):
+        """
+        初始化声纹模型
+        
+        参数:
+            model_path: 模型路径或 ModelScope 模型 id
+            backend: torch | int8（默认读取 CAMPP_BACKEND）
+        """
+        self.backend_name = backend or backend_from_env("CAMPP_BACKEND", CAMPP_BACKENDS)
+        logger.info(f"Loading Speaker Verification model from: {model_path} (backend={self.backend_name})")
         self.model = AutoModel(
             model=model_path,
             trust_remote_code=True,
             disable_update=True
         )
+        if self.backend_name == "int8":
+            quantize_int8(self.model)
         logger.info("Speaker Verification model loaded successfully")
 
-    def get_embedding(self, audio_bytes: bytes) -> np.ndarray:
-        """从音频中提取声纹特征向量"""
-        # 预处理音频 (借用 EmotionAnalyzer 的逻辑)
-        analyzer_temp = EmotionAnalyzer(load_model=False)
-        audio_array, _ = analyzer_temp._preprocess_audio(audio_bytes)
-        
+    def set_torch_threads(self, threads: int) -> None:
+        """限制推理使用的 torch 线程数(由推理工作池调用)"""
+        set_funasr_threads(self.model, threads)
+
+    def get_embedding(self, audio: Union[bytes, BinaryIO]) -> np.ndarray:
+        """从音频(字节或文件对象)中提取声纹特征向量"""
+        # 预处理音频 (与 EmotionAnalyzer 共用预处理器)
+        audio_array, _ = default_preprocessor.decode(audio)
+        return self.embed_waveform(audio_array)
+    
+    def embed_waveform(self, audio_array: np.ndarray) -> np.ndarray:
+        """从已解码的 16kHz 单声道波形中提取声纹特征向量 (一维 float32)"""
         # 运行推理
-        result = self.model.generate(input=audio_array)
+        result = funasr_inference(self.model, audio_array)
         
-        # 返回 Embedding (通常是一个 1D-vector)
-        # 结果结构取决于具体模型，campp 通常在 'spk_embedding' 字段
+        # 结果结构取决于具体模型，campp 在 'spk_embedding' 字段返回 (1, D) 张量
         if isinstance(result, list) and len(result) > 0:
-            return result[0]["spk_embedding"]
+            embedding = result[0]["spk_embedding"]
+            if torch.is_tensor(embedding):
+                embedding = embedding.detach().cpu().numpy()
+            return np.asarray(embedding, dtype=np.float32).reshape(-1)
         return None
 
     @staticmethod
-    def calculate_similarity(emb1: Any, emb2: Any) -> float:
+    def as_matrix(embeddings: Any) -> np.ndarray:
+        """
+        把单个声纹或一组声纹转为 (N, D) 的 L2 归一化 float32 矩阵
+        
+        参数:
+            embeddings: (D,) 向量、(N, D) 矩阵，或对应的嵌套列表
+        """
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix[np.newaxis, :]
+        if matrix.ndim != 2 or matrix.shape[1] == 0:
+            raise ValueError(f"Expected (D,) or (N, D) embeddings, got shape {matrix.shape}")
+        
+        # 与 F.cosine_similarity 相同的 eps，零向量的相似度为 0
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-8)
+
+    @classmethod
+    def similarity_matrix(cls, emb1: Any, emb2: Any) -> np.ndarray:
+        """
+        计算两组声纹之间的余弦相似度矩阵（一次归一化矩阵乘法）
+        
+        参数:
+            emb1: (D,) 或 (N, D)
+            emb2: (D,) 或 (M, D)
+        
+        返回:
+            (N, M) 相似度矩阵
+        """
+        a = cls.as_matrix(emb1)
+        b = cls.as_matrix(emb2)
+        if a.shape[1] != b.shape[1]:
+            raise ValueError(f"Embedding dimensions differ: {a.shape[1]} vs {b.shape[1]}")
+        return a @ b.T
+
+    @classmethod
+    def calculate_similarity(cls, emb1: Any, emb2: Any) -> float:
         """计算两个声纹向量的余弦相似度"""
         if emb1 is None or emb2 is None:
             return 0.0
-            
-        # Ensure inputs are numpy arrays
-        if isinstance(emb1, list):
-            emb1 = np.array(emb1)
-        if isinstance(emb2, list):
-            emb2 = np.array(emb2)
-            
-        if not isinstance(emb1, np.ndarray) or not isinstance(emb2, np.ndarray):
-            print(f"DEBUG: Invalid types for similarity: {type(emb1)} {type(emb2)}")
+        
+        if not isinstance(emb1, (list, np.ndarray)) or not isinstance(emb2, (list, np.ndarray)):
+            logger.warning(f"Invalid types for similarity: {type(emb1)} {type(emb2)}")
             return 0.0
-
-        # Flatten to ensure (D,) shape instead of (1, D)
-        emb1 = emb1.flatten()
-        emb2 = emb2.flatten()
-
-        t1 = torch.from_numpy(emb1).float()
-        t2 = torch.from_numpy(emb2).float()
         
-        # Cosine Similarity
-        similarity = F.cosine_similarity(t1.unsqueeze(0), t2.unsqueeze(0))
-        return float(similarity.item())
+        # 展平以兼容 (1, D) 形状
+        emb1 = np.asarray(emb1, dtype=np.float32).reshape(-1)
+        emb2 = np.asarray(emb2, dtype=np.float32).reshape(-1)
+        return float(cls.similarity_matrix(emb1, emb2)[0, 0])
 
 
 class EmotionAnalyzer:
     """语音情感分析器"""
     
-    # 情感标签映射
-    EMO_DICT = {
-        "<|HAPPY|>": "HAPPY",
-        "<|SAD|>": "SAD",
-        "<|ANGRY|>": "ANGRY",
-        "<|NEUTRAL|>": "NEUTRAL",
-        "<|FEARFUL|>": "FEARFUL",
-        "<|DISGUSTED|>": "DISGUSTED",
-        "<|SURPRISED|>": "SURPRISED",
-    }
-    
-    # 音频事件映射
-    EVENT_DICT = {
-        "<|BGM|>": "music",
-        "<|Speech|>": "speech",
-        "<|Applause|>": "applause",
-        "<|Laughter|>": "laughter",
-        "<|Cry|>": "cry",
-        "<|Sneeze|>": "sneeze",
-        "<|Cough|>": "cough",
-    }
+    # 长音频切分使用的 VAD 模型
+    VAD_MODEL = "iic/speech_fsmn_vad_zh-cn-16k-common-pytorch"
+    VAD_KWARGS = {"max_single_segment_time": 30000}
     
-    def __init__(self, model_path="iic/SenseVoiceSmall", load_model=True):
-        """初始化 SenseVoice 模型"""
+    def __init__(self, model_path="iic/SenseVoiceSmall", load_model=True, backend=None):
+        """
+        初始化 SenseVoice 模型
+        
+        参数:
+            model_path: 模型路径或 ModelScope 模型 id
+            load_model: 为 False 时只构造对象(用于测试结果解析)
+            backend: torch | int8 | onnx(默认读取 SENSEVOICE_BACKEND)
+        """
         if not load_model:
             return
-            
-        logger.info(f"Loading SenseVoice model from: {model_path}")
+        
+        self.backend_name = backend or backend_from_env("SENSEVOICE_BACKEND", SENSEVOICE_BACKENDS)
+        logger.info(f"Loading SenseVoice model from: {model_path} (backend={self.backend_name})")
         print(f"DEBUG: Starting SenseVoice model load from {model_path}...")
         
         try:
@@ -120,16 +153,34 @@ class EmotionAnalyzer:
         except ImportError:
             pass
 
-        self.model = AutoModel(
-            model=model_path,
-            vad_model="iic/speech_fsmn_vad_zh-cn-16k-common-pytorch",
-            vad_kwargs={"max_single_segment_time": 30000},
-            trust_remote_code=True,
-        )
+        if self.backend_name == "onnx":
+            # ONNX 模型不含 VAD,长音频由单独加载的 FSMN VAD 切分
+            self.model = None
+            self.vad_model = AutoModel(model=self.VAD_MODEL, disable_update=True, **self.VAD_KWARGS)
+            self.backend = OnnxSenseVoice.from_env(model_path)
+        else:
+            self.model = AutoModel(
+                model=model_path,
+                vad_model=self.VAD_MODEL,
+                vad_kwargs=self.VAD_KWARGS,
+                trust_remote_code=True,
+            )
+            if self.backend_name == "int8":
+                quantize_int8(self.model)
+            self.backend = TorchSenseVoice(self.model)
         
         logger.info("SenseVoice model loaded successfully")
         print("DEBUG: SenseVoice model loaded successfully!")
     
+    def set_torch_threads(self, threads: int) -> None:
+        """限制推理使用的 torch 线程数(由推理工作池调用)"""
+        for model in (getattr(self, "model", None), getattr(self, "vad_model", None)):
+            if model is not None:
+                set_funasr_threads(model, threads)
+    
+    # 不超过该时长的片段可以跳过 VAD，直接与其他请求拼成一个批次推理
+    MAX_BATCH_CLIP_S = 30
+    
     def analyze(self, audio_bytes: bytes) -> Dict:
         """
         分析音频情感
@@ -142,6 +193,7 @@ class EmotionAnalyzer:
                 "emotion": "HAPPY",
                 "intensity": 0.85,
                 "confidence": 0.92,
+                "emotion_distribution": {"HAPPY": 1.0},
                 "keywords": ["活动", "很棒"],
                 "events": ["applause"],
                 "raw_text": "这次活动很棒！",
@@ -149,136 +201,129 @@ class EmotionAnalyzer:
             }
         """
         # 预处理音频
-        audio_array, sample_rate = self._preprocess_audio(audio_bytes)
-        
-        # 运行 SenseVoice 推理
-        result = self.model.generate(
-            input=audio_array,
-            cache={},
-            language="auto",
-            use_itn=True,
-            batch_size_s=60,
-            merge_vad=True
-        )
-        
-        # 解析结果
-        raw_text = result[0]["text"]
-        
-        emotion, intensity = self._extract_emotion(raw_text)
-        events = self._extract_events(raw_text)
-        language = self._extract_language(raw_text)
-        clean_text = self._clean_text(raw_text)
-        keywords = self._extract_keywords(clean_text)
-        
-        return {
-            "emotion": emotion,
-            "intensity": intensity,
-            "confidence": intensity,  # SenseVoice 的强度可作为置信度
-            "keywords": keywords,
-            "events": events,
-            "raw_text": clean_text,
-            "language": language,
-            "full_result": raw_text  # 保留原始结果用于调试
-        }
+        audio_array = self.preprocess(audio_bytes)
+        return self.analyze_batch([audio_array])[0]
     
-    def _preprocess_audio(self, audio_bytes: bytes) -> Tuple[np.ndarray, int]:
-        """预处理音频数据"""
-        # 从字节加载音频
-        audio_buffer = io.BytesIO(audio_bytes)
-        
-        try:
-            # 尝试加载音频
-            waveform, sample_rate = torchaudio.load(audio_buffer)
-        except Exception as e:
-            # 如果失败，尝试作为原始 PCM 数据
-            audio_array = np.frombuffer(audio_bytes, dtype=np.int16)
-            audio_array = audio_array.astype(np.float32) / 32768.0
-            sample_rate = 16000
-            
-            return audio_array, sample_rate
-        
-        # 转换为 numpy
-        audio_array = waveform.numpy()
-        
-        # 转为单声道
-        if len(audio_array.shape) > 1 and audio_array.shape[0] > 1:
-            audio_array = audio_array.mean(axis=0)
-        else:
-            audio_array = audio_array.squeeze()
+    def preprocess(self, audio: Union[bytes, BinaryIO]) -> np.ndarray:
+        """解码(字节或文件对象)并转换为 16kHz 单声道 float32 波形"""
+        audio_array, _ = self._preprocess_audio(audio)
+        return audio_array
+    
+    def analyze_batch(self, audio_arrays: List[np.ndarray]) -> List[Dict]:
+        """
+        批量分析多段已预处理的音频（16kHz 单声道）
         
-        # 重采样到 16kHz
-        if sample_rate != 16000:
-            resampler = torchaudio.transforms.Resample(sample_rate, 16000)
-            audio_tensor = torch.from_numpy(audio_array).float()
-            if len(audio_tensor.shape) == 1:
-                audio_tensor = audio_tensor.unsqueeze(0)
-            audio_array = resampler(audio_tensor).squeeze().numpy()
-            sample_rate = 16000
+        短片段（<= MAX_BATCH_CLIP_S）跳过 VAD，合并为一次 SenseVoice 批量推理；
+        长片段仍走 VAD 切分后逐条推理。
         
-        return audio_array, sample_rate
-    
-    def _extract_emotion(self, text: str) -> Tuple[str, float]:
-        """提取情感标签和强度"""
-        emotion_counts = {}
+        参数:
+            audio_arrays: 波形列表
         
-        for tag, emotion in self.EMO_DICT.items():
-            count = text.count(tag)
-            if count > 0:
-                emotion_counts[emotion] = count
+        返回:
+            与输入一一对应的分析结果列表（格式同 analyze）
+        """
+        raw_texts: List[str] = [""] * len(audio_arrays)
+        max_samples = self.MAX_BATCH_CLIP_S * 16000
         
-        if not emotion_counts:
-            return "NEUTRAL", 0.5
+        short_idx = [i for i, a in enumerate(audio_arrays) if len(a) <= max_samples]
+        long_idx = [i for i, a in enumerate(audio_arrays) if len(a) > max_samples]
         
-        # 找出出现最多的情感
-        dominant_emotion = max(emotion_counts, key=emotion_counts.get)
-        count = emotion_counts[dominant_emotion]
+        # 短片段: 一次批量推理（不经过 VAD）
+        if short_idx:
+            texts = self.backend.transcribe([audio_arrays[i] for i in short_idx])
+            for i, text in zip(short_idx, texts):
+                raw_texts[i] = text
         
-        # 计算强度（出现次数越多，强度越高）
-        # 让起始分值更加动态，而不是固定的 0.7
-        base_intensity = 0.65
-        intensity = min(base_intensity + (count - 1) * 0.15, 0.98)
+        # 长片段: VAD 切分 + 按时长分批
+        for i in long_idx:
+            if self.model is None:
+                raw_texts[i] = self._transcribe_with_vad(audio_arrays[i])
+                continue
+            with model_lock(self.model):
+                result = self.model.generate(
+                    input=audio_arrays[i],
+                    cache={},
+                    language="auto",
+                    use_itn=True,
+                    batch_size_s=60,
+                    merge_vad=True
+                )
+            raw_texts[i] = result[0]["text"]
         
-        # 针对 NEUTRAL 特殊处理，降低其置信度，鼓励系统识别更强烈的情绪
-        if dominant_emotion == "NEUTRAL":
-            intensity = min(intensity, 0.6)
-            
-        return dominant_emotion, intensity
+        return [self._build_result(raw_text) for raw_text in raw_texts]
     
-    def _extract_events(self, text: str) -> List[str]:
-        """提取音频事件"""
-        events = []
+    def detect_segments(self, audio_array: np.ndarray) -> List[Tuple[int, int]]:
+        """
+        用 FSMN VAD 检测语音片段
         
-        for tag, event in self.EVENT_DICT.items():
-            if tag in text and event not in ['speech', 'breath']:
-                events.append(event)
+        参数:
+            audio_array: 16kHz 单声道波形
         
-        return events
+        返回:
+            [(起始毫秒, 结束毫秒), ...],单段不超过 VAD_KWARGS 的 max_single_segment_time
+        """
+        if self.model is None:
+            result = funasr_inference(self.vad_model, audio_array)
+        else:
+            # 直接调用 AutoModel 内部的 VAD 模型,不做转写
+            result = funasr_inference(
+                self.model, audio_array, model=self.model.vad_model, config="vad_kwargs"
+            )
+        return [(int(beg), int(end)) for beg, end in result[0]["value"] if end > beg]
     
-    def _extract_language(self, text: str) -> str:
-        """提取检测到的语言"""
-        lang_tags = {
-            "<|zh|>": "zh",
-            "<|en|>": "en",
-            "<|yue|>": "yue",
-            "<|ja|>": "ja",
-            "<|ko|>": "ko",
-        }
+    def transcribe_segments(self, clips: List[np.ndarray]) -> List[str]:
+        """
+        批量转写已切分的语音片段(不经过 VAD,不解析结果)
         
-        for tag, lang in lang_tags.items():
-            if tag in text:
-                return lang
+        返回:
+            与输入一一对应的带标签原始文本
+        """
+        if not clips:
+            return []
+        return self.backend.transcribe(clips)
+    
+    def _transcribe_with_vad(self, audio_array: np.ndarray) -> str:
+        """用独立的 VAD 模型切分长音频,逐段转写后拼接(ONNX 后端使用)"""
+        clips = [audio_array[beg * 16:end * 16] for beg, end in self.detect_segments(audio_array)]
+        return "".join(self.transcribe_segments(clips))
+    
+    def summarize_segments(self, raw_texts: List[str], with_keywords: bool = True,
+                           durations_ms: Optional[List[float]] = None) -> Dict:
+        """
+        把逐段转写的原始输出合并为整段结果(解析方式与整段推理相同)
         
-        return "unknown"
+        参数:
+            raw_texts: 各片段带标签的原始文本(analyze_batch 结果中的 full_result)
+            with_keywords: 为 False 时跳过关键词提取
+            durations_ms: 各片段的时长,情感分布按时长加权(省略时每个片段计 1)
+        """
+        return self._build_result("".join(raw_texts), summarize_text(raw_texts, durations_ms), with_keywords)
     
-    def _clean_text(self, text: str) -> str:
-        """清理文本，移除所有标签"""
-        # 移除所有 <|xxx|> 格式的标签
-        cleaned = re.sub(r'<\|[^>]+\|>', '', text)
+    def _build_result(self, raw_text: str, summary: Optional[Dict] = None, with_keywords: bool = True) -> Dict:
+        """
+        把 SenseVoice 的原始输出解析为结构化结果
         
-        # 移除多余空格
-        cleaned = ' '.join(cleaned.split())
+        情感、强度、语言、事件与文本都由一次切分得到的片段推导(见 sensevoice_tags)
+        """
+        if summary is None:
+            summary = summarize_text([raw_text])
+        clean_text = summary["text"]
         
-        return cleaned.strip()
+        return {
+            "emotion": summary["emotion"],
+            "intensity": summary["intensity"],
+            "confidence": summary["intensity"],  # SenseVoice 的强度可作为置信度
+            "emotion_distribution": summary["emotion_distribution"],
+            "keywords": self._extract_keywords(clean_text) if with_keywords else [],
+            "events": summary["events"],
+            "raw_text": clean_text,
+            "language": summary["language"],
+            "full_result": raw_text  # 保留原始结果用于调试
+        }
+    
+    def _preprocess_audio(self, audio: Union[bytes, BinaryIO]) -> Tuple[np.ndarray, int]:
+        """预处理音频数据(解码 + 单声道 + 16kHz,重采样核按采样率缓存)"""
+        return default_preprocessor.decode(audio)
     
     def _extract_keywords(self, text: str, max_keywords: int = 4) -> List[str]:
         """使用 jieba 进行关键词提取，如果不可用则退回到词频"""
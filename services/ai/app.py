@@ -3,34 +3,51 @@
 接收语音 -> AI情感分析 -> BLS签名 -> 返回结果
 """
 
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import uvicorn
 import hashlib
+import json
 import time
 import secrets
 import logging
+import math
 import os
 from dotenv import load_dotenv
 from typing import Dict, Any, Optional
 import numpy as np
 
 # 导入自定义模块(优雅降级)
+# analyzer / preprocess 依赖 torch 与 funasr,导入较慢,改为在后台启动任务中导入
 try:
-    from analyzer import EmotionAnalyzer, SpeakerVerifier
-    ANALYZER_AVAILABLE = True
-except Exception as e:
-    ANALYZER_AVAILABLE = False
-    print(f"⚠️  Warning: AI components not available: {e}")
-
-try:
-    from bls_signer import BLSSigner, construct_message
+    from bls_signer import (
+        BLSSigner, SignedMessage, SigningService, ThresholdSigningService,
+        construct_message, construct_root_message
+    )
+    from verification import SignatureVerifier
+    from attestation import MerkleAttestor
+    from merkle import verify_proof
     SIGNER_AVAILABLE = True
 except Exception as e:
     SIGNER_AVAILABLE = False
     print(f"⚠️  Warning: BLSSigner not available: {e}")
 
+import inference_pool as pool_registry
+from inference_pool import InferencePool
+from batcher import MicroBatcher
+from result_cache import AnalysisCache
+from audio_format import UnsupportedAudio, probe
+from audio_io import (
+    MAX_AUDIO_DURATION_S, MAX_STREAM_DURATION_S, UploadedAudio, UploadSizeLimit, read_upload, check_duration
+)
+from voiceprint_index import VoiceprintIndex
+from embedding_codec import ENCODINGS, decode_embedding, encode_embedding
+from startup import StartupReport
+from sensevoice_tags import TagTally, parse_tags
+from streaming import SAMPLES_PER_MS, iter_segments, sse_event
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -41,6 +58,20 @@ logger = logging.getLogger(__name__)
 # 加载环境变量
 load_dotenv()
 
+# 算法版本(参与签名消息与结果缓存键)与模型版本(参与结果缓存键)
+# v1.1: ≤30 秒的片段跳过 VAD 直接批量推理,输出与 v1.0 可能不同,旧缓存条目不再命中
+ALGO_VERSION = "SenseVoice-v1.1"
+MODEL_VERSION = "SenseVoice-Small"
+
+# 长音频(超过 MAX_BATCH_CLIP_S)按 VAD 片段分发到多个工作池 worker 并行转写(工作池只有 1 个 worker 时不生效)
+# 1 = 开启 / 0 = 关闭 / 留空 = 仅 process 模式开启:thread 模式下各片段的推理共享进程内的 torch 线程,
+# 前后处理还要争用 GIL,切分并行的收益未经验证(可用 python benchmark.py long-audio --executors process,thread 对比)
+_long_audio_parallel = os.getenv("LONG_AUDIO_PARALLEL", "").strip()
+LONG_AUDIO_PARALLEL: Optional[bool] = None if not _long_audio_parallel else _long_audio_parallel != "0"
+
+# 声纹判定为同一人的余弦相似度阈值(从 0.85 降低到 0.60,更符合实际场景)
+VOICEPRINT_MATCH_THRESHOLD = float(os.getenv("VOICEPRINT_MATCH_THRESHOLD", "0.60"))
+
 # 创建 FastAPI 应用
 app = FastAPI(
     title="EchoRank AI Backend",
@@ -57,11 +88,29 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 上传大小在解析 multipart 表单之前检查(见 audio_io.UploadSizeLimit)
+app.add_middleware(UploadSizeLimit)
+
 # 全局变量:存储初始化的组件
 emotion_analyzer = None
 speaker_verifier = None
 bls_signer = None
+signing_service = None
+signature_verifier = None
+merkle_attestor = None
 bot_public_key = None
+inference_pool: Optional[InferencePool] = None
+emotion_batcher: Optional[MicroBatcher] = None
+# 量化/导出后端的输出可能与原模型不同,后端参与缓存键
+analysis_cache = AnalysisCache.from_env(
+    f"{MODEL_VERSION}/{os.getenv('SENSEVOICE_BACKEND', 'torch').lower()}@{ALGO_VERSION}"
+)
+waveform_cache = None
+silence_gate = None
+voiceprint_index = VoiceprintIndex.from_env()
+startup_report = StartupReport()
+_startup_task: Optional[asyncio.Task] = None
+_models_preloaded = False
 
 
 @app.get("/status")
@@ -69,64 +118,245 @@ async def status():
     return {"service": "EchoRank AI Backend", "ok": True}
 
 
+def _load_validator_keys() -> list:
+    """读取 .env 中连续编号的 VALIDATOR_{i}_SK,返回十六进制私钥列表"""
+    keys = []
+    index = 1
+    while os.getenv(f"VALIDATOR_{index}_SK"):
+        keys.append(hex(int(os.getenv(f"VALIDATOR_{index}_SK"))))
+        index += 1
+    return keys
+
+
 @app.on_event("startup")
 async def startup_event():
-    """服务启动时初始化组件"""
-    global emotion_analyzer, speaker_verifier, bls_signer, bot_public_key
+    """服务启动时立即开始监听;模型在后台加载,完成前 /health/ready 返回 503"""
+    global _startup_task
     
     logger.info("="*60)
     logger.info("Starting EchoRank AI Backend Service...")
     logger.info("="*60)
     
-    # 1. 初始化情感分析器与声纹识别器
-    if ANALYZER_AVAILABLE:
-        try:
-            logger.info("Loading SenseVoice emotion analyzer...")
-            emotion_analyzer = EmotionAnalyzer()
-            logger.info("✅ Emotion analyzer loaded successfully")
-            
-            logger.info("Loading Speaker Verification model (CAM++)...")
-            speaker_verifier = SpeakerVerifier()
-            logger.info("✅ Speaker verifier loaded successfully")
-            
-        except Exception as e:
-            logger.error(f"❌ Failed to load AI models: {e}")
-            logger.warning("⚠️  Service will run in LIMITED mode (no AI analysis)")
+    _startup_task = asyncio.create_task(_initialize())
+
+
+def _import_analyzer():
+    """导入 analyzer 与 preprocess(torch / funasr)"""
+    import analyzer
+    import preprocess
+    return analyzer, preprocess
+
+
+def _warm_up_emotion_analyzer() -> None:
+    """用 1 秒低幅噪声跑一次推理,触发权重页载入与算子初始化"""
+    audio = (np.random.default_rng(0).standard_normal(16000) * 0.01).astype(np.float32)
+    emotion_analyzer.analyze_batch([audio])
+
+
+def _warm_up_speaker_verifier() -> None:
+    audio = (np.random.default_rng(1).standard_normal(16000) * 0.01).astype(np.float32)
+    speaker_verifier.embed_waveform(audio)
+
+
+def _init_signer() -> None:
+    """初始化 BLS 签名器与签名服务(签名进程在首次签名时才 fork)"""
+    global bls_signer, signing_service, bot_public_key
+    
+    # 从环境变量读取私钥(使用第一个验证者的密钥)
+    validator_sk = os.getenv("VALIDATOR_1_SK")
+    if not validator_sk:
+        raise ValueError("VALIDATOR_1_SK not found in .env file")
+    
+    # 转换为十六进制格式
+    sk_hex = hex(int(validator_sk))
+    signer = BLSSigner(sk_hex)
+    
+    # 预先验证并缓存已知验证者公钥及其聚合公钥
+    validator_keys = _load_validator_keys()
+    validator_pks = [BLSSigner(sk).pk for sk in validator_keys]
+    BLSSigner.register_validator_set(validator_pks)
+    logger.info(f"   Cached {len(validator_pks)} validator public keys")
+    
+    if os.getenv("SIGNING_MODE", "single").lower() == "dvt":
+        # DVT 门限签名: 每个验证者一个独立签名进程,达到门限即聚合返回
+        threshold = os.getenv("DVT_THRESHOLD")
+        service = ThresholdSigningService(
+            validator_keys, threshold=int(threshold) if threshold else None
+        )
+        logger.info(f"✅ DVT signing enabled ({service.threshold}-of-{len(service.validators)})")
     else:
+        # 多进程签名服务(每个子进程加载一次私钥)
+        sign_workers = os.getenv("BLS_SIGN_WORKERS")
+        service = SigningService(sk_hex, max_workers=int(sign_workers) if sign_workers else None)
+        logger.info(f"✅ BLS signer initialized ({service.max_workers} signing processes)")
+    
+    bls_signer = signer
+    signing_service = service
+    # 获取公钥(DVT 模式下为完整验证者集合的聚合公钥)
+    bot_public_key = bytes(signing_service.pk).hex()
+    logger.info(f"   Public Key: {bot_public_key[:32]}...")
+
+
+def _start_inference_pool() -> InferencePool:
+    """注册已加载的组件并启动推理工作池"""
+    for name, component in (
+        ("emotion_analyzer", emotion_analyzer),
+        ("speaker_verifier", speaker_verifier),
+        ("bls_signer", bls_signer),
+    ):
+        if component is not None:
+            pool_registry.register(name, component)
+    
+    pool = InferencePool.from_env()
+    pool.start()
+    logger.info(f"✅ Inference pool ready ({pool.mode} x {pool.max_workers})")
+    return pool
+
+
+async def _load_models() -> None:
+    """
+    导入并加载模型,然后预热
+    
+    单进程模式下在后台启动任务中执行;pre-fork 模式下由 master 执行一次,
+    worker 通过 fork 继承已加载的模型(见 prefork.py)
+    """
+    global emotion_analyzer, speaker_verifier, waveform_cache, silence_gate
+    
+    # 1. 导入模型依赖
+    modules = await startup_report.run("import:analyzer", _import_analyzer)
+    if not modules:
         logger.warning("⚠️  Analyzer module not available - running in LIMITED mode")
+        return
     
-    # 2. 初始化 BLS 签名器
-    if SIGNER_AVAILABLE:
-        try:
-            logger.info("Initializing BLS signer...")
-            
-            # 从环境变量读取私钥(使用第一个验证者的密钥)
-            validator_sk = os.getenv("VALIDATOR_1_SK")
-            if not validator_sk:
-                raise ValueError("VALIDATOR_1_SK not found in .env file")
-            
-            # 转换为十六进制格式
-            sk_hex = hex(int(validator_sk))
-            bls_signer = BLSSigner(sk_hex)
-            
-            # 获取公钥
-            bot_public_key = bls_signer.pk.hex()
-            logger.info(f"✅ BLS signer initialized")
-            logger.info(f"   Public Key: {bot_public_key[:32]}...")
-            
-        except Exception as e:
-            logger.error(f"❌ Failed to initialize BLS signer: {e}")
+    # 2. 并行加载两个模型(torch 加载权重时会释放 GIL)
+    analyzer_module, preprocess_module = modules
+    waveform_cache = preprocess_module.WaveformCache.from_env()
+    silence_gate = preprocess_module.SilenceGate.from_env()
+    emotion_analyzer, speaker_verifier = await asyncio.gather(
+        startup_report.run("load:sensevoice+vad", analyzer_module.EmotionAnalyzer),
+        startup_report.run("load:campplus", analyzer_module.SpeakerVerifier),
+    )
+    
+    # 3. 预热推理(首个真实请求不再承担懒初始化的开销)
+    if os.getenv("STARTUP_WARMUP", "1") != "0":
+        warmups = []
+        if emotion_analyzer is not None:
+            warmups.append(startup_report.run("warmup:sensevoice", _warm_up_emotion_analyzer))
+        if speaker_verifier is not None:
+            warmups.append(startup_report.run("warmup:campplus", _warm_up_speaker_verifier))
+        await asyncio.gather(*warmups)
+
+
+def preload_models() -> None:
+    """pre-fork 模式: 在 master 进程中同步加载模型,之后 fork 出的 worker 不再重复加载"""
+    global _models_preloaded
+    asyncio.run(_load_models())
+    _models_preloaded = True
+
+
+async def _initialize():
+    """
+    后台启动任务
+    
+    1. 加载模型(导入、并行加载 SenseVoice(+VAD) 与 CAM++、预热),同时初始化 BLS 签名器;
+       pre-fork worker 跳过模型加载
+    2. 模型全部就绪后再启动工作池(process 模式 fork 出的子进程继承已加载的模型)
+    """
+    global inference_pool, emotion_batcher, signature_verifier, merkle_attestor
+    
+    try:
+        # 1. 模型加载与签名器初始化并行(签名进程在首次签名时才 fork)
+        tasks = [] if _models_preloaded else [_load_models()]
+        if SIGNER_AVAILABLE:
+            tasks.append(startup_report.run("init:bls_signer", _init_signer))
+        else:
+            startup_report.skip("init:bls_signer", "bls_signer module not available")
+            logger.warning("⚠️  BLS signer module not available")
+        await asyncio.gather(*tasks)
+        if not bls_signer:
             logger.warning("⚠️  Crypto features will be disabled")
-    else:
-        logger.warning("⚠️  BLS signer module not available")
+        
+        # 2. 启动推理工作池(阻塞调用不再占用事件循环)
+        inference_pool = await startup_report.run("start:inference_pool", _start_inference_pool)
+        
+        if inference_pool is not None:
+            # 签名自检策略(always / sampled / deferred)
+            if bls_signer is not None:
+                signature_verifier = SignatureVerifier.from_env(inference_pool.run)
+                signature_verifier.start()
+                logger.info(f"✅ Signature verification mode: {signature_verifier.mode}")
+                
+                # Merkle 批量证明: 窗口内的结果汇总成一棵树,只对根签名
+                if os.getenv("ATTESTATION_MODE", "single").lower() == "merkle":
+                    merkle_attestor = MerkleAttestor.from_env(_sign_one, _check_own_signature)
+                    logger.info(f"✅ Merkle attestation enabled (window={merkle_attestor.window_s * 1000:.0f}ms)")
+            
+            # 情感分析微批调度器
+            if emotion_analyzer is not None:
+                emotion_batcher = MicroBatcher.from_env(_run_emotion_batch)
+                logger.info(
+                    f"✅ Emotion batcher ready (wait={emotion_batcher.max_wait_s * 1000:.0f}ms, "
+                    f"max_size={emotion_batcher.max_batch_size})"
+                )
+    except Exception as e:
+        logger.error(f"❌ Startup failed: {e}")
+    finally:
+        startup_report.finish()
     
     logger.info("="*60)
-    logger.info("🚀 Service started successfully!")
+    startup_report.log_summary()
+    logger.info("🚀 Service ready!")
     if not emotion_analyzer or not bls_signer:
         logger.warning("⚠️  Running in LIMITED mode - some features disabled")
     logger.info("="*60)
 
 
+async def _sign_one(message: bytes) -> SignedMessage:
+    """用签名服务(单密钥或 DVT 门限)对单条消息签名"""
+    return await signing_service.sign(message)
+
+
+async def _check_own_signature(message: bytes, signed: SignedMessage) -> Optional[bool]:
+    """按自检策略验证本服务刚生成的签名"""
+    return await signature_verifier.check(signed.public_key, message, signed.signature)
+
+
+def _dvt_info(signed: SignedMessage) -> Optional[Dict[str, Any]]:
+    """DVT 模式下返回门限与参与者信息"""
+    if not isinstance(signing_service, ThresholdSigningService):
+        return None
+    return {
+        "threshold": signing_service.threshold,
+        "signer_bitmap": signed.signer_bitmap,
+        "validator_public_keys": [bytes(pk).hex() for pk in signing_service.public_keys]
+    }
+
+
+async def _run_emotion_batch(audio_arrays: list) -> list:
+    """微批调度器的执行函数: 在工作池中对一批波形运行 SenseVoice"""
+    return await inference_pool.submit("emotion_analyzer", "analyze_batch", audio_arrays)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """服务关闭时释放工作池"""
+    if _startup_task and not _startup_task.done():
+        _startup_task.cancel()
+    if signature_verifier:
+        await signature_verifier.stop()
+    if emotion_batcher:
+        # 进行中的批次依赖工作池,先等它们完成
+        await emotion_batcher.drain()
+    if inference_pool:
+        inference_pool.shutdown()
+    if merkle_attestor:
+        # 进行中的根签名依赖签名服务,先等它们完成
+        await merkle_attestor.drain()
+    if signing_service:
+        signing_service.shutdown()
+    voiceprint_index.save()
+
+
 @app.get("/")
 async def root():
     """健康检查端点"""
@@ -138,17 +368,250 @@ async def root():
     }
 
 
+def _missing_components() -> list:
+    """/analyze 主流程所需但尚未就绪的组件"""
+    required = {
+        "emotion_analyzer": emotion_analyzer,
+        "bls_signer": bls_signer,
+        "inference_pool": inference_pool,
+    }
+    return [name for name, component in required.items() if component is None]
+
+
+@app.get("/health/live")
+async def liveness():
+    """存活探针: 进程在运行、事件循环可响应即返回 200(模型加载期间也是)"""
+    return {"status": "alive", "uptime_s": round(time.time() - startup_report.started_at, 1)}
+
+
+@app.get("/health/ready")
+async def readiness():
+    """就绪探针: 后台启动完成且主流程组件可用时返回 200,否则 503"""
+    missing = _missing_components()
+    ready = startup_report.finished and not missing
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "missing": missing,
+            "startup": startup_report.as_dict()
+        }
+    )
+
+
 @app.get("/health")
 async def health_check():
-    """详细健康检查"""
-    return {
-        "status": "healthy",
+    """详细健康检查(starting: 仍在加载; degraded: 启动完成但有组件不可用)"""
+    missing = _missing_components()
+    if not startup_report.finished:
+        status = "starting"
+    elif missing:
+        status = "degraded"
+    else:
+        status = "healthy"
+    
+    return JSONResponse(status_code=200 if status == "healthy" else 503, content={
+        "status": status,
         "components": {
             "emotion_analyzer": emotion_analyzer is not None,
+            "backends": {
+                "sensevoice": emotion_analyzer.backend_name if emotion_analyzer else None,
+                "campplus": speaker_verifier.backend_name if speaker_verifier else None
+            },
+            "speaker_verifier": speaker_verifier is not None,
             "bls_signer": bls_signer is not None,
-            "public_key_available": bot_public_key is not None
+            "public_key_available": bot_public_key is not None,
+            "inference_pool": inference_pool.mode if inference_pool else None
         },
+        "startup": startup_report.as_dict(),
+        "batching": emotion_batcher.stats if emotion_batcher else None,
+        "analysis_cache": analysis_cache.stats,
+        "waveform_cache": waveform_cache.stats if waveform_cache else None,
+        "silence_gate": silence_gate.stats if silence_gate else None,
+        "signature_verification": signature_verifier.stats if signature_verifier else None,
+        "attestation": merkle_attestor.stats if merkle_attestor else {"mode": "single"},
+        "voiceprint_index": voiceprint_index.stats,
         "timestamp": int(time.time())
+    })
+
+
+async def _decode(upload: UploadedAudio, max_duration_s: float = MAX_AUDIO_DURATION_S) -> np.ndarray:
+    """
+    解码上传的音频并裁剪首尾静音;同一 audio_hash 的波形在 /analyze 与 /voiceprint 之间共享
+    
+    无法识别/解码的数据返回 415;文件头中的时长超过上限时不解码直接返回 413。
+    有效语音过短时: reject 策略抛出 422;neutral 策略返回空波形,调用方不再运行模型
+    """
+    audio_array = waveform_cache.get(upload.audio_hash)
+    if audio_array is not None:
+        logger.info(f"Waveform cache hit: {upload.audio_hash[:16]}...")
+        check_duration(len(audio_array), max_duration_s=max_duration_s)
+        return audio_array
+    
+    # 只读文件头: 识别格式、读出时长
+    try:
+        info = probe(upload.buffer.getbuffer())
+    except UnsupportedAudio as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    if info.duration_s is not None:
+        check_duration(int(info.duration_s * 16000), max_duration_s=max_duration_s)
+    duration = f"{info.duration_s:.1f}s" if info.duration_s is not None else "?s"
+    logger.info(f"Audio format: {info.format} ({duration}, {info.sample_rate or '?'}Hz)")
+    
+    from preprocess import decode_and_measure  # 启动任务中已导入
+    try:
+        audio_array, (start, end, speech_s) = await inference_pool.run(
+            decode_and_measure, upload.buffer, silence_gate
+        )
+    except UnsupportedAudio as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    check_duration(len(audio_array), max_duration_s=max_duration_s)
+    
+    if silence_gate.is_short(speech_s):
+        silence_gate.record(len(audio_array), 0)
+        logger.info(f"Only {speech_s:.2f}s of speech, skipping inference ({silence_gate.policy})")
+        if silence_gate.policy == "reject":
+            raise HTTPException(
+                status_code=422,
+                detail=f"No speech detected ({speech_s:.2f}s of speech, minimum {silence_gate.min_speech_s}s)"
+            )
+        audio_array = audio_array[:0]
+    elif silence_gate.enabled and end - start < len(audio_array):
+        silence_gate.record(len(audio_array), end - start)
+        # 裁掉较多时复制一份,缓存中不再保留原始整段波形
+        trimmed = audio_array[start:end]
+        audio_array = trimmed.copy() if len(trimmed) < len(audio_array) * 3 // 4 else trimmed
+    elif silence_gate.enabled:
+        silence_gate.record(len(audio_array), len(audio_array))
+    
+    waveform_cache.put(upload.audio_hash, audio_array)
+    return audio_array
+
+
+def _require_speech(audio_array: np.ndarray) -> None:
+    """声纹提取需要有效语音(neutral 策略下静音片段解码为空波形)"""
+    if len(audio_array) == 0:
+        raise HTTPException(status_code=422, detail="No speech detected")
+
+
+def _emotion_result(analysis_result: Dict[str, Any]) -> Dict[str, Any]:
+    """把 EmotionAnalyzer 的输出整理为结构化结果 JSON"""
+    return {
+        "emotion": analysis_result["emotion"],
+        "intensity": float(analysis_result["intensity"]),
+        "confidence": float(analysis_result["confidence"]),
+        "emotion_distribution": analysis_result["emotion_distribution"],
+        "keywords": analysis_result["keywords"],
+        "events": analysis_result["events"],
+        "transcript": analysis_result["raw_text"],
+        "language": analysis_result["language"]
+    }
+
+
+async def _analyze_long_parallel(audio_array: np.ndarray) -> Dict[str, Any]:
+    """
+    长音频分段并行推理
+    
+    整段做一次 VAD,片段交错分给工作池的各个 worker 批量转写,
+    按原始顺序合并后再统一提取情感/事件/文本(情感分布按片段时长加权)
+    """
+    segments = await inference_pool.submit("emotion_analyzer", "detect_segments", audio_array)
+    clips = [audio_array[beg * SAMPLES_PER_MS:end * SAMPLES_PER_MS] for beg, end in segments]
+    raw_texts = await inference_pool.submit_split("emotion_analyzer", "transcribe_segments", clips)
+    logger.info(f"Long audio: {len(clips)} segments across {min(len(clips), inference_pool.max_workers)} workers")
+    return await inference_pool.submit(
+        "emotion_analyzer", "summarize_segments", raw_texts, durations_ms=[end - beg for beg, end in segments]
+    )
+
+
+async def _analyze_waveform(audio_array: np.ndarray) -> Dict[str, Any]:
+    """对已解码的波形做微批推理,返回可缓存的结构化结果(不含时间戳/签名)"""
+    if len(audio_array) == 0:
+        # 静音 / 误触: 不运行模型,按空转写解析(NEUTRAL)
+        return _emotion_result(emotion_analyzer.summarize_segments([]))
+    
+    logger.info("Running emotion analysis...")
+    is_long = len(audio_array) > emotion_analyzer.MAX_BATCH_CLIP_S * 16000
+    if is_long and _use_long_audio_parallel():
+        analysis_result = await _analyze_long_parallel(audio_array)
+    else:
+        analysis_result = await emotion_batcher.submit(audio_array)
+    logger.info(f"Analysis complete: {analysis_result['emotion']} ({analysis_result['intensity']:.2f})")
+    return _emotion_result(analysis_result)
+
+
+def _use_long_audio_parallel() -> bool:
+    """长音频是否按 VAD 片段并行转写(LONG_AUDIO_PARALLEL 留空时只在 process 模式下开启)"""
+    enabled = LONG_AUDIO_PARALLEL if LONG_AUDIO_PARALLEL is not None else inference_pool.mode == "process"
+    return enabled and inference_pool.max_workers > 1
+
+
+async def _run_analysis(upload: UploadedAudio) -> Dict[str, Any]:
+    """解码 + 微批推理"""
+    return await _analyze_waveform(await _decode(upload))
+
+
+async def _attest_result(audio_hash: str, result_json: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    对结果做哈希并签名(单独签名或 Merkle 批量),返回响应中的 crypto 字段
+    
+    签名自检失败时抛出 500
+    """
+    # 计算结果哈希 (result_hash)
+    result_json_str = json.dumps(result_json, sort_keys=True, ensure_ascii=False)
+    result_hash = hashlib.sha256(result_json_str.encode('utf-8')).hexdigest()
+    logger.info(f"Result hash: {result_hash[:16]}...")
+    
+    # 生成时间戳和随机数
+    timestamp = int(time.time())
+    nonce = secrets.token_hex(16)
+    
+    # 构造待签名消息
+    # 消息格式: audio_hash || result_hash || public_key || timestamp || nonce
+    message = construct_message(
+        audio_hash=audio_hash,
+        result_hash=result_hash,
+        algo_version=ALGO_VERSION,
+        timestamp=timestamp,
+        nonce=nonce
+    )
+    message_hash = message.hex()
+    logger.info(f"Message hash: {message_hash[:16]}...")
+    
+    # BLS 签名(单独签名;或汇总进 Merkle 树,只对根签名),
+    # 然后按策略自检(同步 / 抽样 / 交给后台审计)
+    merkle_proof = None
+    if merkle_attestor:
+        logger.info("Attesting message via Merkle batch...")
+        merkle_proof = await merkle_attestor.attest(message)
+        signed = merkle_proof.pop("signed")
+        is_valid = merkle_proof.pop("verified")
+    else:
+        logger.info("Signing message with BLS...")
+        signed = await _sign_one(message)
+        is_valid = await _check_own_signature(message, signed)
+    signature_hex = signed.signature.hex()
+    logger.info(f"Signature: {signature_hex[:16]}...")
+    
+    if is_valid is False:
+        logger.error("❌ Signature verification failed!")
+        raise HTTPException(status_code=500, detail="Signature verification failed")
+    if is_valid:
+        logger.info("✅ Signature verified successfully")
+    
+    return {
+        "audio_hash": audio_hash,
+        "result_hash": result_hash,
+        "message_hash": message_hash,
+        "signature": signature_hex,
+        "public_key": bytes(signed.public_key).hex(),
+        "timestamp": timestamp,
+        "nonce": nonce,
+        "algorithm": "BLS12-381",
+        "verified": is_valid,
+        "verification": signature_verifier.mode,
+        "merkle": merkle_proof,
+        "dvt": _dvt_info(signed)
     }
 
 
@@ -167,6 +630,7 @@ async def analyze_audio(audio: UploadFile = File(...)):
                 "emotion": "HAPPY",
                 "intensity": 0.85,
                 "confidence": 0.92,
+                "emotion_distribution": {"HAPPY": 0.8, "NEUTRAL": 0.2},
                 "keywords": ["活动", "很棒"],
                 "events": ["applause"],
                 "transcript": "这次活动很棒!",
@@ -193,94 +657,42 @@ async def analyze_audio(audio: UploadFile = File(...)):
                 detail="Emotion analyzer not available. Please check server logs."
             )
         
-        if not bls_signer:
+        if not bls_signer or not signing_service or not signature_verifier:
             raise HTTPException(
                 status_code=503,
                 detail="BLS signer not available. Please check .env configuration."
             )
         
-        # 1. 读取音频数据
-        audio_bytes = await audio.read()
-        audio_size = len(audio_bytes)
-        logger.info(f"Audio size: {audio_size} bytes")
+        if not inference_pool or not emotion_batcher:
+            raise HTTPException(status_code=503, detail="Inference pool not available")
         
-        if audio_size == 0:
-            raise HTTPException(status_code=400, detail="Empty audio file")
-        
-        # 2. 计算音频哈希 (audio_hash)
-        audio_hash = hashlib.sha256(audio_bytes).hexdigest()
+        # 1. 分块读取音频数据,同时计算音频哈希 (audio_hash)
+        upload = await read_upload(audio)
+        audio_hash = upload.audio_hash
+        audio_size = upload.size
+        logger.info(f"Audio size: {audio_size} bytes")
         logger.info(f"Audio hash: {audio_hash[:16]}...")
         
-        # 3. AI 情感分析
-        logger.info("Running emotion analysis...")
-        analysis_result = emotion_analyzer.analyze(audio_bytes)
-        logger.info(f"Analysis complete: {analysis_result['emotion']} ({analysis_result['intensity']:.2f})")
-        
-        # 4. 构建结构化结果 JSON
-        result_json = {
-            "emotion": analysis_result["emotion"],
-            "intensity": float(analysis_result["intensity"]),
-            "confidence": float(analysis_result["confidence"]),
-            "keywords": analysis_result["keywords"],
-            "events": analysis_result["events"],
-            "transcript": analysis_result["raw_text"],
-            "language": analysis_result["language"]
-        }
-        
-        # 5. 计算结果哈希 (result_hash)
-        import json
-        result_json_str = json.dumps(result_json, sort_keys=True, ensure_ascii=False)
-        result_hash = hashlib.sha256(result_json_str.encode('utf-8')).hexdigest()
-        logger.info(f"Result hash: {result_hash[:16]}...")
-        
-        # 6. 生成时间戳和随机数
-        timestamp = int(time.time())
-        nonce = secrets.token_hex(16)
-        
-        # 7. 构造待签名消息
-        # 消息格式: audio_hash || result_hash || public_key || timestamp || nonce
-        message = construct_message(
-            audio_hash=audio_hash,
-            result_hash=result_hash,
-            algo_version="SenseVoice-v1.0",
-            timestamp=timestamp,
-            nonce=nonce
+        # 2. AI 情感分析(相同音频命中缓存或共享进行中的推理)
+        result_json, cache_hit = await analysis_cache.get_or_compute(
+            audio_hash, lambda: _run_analysis(upload)
         )
-        message_hash = message.hex()
-        logger.info(f"Message hash: {message_hash[:16]}...")
+        if cache_hit:
+            logger.info(f"Analysis cache hit: {result_json['emotion']}")
         
-        # 8. BLS 签名
-        logger.info("Signing message with BLS...")
-        signature = bls_signer.sign_message(message)
-        signature_hex = signature.hex()
-        logger.info(f"Signature: {signature_hex[:16]}...")
-        
-        # 9. 验证签名(自检)
-        is_valid = BLSSigner.verify_signature(bls_signer.pk, message, signature)
-        if not is_valid:
-            logger.error("❌ Signature verification failed!")
-            raise HTTPException(status_code=500, detail="Signature verification failed")
-        logger.info("✅ Signature verified successfully")
+        # 3. 结果哈希 -> 构造消息 -> BLS 签名 -> 按策略自检
+        crypto = await _attest_result(audio_hash, result_json)
         
-        # 10. 构造返回结果
+        # 4. 构造返回结果
         response = {
             "success": True,
             "result": result_json,
-            "crypto": {
-                "audio_hash": audio_hash,
-                "result_hash": result_hash,
-                "message_hash": message_hash,
-                "signature": signature_hex,
-                "public_key": bot_public_key,
-                "timestamp": timestamp,
-                "nonce": nonce,
-                "algorithm": "BLS12-381",
-                "verified": is_valid
-            },
+            "crypto": crypto,
             "metadata": {
                 "audio_size": audio_size,
                 "processing_time_ms": 0,  # 可以在开始时记录时间来计算
-                "model_version": "SenseVoice-Small"
+                "model_version": MODEL_VERSION,
+                "cache_hit": cache_hit
             }
         }
         
@@ -298,37 +710,300 @@ async def analyze_audio(audio: UploadFile = File(...)):
 
 
 @app.post("/voiceprint")
-async def extract_voiceprint(audio: UploadFile = File(...)):
+async def extract_voiceprint(
+    audio: UploadFile = File(...),
+    encoding: str = Query("json", description="json | f32 | f16 | int8")
+):
     """
     提取音频的声纹特征向量 (Speaker Embedding)
+    
+    encoding 为 json 时 embedding 是浮点数组;其它编码见 embedding_codec
     """
     try:
-        if not speaker_verifier:
+        if not speaker_verifier or not inference_pool:
             raise HTTPException(status_code=503, detail="Speaker verifier not available")
+        if encoding not in ENCODINGS:
+            raise HTTPException(status_code=400, detail=f"Unsupported encoding: {encoding}")
             
-        audio_bytes = await audio.read()
-        if not audio_bytes:
-            raise HTTPException(status_code=400, detail="Empty audio file")
-            
-        embedding = speaker_verifier.get_embedding(audio_bytes)
+        upload = await read_upload(audio)
+        audio_array = await _decode(upload)
+        _require_speech(audio_array)
+        embedding = await inference_pool.submit("speaker_verifier", "embed_waveform", audio_array)
         
         if embedding is None:
             raise HTTPException(status_code=500, detail="Voiceprint extraction failed")
             
         return {
             "success": True,
-            "embedding": embedding.tolist(),
+            "embedding": encode_embedding(embedding, encoding),
+            "encoding": encoding,
             "dimensions": len(embedding)
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Voiceprint error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/analyze_full")
+async def analyze_full(
+    audio: UploadFile = File(...),
+    encoding: str = Query("json", description="json | f32 | f16 | int8")
+):
+    """
+    一次上传同时返回情感分析、转写和声纹,并对合并结果签名
+    
+    音频只解码一次,SenseVoice 与 CAM++ 在同一份波形上并发推理。
+    签名的结果中包含声纹哈希 (float32 向量的 SHA-256),声纹本身随响应返回。
+    
+    响应:
+        {
+            "success": true,
+            "result": {
+                "emotion": "HAPPY",
+                ...,
+                "voiceprint_hash": "stu901..."
+            },
+            "voiceprint": {"embedding": [...], "dimensions": 192},
+            "crypto": {...}
+        }
+    """
+    try:
+        logger.info(f"Received audio file (full analysis): {audio.filename}")
+        
+        if not emotion_analyzer or not speaker_verifier:
+            raise HTTPException(status_code=503, detail="Analyzer models not available")
+        if not bls_signer or not signing_service or not signature_verifier:
+            raise HTTPException(status_code=503, detail="BLS signer not available")
+        if not inference_pool or not emotion_batcher:
+            raise HTTPException(status_code=503, detail="Inference pool not available")
+        if encoding not in ENCODINGS:
+            raise HTTPException(status_code=400, detail=f"Unsupported encoding: {encoding}")
+        
+        # 1. 读取上传并解码一次
+        upload = await read_upload(audio)
+        audio_array = await _decode(upload)
+        _require_speech(audio_array)
+        
+        # 2. 情感分析(走缓存与微批)和声纹提取并发执行
+        (emotion_json, cache_hit), embedding = await asyncio.gather(
+            analysis_cache.get_or_compute(upload.audio_hash, lambda: _analyze_waveform(audio_array)),
+            inference_pool.submit("speaker_verifier", "embed_waveform", audio_array)
+        )
+        if embedding is None:
+            raise HTTPException(status_code=500, detail="Voiceprint extraction failed")
+        
+        # 3. 声纹哈希并入结果,整体只签名一次
+        result_json = dict(emotion_json)
+        result_json["voiceprint_hash"] = hashlib.sha256(embedding.tobytes()).hexdigest()
+        crypto = await _attest_result(upload.audio_hash, result_json)
+        
+        return {
+            "success": True,
+            "result": result_json,
+            "voiceprint": {
+                "embedding": encode_embedding(embedding, encoding),
+                "encoding": encoding,
+                "dimensions": int(embedding.shape[0])
+            },
+            "crypto": crypto,
+            "metadata": {
+                "audio_size": upload.size,
+                "model_version": MODEL_VERSION,
+                "cache_hit": cache_hit
+            }
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Full analysis error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _detect_segments(window: np.ndarray) -> list:
+    """在工作池中对一个窗口做 VAD"""
+    return await inference_pool.submit("emotion_analyzer", "detect_segments", window)
+
+
+async def _stream_analysis(upload: UploadedAudio, audio_array: np.ndarray):
+    """/analyze_stream 的 SSE 事件生成器: 逐段推送结果,最后推送签名的整段结果"""
+    start = time.perf_counter()
+    duration_s = len(audio_array) / 16000
+    yield sse_event("start", {"audio_hash": upload.audio_hash, "duration_s": round(duration_s, 3)})
+    
+    raw_texts = []
+    durations_ms = []
+    tally = TagTally()
+    speech_ms = 0
+    first_segment_ms = None
+    try:
+        async for beg, end in iter_segments(audio_array, _detect_segments):
+            # 每个片段不超过 30 秒,走微批调度器(与其它请求的短音频合并推理)
+            clip = audio_array[beg * SAMPLES_PER_MS:end * SAMPLES_PER_MS]
+            analysis_result = await emotion_batcher.submit(clip)
+            raw_texts.append(analysis_result["full_result"])
+            durations_ms.append(end - beg)
+            speech_ms += end - beg
+            if first_segment_ms is None:
+                first_segment_ms = round((time.perf_counter() - start) * 1000, 1)
+                logger.info(f"Stream first segment after {first_segment_ms:.0f}ms")
+            
+            # 截至当前的累计情感(只解析新片段,按时长加权累加标签统计)
+            tally.add(parse_tags(analysis_result["full_result"], end - beg))
+            aggregate = tally.summary()
+            segment = _emotion_result(analysis_result)
+            segment.update({
+                "index": len(raw_texts) - 1,
+                "start_ms": beg,
+                "end_ms": end,
+                "aggregate": {
+                    "emotion": aggregate["emotion"],
+                    "intensity": float(aggregate["intensity"]),
+                    "emotion_distribution": aggregate["emotion_distribution"],
+                    "events": aggregate["events"],
+                    "segments": len(raw_texts),
+                    "speech_s": round(speech_ms / 1000, 3),
+                },
+            })
+            yield sse_event("segment", segment)
+        
+        # 合并所有片段的原始输出,按 /analyze 的方式解析并签名
+        summary = await inference_pool.submit(
+            "emotion_analyzer", "summarize_segments", raw_texts, durations_ms=durations_ms
+        )
+        result_json = _emotion_result(summary)
+        crypto = await _attest_result(upload.audio_hash, result_json)
+        logger.info(f"Stream complete: {len(raw_texts)} segments, {result_json['emotion']}")
+        
+        yield sse_event("result", {
+            "success": True,
+            "result": result_json,
+            "crypto": crypto,
+            "metadata": {
+                "audio_size": upload.size,
+                "duration_s": round(duration_s, 3),
+                "segments": len(raw_texts),
+                "speech_s": round(speech_ms / 1000, 3),
+                "first_segment_ms": first_segment_ms,
+                "processing_time_ms": round((time.perf_counter() - start) * 1000, 1),
+                "model_version": MODEL_VERSION
+            }
+        })
+    except HTTPException as e:
+        yield sse_event("error", {"status_code": e.status_code, "detail": e.detail})
+    except Exception as e:
+        logger.error(f"Stream analysis error: {e}")
+        yield sse_event("error", {"status_code": 500, "detail": str(e)})
+
+
+@app.post("/analyze_stream")
+async def analyze_stream(audio: UploadFile = File(...)):
+    """
+    长音频流式分析 (Server-Sent Events)
+    
+    按 VAD 片段逐段推送情感与转写,附带累计情感,最后推送与 /analyze 格式相同的签名结果。
+    首个片段的延迟与音频总时长无关;时长上限为 MAX_STREAM_DURATION_S。
+    
+    事件:
+        event: start     {"audio_hash": "...", "duration_s": 1830.2}
+        event: segment   {"index": 0, "start_ms": 380, "end_ms": 6120, "emotion": "HAPPY",
+                          "intensity": 0.65, ..., "transcript": "...",
+                          "aggregate": {"emotion": "HAPPY", "intensity": 0.65,
+                                        "emotion_distribution": {"HAPPY": 1.0}, "events": [],
+                                        "segments": 1, "speech_s": 5.74}}
+        event: result    {"success": true, "result": {...}, "crypto": {...}, "metadata": {...}}
+        event: error     {"status_code": 500, "detail": "..."}
+    
+    上传、解码阶段的错误(413 / 503 等)仍以普通 HTTP 错误返回;开始推送后的错误以 error 事件返回。
+    """
+    try:
+        logger.info(f"Received audio file (stream): {audio.filename}")
+        
+        if not emotion_analyzer:
+            raise HTTPException(status_code=503, detail="Emotion analyzer not available")
+        if not bls_signer or not signing_service or not signature_verifier:
+            raise HTTPException(status_code=503, detail="BLS signer not available")
+        if not inference_pool or not emotion_batcher:
+            raise HTTPException(status_code=503, detail="Inference pool not available")
+        
+        upload = await read_upload(audio)
+        audio_array = await _decode(upload, max_duration_s=MAX_STREAM_DURATION_S)
+        
+        return StreamingResponse(
+            _stream_analysis(upload, audio_array),
+            media_type="text/event-stream",
+            # 关闭反向代理缓冲,事件立即送达客户端
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Stream analysis error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _parse_param(data: Dict[str, Any], key: str, default: Any, kind: type, minimum: float = None) -> Any:
+    """
+    解析请求中的可选数值参数(top_k / threshold),格式错误以 400 拒绝
+    
+    参数:
+        data: 请求 JSON
+        key: 参数名
+        default: 未提供时的值(None 原样返回)
+        kind: int 或 float
+        minimum: 允许的最小值
+    """
+    value = data.get(key, default)
+    if value is None:
+        return None
+    try:
+        if isinstance(value, bool):
+            raise ValueError
+        parsed = kind(value)
+        if kind is int and float(value) != parsed:
+            raise ValueError
+        if not math.isfinite(parsed):
+            raise ValueError
+    except (TypeError, ValueError, OverflowError):
+        # int(inf) 抛出 OverflowError
+        raise HTTPException(status_code=400, detail=f"Invalid {key}: expected {kind.__name__}, got {value!r}")
+    if minimum is not None and parsed < minimum:
+        raise HTTPException(status_code=400, detail=f"Invalid {key}: must be >= {minimum}")
+    return parsed
+
+
+def _is_single_embedding(embedding: np.ndarray) -> bool:
+    """单个声纹: (D,) 向量,或旧版 /voiceprint 返回的 (1, D) 嵌套列表"""
+    return embedding.ndim == 1 or embedding.shape[0] == 1
+
+
 @app.post("/compare_voiceprints")
 async def compare_voiceprints(data: Dict[str, Any]):
     """
-    比较两个声纹特征向量的相似度
+    比较声纹特征向量的相似度(一对一、一对多、多对多)
+    
+    请求:
+        {
+            "embedding1": [...] 或 [[...], [...]] 或编码字典(列表),
+            "embedding2": [...] 或 [[...], [...]] 或编码字典(列表),
+            "threshold": 0.60,   # 可选,默认 VOICEPRINT_MATCH_THRESHOLD
+            "top_k": 3           # 可选,多对多时每行只返回最相似的 k 个
+        }
+    
+    响应(两边都是单个声纹,与旧版兼容):
+        {"success": true, "similarity": 0.83, "matched": true}
+    
+    响应(任一边是矩阵):
+        {
+            "success": true,
+            "shape": [N, M],
+            "similarities": [[...], ...],      # N x M,指定 top_k 时省略
+            "matches": [[{"index": 2, "similarity": 0.83}], ...],  # 每行超过阈值的结果(降序)
+            "matched": true                     # 是否存在任一匹配
+        }
     """
     try:
         if not speaker_verifier:
@@ -339,20 +1014,145 @@ async def compare_voiceprints(data: Dict[str, Any]):
         
         if not emb1 or not emb2:
             raise HTTPException(status_code=400, detail="Missing embeddings (embedding1 and embedding2)")
-            
-        # analyzer.py handles list -> array conversion
-        similarity = speaker_verifier.calculate_similarity(emb1, emb2)
         
-        return {
+        threshold = _parse_param(data, "threshold", VOICEPRINT_MATCH_THRESHOLD, float)
+        top_k = _parse_param(data, "top_k", None, int, minimum=1)
+        
+        try:
+            emb1 = decode_embedding(emb1)
+            emb2 = decode_embedding(emb2)
+            similarities = speaker_verifier.similarity_matrix(emb1, emb2)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        if _is_single_embedding(emb1) and _is_single_embedding(emb2):
+            similarity = float(similarities[0, 0])
+            return {
+                "success": True,
+                "similarity": similarity,
+                "matched": similarity > threshold
+            }
+        
+        # 每行按相似度降序取超过阈值的列
+        columns = similarities.shape[1]
+        k = columns if top_k is None else min(top_k, columns)
+        matches = []
+        for row in similarities:
+            if k < columns:
+                order = np.argpartition(row, columns - k)[columns - k:]
+                order = order[np.argsort(row[order])[::-1]]
+            else:
+                order = np.argsort(row)[::-1]
+            matches.append([
+                {"index": int(j), "similarity": float(row[j])}
+                for j in order if row[j] > threshold
+            ])
+        
+        response = {
             "success": True,
-            "similarity": similarity,
-            "matched": similarity > 0.60 # 阈值从 0.85 降低到 0.60，更符合实际场景
+            "shape": list(similarities.shape),
+            "matches": matches,
+            "matched": any(matches)
         }
+        if top_k is None:
+            response["similarities"] = similarities.tolist()
+        return response
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Comparison error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/enroll_voiceprint")
+async def enroll_voiceprint(data: Dict[str, Any]):
+    """
+    把声纹登记到 1:N 检索索引(相同 voice_id 覆盖旧声纹)
+    
+    请求:
+        {"voice_id": "tg:123456", "embedding": [...]}
+    """
+    voice_id = data.get("voice_id")
+    embedding = data.get("embedding")
+    if not voice_id or not embedding:
+        raise HTTPException(status_code=400, detail="Missing voice_id or embedding")
+    
+    # 共享模式下登记要加排它文件锁并重写整个索引文件,放到线程池执行,不阻塞事件循环
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(None, voiceprint_index.add, str(voice_id), decode_embedding(embedding))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    index_size = await loop.run_in_executor(None, len, voiceprint_index)
+    return {"success": True, "voice_id": voice_id, "index_size": index_size}
+
+
+@app.post("/remove_voiceprint")
+async def remove_voiceprint(data: Dict[str, Any]):
+    """从检索索引中删除声纹"""
+    voice_id = data.get("voice_id")
+    if not voice_id:
+        raise HTTPException(status_code=400, detail="Missing voice_id")
+    
+    loop = asyncio.get_running_loop()
+    removed = await loop.run_in_executor(None, voiceprint_index.remove, str(voice_id))
+    index_size = await loop.run_in_executor(None, len, voiceprint_index)
+    return {"success": True, "removed": removed, "index_size": index_size}
+
+
+@app.post("/identify")
+async def identify_voiceprint(data: Dict[str, Any]):
+    """
+    在所有已登记声纹中检索与给定声纹最相似的条目(1:N 识别)
+    
+    请求:
+        {
+            "embedding": [...],
+            "top_k": 5,             # 可选
+            "threshold": 0.60,      # 可选,默认 VOICEPRINT_MATCH_THRESHOLD
+            "exclude": "tg:123456"  # 可选,排除提交者自己的 voice_id
+        }
+    
+    响应:
+        {
+            "success": true,
+            "matches": [{"voice_id": "tg:654321", "similarity": 0.83}],
+            "matched": true,
+            "index_size": 1024
+        }
+    """
+    embedding = data.get("embedding")
+    if not embedding:
+        raise HTTPException(status_code=400, detail="Missing embedding")
+    
+    top_k = _parse_param(data, "top_k", 5, int, minimum=1)
+    threshold = _parse_param(data, "threshold", VOICEPRINT_MATCH_THRESHOLD, float)
+    exclude = data.get("exclude")
+    
+    try:
+        # 大索引上的矩阵乘法放到线程中执行(numpy 会释放 GIL)
+        query = decode_embedding(embedding)
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(
+            None, voiceprint_index.search, query, top_k + (1 if exclude else 0), threshold
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    matches = [
+        {"voice_id": voice_id, "similarity": similarity}
+        for voice_id, similarity in results
+        if voice_id != exclude
+    ][:top_k]
+    return {
+        "success": True,
+        "matches": matches,
+        "matched": bool(matches),
+        "index_size": len(voiceprint_index)
+    }
+
+
 @app.post("/verify")
 async def verify_signature(
     audio_hash: str,
@@ -360,7 +1160,11 @@ async def verify_signature(
     timestamp: int,
     nonce: str,
     signature: str,
-    public_key: str
+    public_key: str,
+    merkle_root: Optional[str] = None,
+    merkle_proof: Optional[str] = None,
+    leaf_index: Optional[int] = None,
+    leaf_count: Optional[int] = None
 ):
     """
     验证签名的独立端点(可选功能)
@@ -372,30 +1176,33 @@ async def verify_signature(
         - nonce: 随机数
         - signature: 签名(十六进制)
         - public_key: 公钥(十六进制)
+        - merkle_root / merkle_proof / leaf_index / leaf_count: Merkle 批量证明(可选,
+          merkle_proof 为逗号分隔的十六进制兄弟节点)
     
     返回:
         {"valid": true/false}
     """
     try:
-        # 重构消息
-        message = construct_message(
-            audio_hash=audio_hash,
-            result_hash=result_hash,
-            algo_version="SenseVoice-v1.0",
-            timestamp=timestamp,
-            nonce=nonce
+        # 重构消息(Merkle 形式下先验证包含证明,再验证根签名)
+        message = _signed_message(
+            audio_hash, result_hash, timestamp, nonce,
+            merkle_root=merkle_root,
+            merkle_proof=merkle_proof.split(",") if merkle_proof else [],
+            leaf_index=leaf_index,
+            leaf_count=leaf_count
         )
         
         # 转换签名和公钥
         signature_bytes = bytes.fromhex(signature)
         public_key_bytes = bytes.fromhex(public_key)
         
-        # 验证
-        is_valid = BLSSigner.verify_signature(
-            public_key_bytes,
-            message,
-            signature_bytes
-        )
+        # 验证(在工作池中执行,公钥解压/校验结果已缓存)
+        if inference_pool:
+            is_valid = await inference_pool.run(
+                BLSSigner.verify_signature, public_key_bytes, message, signature_bytes
+            )
+        else:
+            is_valid = BLSSigner.verify_signature(public_key_bytes, message, signature_bytes)
         
         return {"valid": is_valid}
         
@@ -404,6 +1211,118 @@ async def verify_signature(
         return {"valid": False, "error": str(e)}
 
 
+def _signed_message(
+    audio_hash: str,
+    result_hash: str,
+    timestamp: int,
+    nonce: str,
+    merkle_root: Optional[str] = None,
+    merkle_proof: Optional[list] = None,
+    leaf_index: Optional[int] = None,
+    leaf_count: Optional[int] = None
+) -> bytes:
+    """
+    重构签名所覆盖的消息
+    
+    单独签名时即 construct_message 的结果;Merkle 形式下先检查该消息(叶子)
+    包含在 merkle_root 中,返回根消息。包含证明无效时抛出 ValueError。
+    """
+    message = construct_message(
+        audio_hash=audio_hash,
+        result_hash=result_hash,
+        algo_version=ALGO_VERSION,
+        timestamp=timestamp,
+        nonce=nonce
+    )
+    if not merkle_root:
+        return message
+    
+    if leaf_index is None or leaf_count is None:
+        raise ValueError("Merkle proof requires leaf_index and leaf_count")
+    proof = [bytes.fromhex(node) for node in merkle_proof or []]
+    if not verify_proof(message, leaf_index, proof, bytes.fromhex(merkle_root), leaf_count):
+        raise ValueError("Merkle inclusion proof does not match root")
+    return construct_root_message(merkle_root, leaf_count)
+
+
+# /verify_batch 单次请求最多验证的签名数
+MAX_VERIFY_BATCH = 1024
+
+
+@app.post("/verify_batch")
+async def verify_batch(data: Dict[str, Any]):
+    """
+    批量验证签名(随机线性组合,N 条签名约 N+1 次配对)
+    
+    请求:
+        {
+            "items": [
+                {
+                    "audio_hash": "...",
+                    "result_hash": "...",
+                    "timestamp": 1706600000,
+                    "nonce": "...",
+                    "signature": "...",
+                    "public_key": "...",
+                    "merkle": {"root": "...", "proof": [...], "leaf_index": 0, "leaf_count": 8}  (可选)
+                },
+                ...
+            ]
+        }
+    
+    返回:
+        {"valid": 全部有效, "results": [true, false, ...], "invalid_indices": [1]}
+    """
+    if not inference_pool:
+        raise HTTPException(status_code=503, detail="Inference pool not available")
+    
+    items = data.get("items")
+    if not isinstance(items, list) or not items:
+        raise HTTPException(status_code=400, detail="Missing items")
+    if len(items) > MAX_VERIFY_BATCH:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many items ({len(items)}, limit {MAX_VERIFY_BATCH})"
+        )
+    
+    # 格式错误的条目直接判为无效,其余参与批量验证
+    results = [False] * len(items)
+    entries = []
+    indices = []
+    for index, item in enumerate(items):
+        try:
+            merkle = item.get("merkle") or {}
+            message = _signed_message(
+                item["audio_hash"],
+                item["result_hash"],
+                int(item["timestamp"]),
+                item["nonce"],
+                merkle_root=merkle.get("root"),
+                merkle_proof=merkle.get("proof"),
+                leaf_index=merkle.get("leaf_index"),
+                leaf_count=merkle.get("leaf_count")
+            )
+            entries.append((
+                bytes.fromhex(item["public_key"]),
+                message,
+                bytes.fromhex(item["signature"])
+            ))
+            indices.append(index)
+        except Exception as e:
+            logger.warning(f"Malformed verify_batch item {index}: {e}")
+    
+    if entries:
+        batch_results = await inference_pool.run(BLSSigner.batch_verify, entries)
+        for index, is_valid in zip(indices, batch_results):
+            results[index] = is_valid
+    
+    return {
+        "valid": all(results),
+        "results": results,
+        "invalid_indices": [i for i, ok in enumerate(results) if not ok]
+    }
+
+
 @app.get("/public-key")
 async def get_public_key():
     """获取服务的公钥"""
@@ -413,17 +1332,30 @@ async def get_public_key():
     return {
         "public_key": bot_public_key,
         "algorithm": "BLS12-381",
-        "curve": "G2ProofOfPossession"
+        "curve": "G2ProofOfPossession",
+        "signing_mode": "dvt" if isinstance(signing_service, ThresholdSigningService) else "single"
     }
 
 
 if __name__ == "__main__":
-    # 运行服务
-    uvicorn.run(
-        app,
-        host="0.0.0.0",  # 监听所有网络接口
-        port=8001,       # 端口号
-        log_level="info"
-    )
-
-    
\ No newline at end of file
+    port = int(os.getenv("AI_PORT", "8001"))
+    workers = int(os.getenv("AI_WORKERS", "1"))
+    if workers > 1:
+        # pre-fork 多 worker: master 加载一次模型,worker 通过 copy-on-write 共享
+        from prefork import serve
+        serve(
+            app,
+            preload_models,
+            host="0.0.0.0",
+            port=port,
+            workers=workers,
+            torch_threads=int(os.getenv("AI_WORKER_THREADS", "0"))
+        )
+    else:
+        # 运行服务
+        uvicorn.run(
+            app,
+            host="0.0.0.0",  # 监听所有网络接口
+            port=port,       # 端口号(AI_PORT,默认 8001)
+            log_level="info"
+        )
@@ -0,0 +1,155 @@
+# attestation.py - Merkle 批量结果证明
+"""
+把短时间窗口内产生的待签名消息汇总成一棵 Merkle 树，只对根签名
+
+突发流量下 N 次 BLS 签名（以及链上 N 次验证）变为 1 次。每个请求拿到：
+自己的叶子（即 construct_message 的输出）、包含证明、根、叶子数和根签名。
+
+根签名的消息由 construct_root_message(root, leaf_count) 构造，叶子数参与签名，
+防止同一根被解释为不同大小的树。
+
+配置（环境变量）:
+    ATTESTATION_MODE        single | merkle（默认 single，即每个请求单独签名）
+    ATTESTATION_WINDOW_MS   merkle 模式的汇总窗口（默认 50ms）
+    ATTESTATION_MAX_LEAVES  单棵树最多叶子数（默认 256）
+"""
+
+import asyncio
+import functools
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from bls_signer import SignedMessage, construct_root_message
+from merkle import MerkleTree
+
+logger = logging.getLogger(__name__)
+
+# sign(message) -> SignedMessage
+Signer = Callable[[bytes], Awaitable[SignedMessage]]
+# verify(message, signed) -> True / False / None（按自检策略）
+Verifier = Callable[[bytes, SignedMessage], Awaitable[Optional[bool]]]
+
+
+class MerkleAttestor:
+    """按时间窗口汇总消息并对 Merkle 根签名"""
+
+    def __init__(self, sign: Signer, verify: Verifier, window_ms: float = 50, max_leaves: int = 256):
+        """
+        参数:
+            sign: 对根消息签名的协程
+            verify: 按自检策略验证根签名的协程
+            window_ms: 汇总窗口（毫秒）
+            max_leaves: 单棵树最多叶子数，达到后立即签名
+        """
+        self.sign = sign
+        self.verify = verify
+        self.window_s = window_ms / 1000.0
+        self.max_leaves = max_leaves
+
+        self._pending: List[Tuple[bytes, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # 进行中的签名任务（事件循环只持有任务的弱引用）
+        self._tasks: Set[asyncio.Task] = set()
+
+        # 统计信息
+        self.roots = 0
+        self.leaves = 0
+
+    @classmethod
+    def from_env(cls, sign: Signer, verify: Verifier) -> "MerkleAttestor":
+        """从环境变量构造"""
+        return cls(
+            sign,
+            verify,
+            window_ms=float(os.getenv("ATTESTATION_WINDOW_MS", "50")),
+            max_leaves=int(os.getenv("ATTESTATION_MAX_LEAVES", "256")),
+        )
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "roots_signed": self.roots,
+            "leaves": self.leaves,
+            "avg_leaves_per_root": round(self.leaves / self.roots, 2) if self.roots else 0.0,
+            "running": len(self._tasks),
+        }
+
+    async def drain(self) -> None:
+        """立即签名等待中的消息，并等待所有进行中的签名完成（服务关闭时在关闭签名服务之前调用）"""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def attest(self, message: bytes) -> Dict[str, Any]:
+        """
+        提交一条待签名消息，等待所在的树签名完成
+
+        返回:
+            {
+                "leaf_index": 3,
+                "leaf_count": 8,
+                "proof": ["ab12...", ...],
+                "root": "cd34...",
+                "signed": SignedMessage(...),
+                "verified": True / False / None
+            }
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((message, future))
+
+        if len(self._pending) >= self.max_leaves:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_s, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+
+        batch = self._pending
+        self._pending = []
+        task = asyncio.get_running_loop().create_task(self._sign_batch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(functools.partial(self._finish, batch))
+
+    def _finish(self, batch: List[Tuple[bytes, asyncio.Future]], task: asyncio.Task) -> None:
+        """签名任务结束: 释放引用；任务被取消时取消各调用方的等待"""
+        self._tasks.discard(task)
+        if task.cancelled():
+            for _, future in batch:
+                future.cancel()
+
+    async def _sign_batch(self, batch: List[Tuple[bytes, asyncio.Future]]) -> None:
+        try:
+            tree = MerkleTree([message for message, _ in batch])
+            root_message = construct_root_message(tree.root.hex(), tree.leaf_count)
+            signed = await self.sign(root_message)
+            verified = await self.verify(root_message, signed)
+        except Exception as e:
+            logger.error(f"Merkle attestation failed ({len(batch)} leaves): {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.roots += 1
+        self.leaves += len(batch)
+        logger.info(f"Signed Merkle root {tree.root.hex()[:16]}... over {tree.leaf_count} results")
+
+        for index, (_, future) in enumerate(batch):
+            if not future.done():
+                future.set_result({
+                    "leaf_index": index,
+                    "leaf_count": tree.leaf_count,
+                    "proof": [node.hex() for node in tree.proof(index)],
+                    "root": tree.root.hex(),
+                    "signed": signed,
+                    "verified": verified,
+                })
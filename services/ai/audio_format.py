@@ -0,0 +1,314 @@
+# audio_format.py - 音频格式探测与快速解码
+"""
+按文件头识别容器格式，只读头部就得到采样率、声道数和时长
+
+    OggS          Ogg（Opus / Vorbis / FLAC），时长取最后一页的 granule position
+    RIFF....WAVE  WAV，时长由 data 块大小计算
+    fLaC          FLAC，时长取 STREAMINFO 的总采样数
+    ID3 / 帧同步   MP3（时长未知，解码后再检查）
+    ....ftyp      MP4 / M4A，时长取 moov/mvhd
+    1A 45 DF A3   WebM / Matroska（时长未知）
+
+识别不了的数据以 UnsupportedAudio 拒绝，不再当作裸 int16 PCM 猜测。
+
+快速解码路径:
+    Ogg/Opus（Telegram 语音）  自带的 Ogg 解复用 + libopus 直接输出 16kHz 单声道 float32，
+                              不经过 48kHz 解码和重采样（可选依赖 opuslib + 系统 libopus）
+    PCM WAV                   numpy 直接读取 data 块
+其它格式（以及未安装 opuslib 时的 Opus）仍由 torchaudio 解码。
+
+Ogg 页的 CRC 不做校验（上传数据已经过 SHA-256 哈希，损坏的页在解码时报错）。
+"""
+
+import struct
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import opuslib
+except Exception:  # 未安装 opuslib，或系统缺少 libopus
+    opuslib = None
+
+OPUS_RATE = 48000
+# 单个 Opus 包最多 120ms
+OPUS_MAX_FRAME_MS = 120
+# 单个 Ogg 页的最大长度（27 字节页头 + 255 个段表项 + 255 * 255 字节数据）
+OGG_MAX_PAGE = 27 + 255 + 255 * 255
+
+
+class UnsupportedAudio(ValueError):
+    """无法识别或无法解码的音频数据"""
+
+
+@dataclass
+class AudioInfo:
+    """文件头中的音频信息（未知的字段为 None）"""
+    format: str                     # ogg_opus | ogg_vorbis | ogg_flac | wav | flac | mp3 | mp4 | webm
+    sample_rate: Optional[int] = None
+    channels: Optional[int] = None
+    duration_s: Optional[float] = None
+    pre_skip: int = 0               # Opus: 解码开头需要丢弃的 48kHz 采样数
+
+
+def probe(data: memoryview) -> AudioInfo:
+    """
+    识别音频格式并读取头部信息（不解码）
+
+    参数:
+        data: 完整的上传数据（BytesIO.getbuffer() 的视图，不复制）
+
+    异常:
+        UnsupportedAudio: 无法识别的格式或头部损坏
+    """
+    head = bytes(data[:12])
+    try:
+        if head[:4] == b"OggS":
+            return _probe_ogg(data)
+        if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+            return _probe_wav(data)[0]
+        if head[:4] == b"fLaC":
+            return _probe_flac(data)
+        if head[:3] == b"ID3" or (len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+            return AudioInfo("mp3")
+        if head[4:8] == b"ftyp":
+            return _probe_mp4(data)
+        if head[:4] == b"\x1a\x45\xdf\xa3":
+            return AudioInfo("webm")
+    except (struct.error, IndexError) as e:
+        raise UnsupportedAudio(f"Truncated audio header: {e}")
+    raise UnsupportedAudio("Unrecognized audio format")
+
+
+# ---------------------------------------------------------------- Ogg
+
+def _ogg_page(data: memoryview, pos: int) -> Tuple[int, int, List[int], int]:
+    """
+    解析 pos 处的 Ogg 页头
+
+    返回:
+        (granule position, 页头标志, 段表, 数据起始偏移)
+    """
+    if bytes(data[pos:pos + 4]) != b"OggS":
+        raise UnsupportedAudio(f"Corrupt Ogg stream at byte {pos}")
+    if len(data) < pos + 27:
+        raise UnsupportedAudio("Truncated Ogg page")
+    header_type, granule = struct.unpack_from("<Bq", data, pos + 5)
+    segments = data[pos + 26]
+    lacing = list(data[pos + 27:pos + 27 + segments])
+    if len(lacing) != segments:
+        raise UnsupportedAudio("Truncated Ogg page")
+    return granule, header_type, lacing, pos + 27 + segments
+
+
+def iter_ogg_packets(data: memoryview) -> Iterator[memoryview]:
+    """
+    Ogg 解复用: 按顺序产出第一个逻辑流的数据包
+
+    段长为 255 表示数据包延续到下一段（可能跨页）；不跨页的数据包直接以视图产出。
+    截断或损坏的页抛出 UnsupportedAudio（不会在迭代中途抛出 struct.error / IndexError）
+    """
+    serial = None
+    pending: List[memoryview] = []
+    pos = 0
+    while pos < len(data):
+        _, _, lacing, offset = _ogg_page(data, pos)
+        page_serial = struct.unpack_from("<I", data, pos + 14)[0]
+        if serial is None:
+            serial = page_serial
+        page_end = offset + sum(lacing)
+        if page_end > len(data):
+            raise UnsupportedAudio("Truncated Ogg page")
+        if page_serial != serial:
+            pos = page_end
+            continue
+
+        start = offset
+        for size in lacing:
+            pending.append(data[start:start + size])
+            start += size
+            if size < 255:
+                yield pending[0] if len(pending) == 1 else memoryview(b"".join(pending))
+                pending = []
+        pos = page_end
+
+
+def _last_granule(data: memoryview) -> int:
+    """最后一个 Ogg 页的 granule position（-1 表示未知）"""
+    tail_start = max(0, len(data) - OGG_MAX_PAGE)
+    tail = bytes(data[tail_start:])
+    pos = tail.rfind(b"OggS")
+    while pos >= 0:
+        if pos + 14 <= len(tail):
+            return struct.unpack_from("<q", tail, pos + 6)[0]
+        pos = tail.rfind(b"OggS", 0, pos)
+    return -1
+
+
+def _probe_ogg(data: memoryview) -> AudioInfo:
+    _, _, lacing, offset = _ogg_page(data, 0)
+    if offset + sum(lacing) > len(data):
+        raise UnsupportedAudio("Truncated Ogg page")
+    packet = bytes(data[offset:offset + sum(lacing)])
+    granule = _last_granule(data)
+
+    if packet[:8] == b"OpusHead":
+        channels, pre_skip = struct.unpack_from("<BH", packet, 9)
+        duration = (granule - pre_skip) / OPUS_RATE if granule > 0 else None
+        return AudioInfo("ogg_opus", OPUS_RATE, channels, duration, pre_skip)
+    if packet[:7] == b"\x01vorbis":
+        channels, rate = struct.unpack_from("<BI", packet, 11)
+        duration = granule / rate if granule > 0 and rate else None
+        return AudioInfo("ogg_vorbis", rate, channels, duration)
+    if packet[:5] == b"\x7fFLAC":
+        info = _parse_streaminfo(packet, 17)
+        info.format = "ogg_flac"
+        return info
+    raise UnsupportedAudio("Unsupported Ogg codec")
+
+
+# ---------------------------------------------------------------- WAV / FLAC / MP4
+
+def _probe_wav(data: memoryview) -> Tuple[AudioInfo, int, int, int, int]:
+    """
+    返回:
+        (AudioInfo, 编码格式, 位深, data 块起始偏移, data 块长度)
+    """
+    pos = 12
+    fmt = None
+    while pos + 8 <= len(data):
+        chunk_id = bytes(data[pos:pos + 4])
+        size = struct.unpack_from("<I", data, pos + 4)[0]
+        if chunk_id == b"fmt ":
+            fmt = struct.unpack_from("<HHIIHH", data, pos + 8)
+            # WAVE_FORMAT_EXTENSIBLE: 实际格式在子格式 GUID 的前两个字节
+            if fmt[0] == 0xFFFE and size >= 40:
+                fmt = (struct.unpack_from("<H", data, pos + 32)[0],) + fmt[1:]
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise UnsupportedAudio("WAV data chunk before fmt chunk")
+            codec, channels, rate, _, block_align, bits = fmt
+            # 流式写入的 WAV 可能没有回填 data 长度
+            size = min(size, len(data) - pos - 8) if size else len(data) - pos - 8
+            duration = size / block_align / rate if block_align and rate else None
+            return AudioInfo("wav", rate, channels, duration), codec, bits, pos + 8, size
+        pos += 8 + size + (size & 1)
+    raise UnsupportedAudio("WAV file has no data chunk")
+
+
+def _parse_streaminfo(data, offset: int) -> AudioInfo:
+    """解析 FLAC STREAMINFO（offset 指向 34 字节的块内容）"""
+    packed = int.from_bytes(bytes(data[offset + 10:offset + 18]), "big")
+    rate = packed >> 44
+    channels = ((packed >> 41) & 0x7) + 1
+    total = packed & 0xFFFFFFFFF
+    return AudioInfo("flac", rate, channels, total / rate if total and rate else None)
+
+
+def _probe_flac(data: memoryview) -> AudioInfo:
+    # fLaC 之后的第一个元数据块必须是 STREAMINFO（4 字节块头）
+    return _parse_streaminfo(data, 8)
+
+
+def _iter_boxes(data: memoryview, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """遍历 MP4 box，产出 (类型, 内容起始, box 结束)"""
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, pos)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            raise UnsupportedAudio("Corrupt MP4 box")
+        yield box_type, pos + header, min(pos + size, end)
+        pos += size
+
+
+def _probe_mp4(data: memoryview) -> AudioInfo:
+    for box_type, start, end in _iter_boxes(data, 0, len(data)):
+        if box_type != b"moov":
+            continue
+        for child, child_start, _ in _iter_boxes(data, start, end):
+            if child == b"mvhd":
+                if data[child_start] == 1:
+                    timescale, duration = struct.unpack_from(">IQ", data, child_start + 20)
+                else:
+                    timescale, duration = struct.unpack_from(">II", data, child_start + 12)
+                return AudioInfo("mp4", duration_s=duration / timescale if timescale else None)
+    return AudioInfo("mp4")
+
+
+# ---------------------------------------------------------------- 解码
+
+def opus_available() -> bool:
+    return opuslib is not None
+
+
+def decode_ogg_opus(data: memoryview, info: AudioInfo, target_rate: int = 16000) -> np.ndarray:
+    """
+    用 libopus 直接解码为 target_rate 单声道 float32
+
+    libopus 支持 8/12/16/24/48kHz 输出，立体声流在解码器内混为单声道，
+    不需要先解码成 48kHz 再重采样
+
+    参数:
+        data: 完整的 Ogg/Opus 数据
+        info: probe() 的结果
+        target_rate: 输出采样率（16000）
+    """
+    if opuslib is None:
+        raise RuntimeError("opuslib is not available")
+
+    ratio = OPUS_RATE // target_rate
+    max_frame = target_rate * OPUS_MAX_FRAME_MS // 1000
+    decoder = opuslib.Decoder(target_rate, 1)
+
+    packets = iter_ogg_packets(data)
+    # 前两个包是 OpusHead 与 OpusTags
+    for _ in range(2):
+        if next(packets, None) is None:
+            raise UnsupportedAudio("Ogg/Opus stream has no audio packets")
+
+    # 时长已知时预分配输出，逐包写入，不再拼接
+    total = int(info.duration_s * target_rate) if info.duration_s else 0
+    out = np.empty(total + info.pre_skip // ratio + max_frame, dtype=np.float32)
+    filled = 0
+    try:
+        for packet in packets:
+            pcm = np.frombuffer(decoder.decode_float(bytes(packet), max_frame), dtype=np.float32)
+            if filled + len(pcm) > len(out):
+                out = np.concatenate([out[:filled], np.empty(max(len(out), len(pcm)), dtype=np.float32)])
+            out[filled:filled + len(pcm)] = pcm
+            filled += len(pcm)
+    except (opuslib.OpusError, struct.error, IndexError) as e:
+        raise UnsupportedAudio(f"Corrupt Ogg/Opus stream: {e}")
+
+    # 去掉编码器预留的 pre-skip，按最后一页的 granule 截掉末尾填充
+    start = info.pre_skip // ratio
+    end = start + total if total else filled
+    return out[start:min(end, filled)]
+
+
+def read_wav_pcm(data: memoryview) -> Optional[Tuple[np.ndarray, float, int]]:
+    """
+    零复制读取 PCM WAV 的 data 块
+
+    返回:
+        ((frames, channels) 原始采样视图, 满幅值, 采样率)；非 PCM 编码返回 None（交给 torchaudio）
+        视图直接引用 data，转换为 float32 由调用方写入自己的缓冲区
+    """
+    info, codec, bits, offset, size = _probe_wav(data)
+    dtypes = {(1, 16): np.dtype("<i2"), (1, 32): np.dtype("<i4"), (3, 32): np.dtype("<f4")}
+    dtype = dtypes.get((codec, bits))
+    if dtype is None or not info.channels:
+        return None
+
+    frames = size // (dtype.itemsize * info.channels)
+    samples = np.frombuffer(data, dtype=dtype, count=frames * info.channels, offset=offset)
+    full_scale = float(2 ** (bits - 1)) if dtype.kind == "i" else 1.0
+    return samples.reshape(frames, info.channels), full_scale, info.sample_rate
+
@@ -0,0 +1,154 @@
+# audio_io.py - 音频上传读取
+"""
+分块读取上传的音频
+
+- 边读边更新 SHA-256，不需要先拼出完整的 bytes 再哈希
+- 请求体大小由 UploadSizeLimit 中间件在解析 multipart 表单之前检查: 声明的 Content-Length
+  超过上限直接 413，未声明长度时边接收边计数，超过上限即中止，超大上传不会被整个写入临时文件
+- 数据只写入一个 BytesIO，解码器直接读取它，不再额外复制
+
+配置（环境变量）:
+    MAX_UPLOAD_BYTES       上传大小上限（默认 20MB）
+    MAX_AUDIO_DURATION_S   音频时长上限（默认 600 秒）
+    MAX_STREAM_DURATION_S  流式分析（/analyze_stream）的音频时长上限（默认 3600 秒）
+"""
+
+import hashlib
+import io
+import os
+from dataclasses import dataclass
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+
+# 每次从上传流读取的块大小
+CHUNK_SIZE = 64 * 1024
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+MAX_AUDIO_DURATION_S = float(os.getenv("MAX_AUDIO_DURATION_S", "600"))
+MAX_STREAM_DURATION_S = float(os.getenv("MAX_STREAM_DURATION_S", "3600"))
+
+# multipart 边界、字段头等在音频数据之外的余量
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+@dataclass
+class UploadedAudio:
+    """读取完成的上传音频"""
+    buffer: io.BytesIO   # 完整音频数据（读指针已复位到开头）
+    audio_hash: str      # SHA-256 十六进制
+    size: int            # 字节数
+
+
+async def read_upload(upload: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> UploadedAudio:
+    """
+    分块读取上传文件，同时计算哈希并检查大小上限
+
+    参数:
+        upload: FastAPI 上传文件
+        max_bytes: 大小上限（字节）
+
+    返回:
+        UploadedAudio
+
+    异常:
+        HTTPException(413): 超过大小上限
+        HTTPException(400): 空文件
+    """
+    # UploadFile.size 在 Starlette 接收完整个表单后才有值（请求体此前已经过 UploadSizeLimit 的检查），
+    # 这里按音频本身的大小再检查一次，省去逐块读取
+    declared_size = getattr(upload, "size", None)
+    if declared_size is not None and declared_size > max_bytes:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Audio file too large ({declared_size} bytes, limit {max_bytes})"
+        )
+
+    hasher = hashlib.sha256()
+    buffer = io.BytesIO()
+    size = 0
+
+    while True:
+        chunk = await upload.read(CHUNK_SIZE)
+        if not chunk:
+            break
+
+        size += len(chunk)
+        if size > max_bytes:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Audio file too large (limit {max_bytes} bytes)"
+            )
+
+        hasher.update(chunk)
+        buffer.write(chunk)
+
+    if size == 0:
+        raise HTTPException(status_code=400, detail="Empty audio file")
+
+    buffer.seek(0)
+    return UploadedAudio(buffer=buffer, audio_hash=hasher.hexdigest(), size=size)
+
+
+class UploadSizeLimit:
+    """
+    ASGI 中间件: 在解析 multipart 表单之前限制请求体大小
+
+    Starlette 解析表单时会先把整个请求体写入临时文件，read_upload 只能在接收完成后检查，
+    因此请求体大小在这里、路由读取表单之前检查:
+    - Content-Length 超过上限: 直接返回 413，不读取请求体
+    - 未声明长度（chunked）: 边接收边计数，超过上限时停止接收并返回 413
+
+    参数:
+        app: 下游 ASGI 应用
+        max_bytes: 请求体上限（默认 MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD）
+    """
+
+    def __init__(self, app, max_bytes: int = MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        if not headers.get(b"content-type", b"").startswith(b"multipart/form-data"):
+            await self.app(scope, receive, send)
+            return
+
+        declared = headers.get(b"content-length", b"")
+        if declared.isdigit() and int(declared) > self.max_bytes:
+            response = JSONResponse(
+                status_code=413,
+                content={"detail": f"Request body too large ({int(declared)} bytes, limit {self.max_bytes})"},
+            )
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # 表单解析中抛出的 HTTPException 由 FastAPI 原样转为 413 响应
+                    raise HTTPException(
+                        status_code=413, detail=f"Request body too large (limit {self.max_bytes} bytes)"
+                    )
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def check_duration(num_samples: int, sample_rate: int = 16000,
+                   max_duration_s: float = MAX_AUDIO_DURATION_S) -> None:
+    """解码后检查音频时长，超过上限以 413 拒绝"""
+    duration = num_samples / float(sample_rate)
+    if duration > max_duration_s:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Audio too long ({duration:.1f}s, limit {max_duration_s:.0f}s)"
+        )
@@ -0,0 +1,172 @@
+# backends.py - CPU 推理后端
+"""
+SenseVoice / CAM++ 的可插拔推理后端（AI 节点只有 CPU）
+
+    torch   FunASR 原始 PyTorch 模型（默认）
+    int8    PyTorch 动态 int8 量化: nn.Linear 权重存为 int8，激活在运行时量化。
+            SenseVoice 的 SANM 编码器以 Linear 为主，收益明显；
+            CAM++ 主要是卷积层，动态量化覆盖不到，收益有限
+    onnx    funasr_onnx 导出的 ONNX 模型，onnxruntime 推理（仅 SenseVoice，
+            可选依赖 funasr-onnx + onnxruntime；VAD 仍使用 FunASR 的 FSMN 模型）
+
+量化/导出后的输出可能与原模型有细微差别，上线前用
+    python benchmark.py backends --clips <目录>
+做一致性检查（情感标签一致率、转写字错率、声纹余弦相似度）。
+
+配置（环境变量）:
+    SENSEVOICE_BACKEND   torch | int8 | onnx（默认 torch）
+    CAMPP_BACKEND        torch | int8（默认 torch）
+    ONNX_QUANTIZE        onnx 后端是否使用 int8 量化的 model_quant.onnx（默认 1）
+"""
+
+import logging
+import os
+import threading
+import weakref
+from typing import Any, List, Sequence
+
+import numpy as np
+import torch
+
+logger = logging.getLogger(__name__)
+
+SENSEVOICE_BACKENDS = ("torch", "int8", "onnx")
+CAMPP_BACKENDS = ("torch", "int8")
+
+
+def backend_from_env(variable: str, allowed: Sequence[str], default: str = "torch") -> str:
+    """读取并校验后端配置"""
+    backend = os.getenv(variable, default).lower()
+    if backend not in allowed:
+        raise ValueError(f"Unsupported {variable}={backend} (expected one of {', '.join(allowed)})")
+    return backend
+
+
+def quantize_int8(automodel: Any) -> int:
+    """
+    对 FunASR AutoModel 内部的 nn.Module 做动态 int8 量化（原地替换）
+
+    返回:
+        被量化的 Linear 层数量
+    """
+    module = automodel.model
+    linear_count = sum(1 for m in module.modules() if isinstance(m, torch.nn.Linear))
+    automodel.model = torch.ao.quantization.quantize_dynamic(
+        module, {torch.nn.Linear}, dtype=torch.qint8
+    )
+    if linear_count == 0:
+        logger.warning(f"{type(module).__name__} has no Linear layers; int8 backend has no effect")
+    else:
+        logger.info(f"Quantized {linear_count} Linear layers of {type(module).__name__} to int8")
+    return linear_count
+
+
+# ---------------------------------------------------------------- FunASR AutoModel 的并发调用
+#
+# AutoModel.generate / inference 会把每次调用的参数（batch_size、language 等）合并进模型共享的
+# self.kwargs 再读取；generate 之前还会按 kwargs["ncpu"]（默认 4）调用 torch.set_num_threads。
+# thread 模式下多个工作线程并发调用同一个 AutoModel 会互相覆盖参数，外部设置的线程数也会被改回去。
+
+_model_locks: "weakref.WeakKeyDictionary[Any, threading.Lock]" = weakref.WeakKeyDictionary()
+_model_locks_guard = threading.Lock()
+
+
+def model_lock(automodel: Any) -> threading.Lock:
+    """
+    AutoModel 的调用锁
+
+    经过 VAD 的 generate 在内部读写共享配置，必须持锁调用；其余调用用 funasr_inference
+    """
+    with _model_locks_guard:
+        lock = _model_locks.get(automodel)
+        if lock is None:
+            lock = _model_locks[automodel] = threading.Lock()
+        return lock
+
+
+def funasr_inference(automodel: Any, audio: Any, model: Any = None, config: str = "kwargs", **cfg) -> List[dict]:
+    """
+    并发安全地调用 AutoModel.inference（不经过 VAD）
+
+    每次传入配置的浅拷贝，本次调用的参数只合并进拷贝；拷贝在 model_lock 下进行，
+    不会读到 generate 合并到一半的配置。同一个模型的推理可以在多个线程中并行
+
+    参数:
+        automodel: FunASR AutoModel
+        audio: 输入（波形或波形列表）
+        model: 子模型（如 automodel.vad_model；默认主模型）
+        config: 配置属性名（子模型对应 vad_kwargs 等）
+        **cfg: 本次调用的参数
+    """
+    with model_lock(automodel):
+        kwargs = dict(getattr(automodel, config))
+    return automodel.inference(audio, model=model, kwargs=kwargs, **cfg)
+
+
+def set_funasr_threads(automodel: Any, threads: int) -> None:
+    """
+    把 AutoModel 的 ncpu 设为 threads
+
+    funasr 每次推理前按 ncpu 重设 torch 线程数，只调用 torch.set_num_threads 会在下一次推理时被改回去；
+    主模型与子模型（vad_kwargs 等）的配置以及 funasr 保存的基线配置都要修改
+    """
+    configs = [value for name, value in vars(automodel).items() if name.endswith("kwargs") and isinstance(value, dict)]
+    configs += [value for value in (getattr(automodel, "_base_kwargs_map", None) or {}).values() if isinstance(value, dict)]
+    for config in configs:
+        config["ncpu"] = threads
+
+
+class TorchSenseVoice:
+    """FunASR AutoModel 批量推理（不经过 VAD）"""
+
+    name = "torch"
+
+    def __init__(self, automodel: Any):
+        self.model = automodel
+
+    def transcribe(self, audio_arrays: List[np.ndarray]) -> List[str]:
+        """
+        参数:
+            audio_arrays: 16kHz 单声道波形列表
+
+        返回:
+            带 <|lang|><|EMO|><|Event|> 标签的原始文本列表
+        """
+        result = funasr_inference(
+            self.model,
+            audio_arrays,
+            language="auto",
+            use_itn=True,
+            batch_size=len(audio_arrays),
+        )
+        return [item["text"] for item in result]
+
+
+class OnnxSenseVoice:
+    """funasr_onnx 的 SenseVoiceSmall（onnxruntime，输出格式与 FunASR 相同）"""
+
+    name = "onnx"
+
+    def __init__(self, model_dir: str, quantize: bool = True):
+        """
+        参数:
+            model_dir: 模型目录或 ModelScope 模型 id（首次使用时导出 ONNX）
+            quantize: 是否使用 model_quant.onnx
+        """
+        try:
+            from funasr_onnx import SenseVoiceSmall
+        except ImportError as e:
+            raise ImportError("SENSEVOICE_BACKEND=onnx requires `pip install funasr-onnx onnxruntime`") from e
+
+        self.model = SenseVoiceSmall(model_dir, batch_size=1, quantize=quantize)
+
+    @classmethod
+    def from_env(cls, model_dir: str) -> "OnnxSenseVoice":
+        return cls(model_dir, quantize=os.getenv("ONNX_QUANTIZE", "1") != "0")
+
+    def transcribe(self, audio_arrays: List[np.ndarray]) -> List[str]:
+        # funasr_onnx 的列表输入只接受文件路径，逐条推理
+        return [
+            self.model(audio, language="auto", textnorm="withitn")[0]
+            for audio in audio_arrays
+        ]
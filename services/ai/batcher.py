@@ -0,0 +1,170 @@
+# batcher.py - 动态微批处理
+"""
+把并发到达的 /analyze 请求合并成一次批量推理
+
+活动现场一波语音同时涌入时，逐条调用 SenseVoice 会浪费大量 CPU。
+MicroBatcher 收集请求，直到满足以下任一条件才触发一次批量推理：
+
+- 等待时间达到 max_wait_ms
+- 累计音频时长达到 max_batch_audio_s
+- 请求数达到 max_batch_size
+
+批量结果按顺序拆分，分别返回给各自的调用方。
+
+配置（环境变量）:
+    BATCH_MAX_WAIT_MS     最长等待时间（默认 20ms，0 表示不等待）
+    BATCH_MAX_AUDIO_S     单批最大音频总时长（默认 120s）
+    BATCH_MAX_SIZE        单批最大请求数（默认 16）
+"""
+
+import asyncio
+import functools
+import logging
+import os
+from typing import Any, Awaitable, Callable, List, Optional, Set, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+
+
+class MicroBatcher:
+    """基于 asyncio 的微批调度器"""
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[np.ndarray]], Awaitable[List[Any]]],
+        max_wait_ms: float = 20,
+        max_batch_audio_s: float = 120,
+        max_batch_size: int = 16,
+    ):
+        """
+        参数:
+            run_batch: 批量推理协程，输入波形列表，返回等长的结果列表
+            max_wait_ms: 最长等待时间（毫秒）
+            max_batch_audio_s: 单批最大音频总时长（秒）
+            max_batch_size: 单批最大请求数
+        """
+        self.run_batch = run_batch
+        self.max_wait_s = max_wait_ms / 1000.0
+        self.max_batch_samples = int(max_batch_audio_s * SAMPLE_RATE)
+        self.max_batch_size = max_batch_size
+
+        self._pending: List[Tuple[np.ndarray, asyncio.Future]] = []
+        self._pending_samples = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # 进行中的批次（事件循环只保留任务的弱引用，这里持有强引用直到完成）
+        self._tasks: Set[asyncio.Task] = set()
+
+        # 统计信息
+        self.batches = 0
+        self.items = 0
+
+    @classmethod
+    def from_env(cls, run_batch: Callable[[List[np.ndarray]], Awaitable[List[Any]]]) -> "MicroBatcher":
+        """从环境变量构造调度器"""
+        return cls(
+            run_batch,
+            max_wait_ms=float(os.getenv("BATCH_MAX_WAIT_MS", "20")),
+            max_batch_audio_s=float(os.getenv("BATCH_MAX_AUDIO_S", "120")),
+            max_batch_size=int(os.getenv("BATCH_MAX_SIZE", "16")),
+        )
+
+    async def submit(self, audio_array: np.ndarray) -> Any:
+        """
+        提交一段 16kHz 波形，等待所在批次完成后返回它自己的结果
+
+        参数:
+            audio_array: 预处理后的波形
+
+        返回:
+            run_batch 为该波形产生的结果
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        # 单条就超过上限的长音频直接独立成批
+        if len(audio_array) >= self.max_batch_samples:
+            self._dispatch([(audio_array, future)])
+            return await future
+
+        # 加入后会超过时长上限：先把已有的发出去
+        if self._pending and self._pending_samples + len(audio_array) > self.max_batch_samples:
+            self._flush()
+
+        self._pending.append((audio_array, future))
+        self._pending_samples += len(audio_array)
+
+        if len(self._pending) >= self.max_batch_size or self.max_wait_s <= 0:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_s, self._flush)
+
+        return await future
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "pending": len(self._pending),
+            "running": len(self._tasks),
+        }
+
+    async def drain(self) -> None:
+        """发出等待中的请求，并等待所有进行中的批次完成（服务关闭时在关闭工作池之前调用）"""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _flush(self) -> None:
+        """把当前等待中的请求作为一个批次发出"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        if not self._pending:
+            return
+
+        batch = self._pending
+        self._pending = []
+        self._pending_samples = 0
+        self._dispatch(batch)
+
+    def _dispatch(self, batch: List[Tuple[np.ndarray, asyncio.Future]]) -> None:
+        self.batches += 1
+        self.items += len(batch)
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(functools.partial(self._finish, batch))
+
+    def _finish(self, batch: List[Tuple[np.ndarray, asyncio.Future]], task: asyncio.Task) -> None:
+        """批次任务结束: 释放引用；任务被取消（包括尚未开始执行就被取消）时取消各调用方的等待"""
+        self._tasks.discard(task)
+        if task.cancelled():
+            for _, future in batch:
+                future.cancel()
+
+    async def _run(self, batch: List[Tuple[np.ndarray, asyncio.Future]]) -> None:
+        """执行一个批次，并把结果/异常分发给各个调用方"""
+        arrays = [audio for audio, _ in batch]
+        try:
+            results = await self.run_batch(arrays)
+            if len(results) != len(batch):
+                raise RuntimeError(
+                    f"Batch returned {len(results)} results for {len(batch)} inputs"
+                )
+        except Exception as e:
+            logger.error(f"Batch inference failed ({len(batch)} items): {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        logger.info(f"Batch inference complete: {len(batch)} items")
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
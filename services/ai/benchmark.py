@@ -0,0 +1,592 @@
+#!/usr/bin/env python3
+# benchmark.py - 性能基准测试
+"""
+AI 服务各组件的性能基准
+
+用法:
+    python benchmark.py bls-batch [--n 32]
+    python benchmark.py bls-pubkey [--n 32]
+    python benchmark.py preprocess [--n 32]
+    python benchmark.py decode [--clips DIR] [--n 32]
+    python benchmark.py voiceprint-index [--n 32] [--sizes 10000,100000,1000000]
+    python benchmark.py embedding-codec [--n 32]
+    python benchmark.py backends [--clips DIR] [--backends torch,int8,onnx] [--n 3]
+    python benchmark.py prefork [--workers 1,2,4,8] [--seconds 20] [--endpoint /analyze]
+    python benchmark.py long-audio [--clips DIR] [--duration 300] [--workers 1,2,4,8]
+"""
+
+import argparse
+import secrets
+import sys
+import time
+
+
+def _timed(fn, *args):
+    """执行一次并返回 (结果, 耗时秒)"""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def bench_bls_batch(args):
+    """逐条 bls.Verify 与 BLSSigner.batch_verify 对比"""
+    from py_ecc.bls import G2ProofOfPossession as bls
+    from py_ecc.optimized_bls12_381 import curve_order
+    from bls_signer import BLSSigner
+
+    print("=" * 60)
+    print(f"BLS verification: loop vs batch_verify (n={args.n})")
+    print("=" * 60)
+
+    signers = [BLSSigner(hex(secrets.randbelow(curve_order - 1) + 1)) for _ in range(3)]
+    entries = []
+    for i in range(args.n):
+        signer = signers[i % len(signers)]
+        message = secrets.token_bytes(32)
+        entries.append((signer.pk, message, signer.sign_message(message)))
+
+    loop_results, loop_time = _timed(lambda: [bls.Verify(*entry) for entry in entries])
+    batch_results, batch_time = _timed(BLSSigner.batch_verify, entries)
+    assert all(loop_results) and all(batch_results)
+
+    print(f"  loop bls.Verify:     {loop_time:8.2f}s  ({loop_time / args.n * 1000:.0f} ms/sig)")
+    print(f"  batch_verify:        {batch_time:8.2f}s  ({batch_time / args.n * 1000:.0f} ms/sig)")
+    print(f"  speedup:             {loop_time / batch_time:8.2f}x")
+
+    # 混入一条坏签名，测试二分定位的开销
+    bad_index = args.n // 2
+    pk, message, _ = entries[bad_index]
+    entries[bad_index] = (pk, message, entries[0][2])
+    bad_results, bad_time = _timed(BLSSigner.batch_verify, entries)
+    assert [i for i, ok in enumerate(bad_results) if not ok] == [bad_index]
+    print(f"  batch_verify (1 bad): {bad_time:7.2f}s  (bisected to index {bad_index})")
+
+
+def bench_bls_pubkey(args):
+    """公钥解压 + KeyValidate 缓存的收益"""
+    from py_ecc.bls import G2ProofOfPossession as bls
+    from py_ecc.optimized_bls12_381 import curve_order
+    from bls_signer import BLSSigner, load_public_key, aggregate_public_key
+
+    print("=" * 60)
+    print(f"BLS public key cache (n={args.n})")
+    print("=" * 60)
+
+    signers = [BLSSigner(hex(secrets.randbelow(curve_order - 1) + 1)) for _ in range(3)]
+    public_keys = [signer.pk for signer in signers]
+
+    # 单独的公钥解压 + 校验
+    load_public_key.cache_clear()
+    _, cold = _timed(lambda: [bls.KeyValidate(pk) for _ in range(args.n) for pk in public_keys])
+    BLSSigner.register_validator_set(public_keys)
+    _, warm = _timed(lambda: [load_public_key(pk) for _ in range(args.n) for pk in public_keys])
+    count = args.n * len(public_keys)
+    print(f"  KeyValidate uncached: {cold / count * 1000:8.2f} ms/key")
+    print(f"  load_public_key hit:  {warm / count * 1000:8.4f} ms/key")
+
+    # 端到端单签名验证
+    message = secrets.token_bytes(32)
+    signature = signers[0].sign_message(message)
+    _, uncached = _timed(lambda: [bls.Verify(public_keys[0], message, signature) for _ in range(args.n)])
+    _, cached = _timed(lambda: [BLSSigner.verify_signature(public_keys[0], message, signature) for _ in range(args.n)])
+    print(f"  bls.Verify:           {uncached / args.n * 1000:8.0f} ms/verify")
+    print(f"  verify_signature:     {cached / args.n * 1000:8.0f} ms/verify  ({uncached / cached:.2f}x)")
+
+    # 聚合签名验证（预先计算的聚合公钥）
+    aggregated = BLSSigner.aggregate_signatures([signer.sign_message(message) for signer in signers])
+    aggregate_public_key.cache_clear()
+    load_public_key.cache_clear()
+    _, agg_cold = _timed(BLSSigner.aggregate_verify, public_keys, message, aggregated)
+    _, agg_warm = _timed(BLSSigner.aggregate_verify, public_keys, message, aggregated)
+    print(f"  aggregate_verify cold: {agg_cold * 1000:7.0f} ms")
+    print(f"  aggregate_verify warm: {agg_warm * 1000:7.0f} ms")
+
+
+def bench_preprocess(args):
+    """每个请求的预处理耗时: 旧实现（每次新建 Resample + numpy 往返）vs AudioPreprocessor"""
+    import numpy as np
+    import torch
+    import torchaudio
+    from preprocess import AudioPreprocessor, SilenceGate
+
+    def legacy(waveform, sample_rate):
+        audio_array = waveform.numpy()
+        if len(audio_array.shape) > 1 and audio_array.shape[0] > 1:
+            audio_array = audio_array.mean(axis=0)
+        else:
+            audio_array = audio_array.squeeze()
+        resampler = torchaudio.transforms.Resample(sample_rate, 16000)
+        audio_tensor = torch.from_numpy(audio_array).float()
+        if len(audio_tensor.shape) == 1:
+            audio_tensor = audio_tensor.unsqueeze(0)
+        return resampler(audio_tensor).squeeze().numpy()
+
+    print("=" * 60)
+    print(f"Preprocessing: legacy vs AudioPreprocessor (n={args.n})")
+    print("=" * 60)
+
+    preprocessor = AudioPreprocessor()
+    for sample_rate, channels, seconds in [(48000, 1, 5), (48000, 2, 5), (44100, 2, 30)]:
+        waveform = torch.randn(channels, sample_rate * seconds) * 0.1
+        expected = legacy(waveform, sample_rate)
+        assert np.allclose(expected, preprocessor.to_model_input(waveform, sample_rate), atol=1e-5)
+
+        _, legacy_time = _timed(lambda: [legacy(waveform, sample_rate) for _ in range(args.n)])
+        _, cached_time = _timed(lambda: [preprocessor.to_model_input(waveform, sample_rate) for _ in range(args.n)])
+        print(f"  {sample_rate}Hz x{channels} {seconds:>2}s: legacy {legacy_time / args.n * 1000:7.2f} ms"
+              f"  cached {cached_time / args.n * 1000:7.2f} ms  ({legacy_time / cached_time:.2f}x)")
+
+    # 静音裁剪的开销（相对一次 SenseVoice 推理可以忽略）
+    gate = SilenceGate()
+    rng = np.random.default_rng(0)
+    for seconds in (5, 60, 600):
+        audio = (rng.standard_normal(seconds * 16000) * 0.001).astype(np.float32)
+        audio[16000:len(audio) - 16000] += 0.1 * np.sin(np.arange(len(audio) - 32000) / 10).astype(np.float32)
+        start, end, speech_s = gate.measure(audio)
+        assert abs(start - (16000 - gate.padding)) <= gate.frame and abs(speech_s - (seconds - 2)) <= 0.05
+        _, gate_time = _timed(lambda: [gate.measure(audio) for _ in range(args.n)])
+        print(f"  silence gate {seconds:>3}s: {gate_time / args.n * 1000:7.2f} ms  (trimmed {(len(audio) - (end - start)) / 16000:.1f}s)")
+
+
+def bench_voiceprint_index(args):
+    """VoiceprintIndex 的 1:N 检索延迟（与逐个 calculate_similarity 对比）"""
+    import numpy as np
+    from voiceprint_index import VoiceprintIndex
+
+    print("=" * 60)
+    print(f"Voiceprint index top-5 search ({args.n} queries per size)")
+    print("=" * 60)
+
+    rng = np.random.default_rng(0)
+    dim = 192
+    queries = rng.standard_normal((args.n, dim)).astype(np.float32)
+
+    # 基线: 逐个比较（只测前 1000 条，按线性外推）
+    try:
+        from analyzer import SpeakerVerifier
+        sample = rng.standard_normal((1000, dim)).astype(np.float32)
+        _, loop_time = _timed(lambda: [SpeakerVerifier.calculate_similarity(queries[0], row) for row in sample])
+        per_row = loop_time / len(sample)
+    except ImportError:
+        per_row = None
+
+    for size in [int(s) for s in args.sizes.split(",")]:
+        index = VoiceprintIndex(dim=dim, capacity=size)
+        ids = [f"user_{i}" for i in range(size)]
+        _, build_time = _timed(index.add_many, ids, rng.standard_normal((size, dim), dtype=np.float32))
+
+        index.search(queries[0])  # 预热
+        latencies = []
+        for query in queries:
+            _, elapsed = _timed(index.search, query, 5)
+            latencies.append(elapsed * 1000)
+
+        line = (f"  {size:>9,} x {dim}: build {build_time:6.2f}s"
+                f"  search p50 {np.percentile(latencies, 50):8.2f} ms  p95 {np.percentile(latencies, 95):8.2f} ms")
+        if per_row is not None:
+            line += f"  (loop est. {per_row * size * 1000:10.0f} ms)"
+        print(line)
+        del index
+
+
+def bench_embedding_codec(args):
+    """各声纹编码的负载大小、编解码（含 JSON 序列化）耗时与相似度误差"""
+    import json
+    import numpy as np
+    from embedding_codec import ENCODINGS, decode_embedding, encode_embedding
+
+    print("=" * 60)
+    print(f"Embedding wire formats (192-dim, n={args.n})")
+    print("=" * 60)
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.n, 192)).astype(np.float32)
+
+    def round_trip(encoding):
+        return [decode_embedding(json.loads(json.dumps(encode_embedding(v, encoding)))) for v in vectors]
+
+    baseline = None
+    for encoding in ENCODINGS:
+        size = len(json.dumps(encode_embedding(vectors[0], encoding)))
+        decoded, elapsed = _timed(round_trip, encoding)
+        decoded = np.stack(decoded)
+        cosine = np.sum(decoded * vectors, axis=1) / (np.linalg.norm(decoded, axis=1) * np.linalg.norm(vectors, axis=1))
+        per_item = elapsed / args.n * 1e6
+        baseline = baseline or per_item
+        print(f"  {encoding:>5}: {size:5d} bytes  round trip {per_item:7.1f} us ({baseline / per_item:5.2f}x)"
+              f"  max cosine err {float(np.max(np.abs(1 - cosine))):.1e}")
+
+
+def _edit_distance(a: str, b: str) -> int:
+    """字符级编辑距离"""
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def _load_clips(directory):
+    """读取固定的评测音频集（按文件名排序）；未指定目录时生成确定性的合成音频"""
+    import glob
+    import os
+    import numpy as np
+    from preprocess import decode_audio
+
+    if directory:
+        paths = sorted(
+            path for path in glob.glob(os.path.join(directory, "*"))
+            if path.rsplit(".", 1)[-1].lower() in ("wav", "ogg", "oga", "opus", "mp3", "m4a", "flac")
+        )
+        if not paths:
+            raise SystemExit(f"No audio clips found in {directory}")
+        clips = []
+        for path in paths:
+            with open(path, "rb") as f:
+                clips.append((os.path.basename(path), decode_audio(f)))
+        return clips
+
+    print("  ⚠️  no --clips given: using synthetic clips (parity numbers are not meaningful for accuracy)")
+    rng = np.random.default_rng(0)
+    clips = []
+    for seconds in (2, 5, 10, 45):
+        t = np.arange(seconds * 16000) / 16000
+        audio = 0.1 * np.sin(2 * np.pi * 220 * t) * (rng.random(t.shape) > 0.3) + 0.01 * rng.standard_normal(t.shape)
+        clips.append((f"synthetic_{seconds}s", audio.astype(np.float32)))
+    return clips
+
+
+def bench_backends(args):
+    """
+    推理后端一致性检查 + 延迟/吞吐对比（以 torch 为基准）
+
+    一致性门限: 情感标签一致率 >= 95%，平均字错率 <= 5%，声纹余弦相似度 >= 0.99
+    任一候选后端不达标时返回非零退出码
+    """
+    import gc
+    import numpy as np
+    from analyzer import EmotionAnalyzer, SpeakerVerifier
+    from backends import CAMPP_BACKENDS, SENSEVOICE_BACKENDS
+
+    print("=" * 60)
+    print("Inference backends: parity vs torch + latency")
+    print("=" * 60)
+
+    clips = _load_clips(args.clips)
+    audio_s = sum(len(audio) for _, audio in clips) / 16000
+    print(f"  {len(clips)} clips, {audio_s:.1f}s audio, {args.n} timed runs each")
+    backends = ["torch"] + [b for b in args.backends.split(",") if b and b != "torch"]
+
+    def time_runs(fn):
+        fn()  # 预热
+        timings = [_timed(fn)[1] for _ in range(args.n)]
+        return float(np.median(timings))
+
+    failed = False
+    reference = {}
+    print("\n  SenseVoice")
+    for backend in [b for b in backends if b in SENSEVOICE_BACKENDS]:
+        try:
+            analyzer = EmotionAnalyzer(backend=backend)
+        except ImportError as e:
+            print(f"    {backend:>5}: skipped ({e})")
+            continue
+
+        results = analyzer.analyze_batch([audio for _, audio in clips])
+        per_clip = time_runs(lambda: [analyzer.analyze_batch([audio]) for _, audio in clips])
+        batched = time_runs(lambda: analyzer.analyze_batch([audio for _, audio in clips]))
+        line = (f"    {backend:>5}: sequential {per_clip:7.2f}s (RTF {per_clip / audio_s:.3f})"
+                f"  batched {batched:7.2f}s ({audio_s / batched:6.1f}x realtime)")
+
+        if backend == "torch":
+            reference["sensevoice"] = results
+        else:
+            base = reference["sensevoice"]
+            agree = np.mean([r["emotion"] == b["emotion"] for r, b in zip(results, base)])
+            cer = np.mean([
+                _edit_distance(r["raw_text"], b["raw_text"]) / max(1, len(b["raw_text"]))
+                for r, b in zip(results, base)
+            ])
+            ok = agree >= 0.95 and cer <= 0.05
+            failed |= not ok
+            line += f"  emotion agree {agree:6.1%}  CER {cer:6.2%}  {'PASS' if ok else 'FAIL'}"
+        print(line)
+        del analyzer
+        gc.collect()
+
+    print("\n  CAM++")
+    for backend in [b for b in backends if b in CAMPP_BACKENDS]:
+        verifier = SpeakerVerifier(backend=backend)
+        embeddings = np.stack([verifier.embed_waveform(audio) for _, audio in clips])
+        latency = time_runs(lambda: [verifier.embed_waveform(audio) for _, audio in clips])
+        line = f"    {backend:>5}: {latency / len(clips) * 1000:8.1f} ms/clip (RTF {latency / audio_s:.3f})"
+
+        if backend == "torch":
+            reference["campplus"] = embeddings
+        else:
+            cosine = np.diag(SpeakerVerifier.similarity_matrix(embeddings, reference["campplus"]))
+            ok = float(cosine.min()) >= 0.99
+            failed |= not ok
+            line += f"  cosine min {cosine.min():.4f} mean {cosine.mean():.4f}  {'PASS' if ok else 'FAIL'}"
+        print(line)
+        del verifier
+        gc.collect()
+
+    return 1 if failed else 0
+
+
+def _process_tree_memory(root_pid):
+    """进程树的 RSS 之和与 PSS 之和（MB，Linux /proc）；PSS 按共享页均摊，反映真实占用"""
+    import os
+
+    pids = [root_pid]
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/task/{pid}/children") as f:
+                pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+
+    rss = pss = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/smaps_rollup") as f:
+                for line in f:
+                    if line.startswith("Rss:"):
+                        rss += int(line.split()[1])
+                    elif line.startswith("Pss:"):
+                        pss += int(line.split()[1])
+        except OSError:
+            pass
+    return len(pids), rss / 1024, pss / 1024
+
+
+def bench_prefork(args):
+    """pre-fork 多 worker 模式: 各 worker 数下的内存（RSS / PSS）与吞吐"""
+    import asyncio
+    import io
+    import os
+    import signal
+    import socket
+    import subprocess
+    import wave
+    import httpx
+    import numpy as np
+
+    print("=" * 60)
+    print(f"Pre-fork workers: memory and {args.endpoint} throughput ({args.seconds}s per run)")
+    print("=" * 60)
+
+    def make_clip(seed):
+        # 每个请求的音频都不同，避免命中缓存
+        rng = np.random.default_rng(seed)
+        t = np.arange(16000 * 3) / 16000
+        audio = 0.3 * np.sin(2 * np.pi * (150 + seed % 200) * t) + 0.01 * rng.standard_normal(t.shape)
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(16000)
+            w.writeframes((audio * 32767).astype(np.int16).tobytes())
+        return buffer.getvalue()
+
+    async def load(url, concurrency, seconds):
+        counter = {"ok": 0, "failed": 0, "seed": 0}
+        deadline = time.perf_counter() + seconds
+
+        async def client_loop(client):
+            while time.perf_counter() < deadline:
+                counter["seed"] += 1
+                files = {"audio": ("clip.wav", make_clip(counter["seed"]), "audio/wav")}
+                response = await client.post(url + args.endpoint, files=files)
+                counter["ok" if response.status_code == 200 else "failed"] += 1
+
+        async with httpx.AsyncClient(timeout=120) as client:
+            await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        return counter
+
+    def wait_ready(url, process, workers):
+        # 连续多次就绪才认为所有 worker 都已启动
+        streak = 0
+        deadline = time.time() + 600
+        while streak < workers * 3 and time.time() < deadline and process.poll() is None:
+            try:
+                streak = streak + 1 if httpx.get(url + "/health/ready", timeout=5).status_code == 200 else 0
+            except httpx.HTTPError:
+                streak = 0
+            time.sleep(0.2)
+        return streak >= workers * 3
+
+    for workers in [int(w) for w in args.workers.split(",")]:
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        url = f"http://127.0.0.1:{port}"
+        env = dict(os.environ, AI_WORKERS=str(workers), AI_PORT=str(port),
+                   ANALYSIS_CACHE_SIZE="0", WAVEFORM_CACHE_MB="0")
+
+        started = time.perf_counter()
+        process = subprocess.Popen([sys.executable, "app.py"], env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            if not wait_ready(url, process, workers):
+                print(f"  {workers} workers: failed to become ready")
+                continue
+            ready_s = time.perf_counter() - started
+            processes, rss, pss = _process_tree_memory(process.pid)
+
+            counter = asyncio.run(load(url, max(2, workers * 2), args.seconds))
+            print(f"  {workers} workers: ready {ready_s:6.1f}s  {processes:2d} procs"
+                  f"  RSS {rss:8.0f} MB  PSS {pss:8.0f} MB"
+                  f"  {counter['ok'] / args.seconds:7.2f} req/s  ({counter['failed']} failed)")
+        finally:
+            process.send_signal(signal.SIGTERM)
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def bench_long_audio(args):
+    """
+    长音频推理: 单次 generate（VAD + merge_vad，一个 worker）与分段并行对比
+
+    --executors 选择参与对比的工作池模式（LONG_AUDIO_PARALLEL 留空时只在 process 模式下开启）
+
+    评测音频由 --clips 中的片段（间隔 0.5 秒静音）循环拼接到 --duration 秒
+    """
+    import asyncio
+    import os
+    import numpy as np
+    import inference_pool as pool_registry
+    from analyzer import EmotionAnalyzer
+    from inference_pool import InferencePool
+
+    print("=" * 60)
+    print("Long audio: single generate vs segment-parallel")
+    print("=" * 60)
+
+    clips = [audio for _, audio in _load_clips(args.clips)]
+    gap = np.zeros(8000, dtype=np.float32)
+    parts, target = [], int(args.duration * 16000)
+    while sum(len(part) for part in parts) < target:
+        parts += [clips[len(parts) // 2 % len(clips)], gap]
+    recording = np.concatenate(parts)[:target].astype(np.float32)
+    print(f"  {len(recording) / 16000:.0f}s recording, {os.cpu_count()} cores")
+
+    analyzer = EmotionAnalyzer()
+    analyzer.analyze_batch([recording[:16000]])  # 预热
+    reference, baseline = _timed(lambda: analyzer.analyze_batch([recording])[0])
+    print(f"  generate : {baseline:7.2f}s (RTF {baseline / args.duration:.3f})")
+
+    async def parallel(pool):
+        segments = await pool.submit("emotion_analyzer", "detect_segments", recording)
+        segment_clips = [recording[beg * 16:end * 16] for beg, end in segments]
+        raw_texts = await pool.submit_split("emotion_analyzer", "transcribe_segments", segment_clips)
+        durations_ms = [end - beg for beg, end in segments]
+        summary = await pool.submit("emotion_analyzer", "summarize_segments", raw_texts, durations_ms=durations_ms)
+        return summary, len(segments)
+
+    pool_registry.register("emotion_analyzer", analyzer)
+    for mode in args.executors.split(","):
+        for workers in [int(w) for w in args.workers.split(",")]:
+            pool = InferencePool(mode, max_workers=workers)
+            pool.start()
+            try:
+                asyncio.run(parallel(pool))  # 预热
+                (result, segments), elapsed = _timed(lambda: asyncio.run(parallel(pool)))
+            finally:
+                pool.shutdown()
+            cer = _edit_distance(result["raw_text"], reference["raw_text"]) / max(1, len(reference["raw_text"]))
+            print(f"  {mode:<7}  : {workers:2d} workers {elapsed:7.2f}s  speedup {baseline / elapsed:5.2f}x"
+                  f"  {segments} segments  emotion {result['emotion']}/{reference['emotion']}  CER vs generate {cer:6.2%}")
+
+
+def bench_decode(args):
+    """
+    解码: 文件头探测 + 快速路径（libopus 直出 16kHz / numpy 读 PCM WAV）与 torchaudio 对比
+
+    --clips 目录中的 .ogg/.oga/.opus（Telegram 语音）与 .wav；未给出时只测合成 WAV
+    """
+    import glob
+    import io
+    import os
+    import wave
+    import numpy as np
+    import torchaudio
+    from audio_format import opus_available, probe
+    from preprocess import AudioPreprocessor
+
+    print("=" * 60)
+    print(f"Decode: probe + fast path vs torchaudio (n={args.n}, opuslib={'yes' if opus_available() else 'no'})")
+    print("=" * 60)
+
+    files = []
+    if args.clips:
+        for path in sorted(glob.glob(os.path.join(args.clips, "*"))):
+            if path.rsplit(".", 1)[-1].lower() in ("ogg", "oga", "opus", "wav"):
+                with open(path, "rb") as f:
+                    files.append((os.path.basename(path), f.read()))
+    if not files:
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(48000)
+            w.writeframes((np.random.default_rng(0).standard_normal(48000 * 10) * 3000).astype("<i2").tobytes())
+        files.append(("synthetic_48k_10s.wav", buffer.getvalue()))
+
+    preprocessor = AudioPreprocessor()
+    for name, payload in files:
+        info, probe_time = _timed(lambda: [probe(memoryview(payload)) for _ in range(args.n)])
+        info = info[0]
+        fast, fast_time = _timed(lambda: [preprocessor.decode(io.BytesIO(payload))[0] for _ in range(args.n)])
+        line = (f"  {name[:28]:<28} {info.format:>9} {info.duration_s or 0:6.1f}s"
+                f"  probe {probe_time / args.n * 1e6:6.1f} us  decode {fast_time / args.n * 1000:7.2f} ms")
+        try:
+            def legacy():
+                waveform, sample_rate = torchaudio.load(io.BytesIO(payload))
+                return preprocessor.to_model_input(waveform, sample_rate)
+            reference, legacy_time = _timed(lambda: [legacy() for _ in range(args.n)])
+            n = min(len(reference[0]), len(fast[0]))
+            diff = float(np.max(np.abs(reference[0][:n] - fast[0][:n]))) if n else 0.0
+            line += f"  torchaudio {legacy_time / args.n * 1000:7.2f} ms ({legacy_time / fast_time:5.2f}x)  max diff {diff:.4f}"
+        except Exception as e:
+            line += f"  torchaudio unavailable ({type(e).__name__})"
+        print(line)
+
+
+BENCHMARKS = {
+    "bls-batch": bench_bls_batch,
+    "bls-pubkey": bench_bls_pubkey,
+    "preprocess": bench_preprocess,
+    "decode": bench_decode,
+    "voiceprint-index": bench_voiceprint_index,
+    "embedding-codec": bench_embedding_codec,
+    "backends": bench_backends,
+    "long-audio": bench_long_audio,
+    "prefork": bench_prefork,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EchoRank AI service benchmarks")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    parser.add_argument("--n", type=int, default=32, help="number of items")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="index sizes for voiceprint-index")
+    parser.add_argument("--clips", help="directory of audio clips for backends parity check")
+    parser.add_argument("--backends", default="torch,int8,onnx", help="backends to compare against torch")
+    parser.add_argument("--workers", default="1,2,4,8", help="worker counts for prefork / long-audio")
+    parser.add_argument("--seconds", type=float, default=20, help="load duration per prefork run")
+    parser.add_argument("--endpoint", default="/analyze", help="endpoint for prefork load")
+    parser.add_argument("--duration", type=float, default=300, help="recording length for long-audio")
+    parser.add_argument("--executors", default="process,thread", help="inference pool modes for long-audio")
+    args = parser.parse_args()
+
+    return BENCHMARKS[args.benchmark](args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
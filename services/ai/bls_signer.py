@@ -4,11 +4,84 @@
 """
 
 from py_ecc.bls import G2ProofOfPossession as bls
+from py_ecc.bls.g2_primitives import G1_to_pubkey, pubkey_to_G1, signature_to_G2, subgroup_check
+from py_ecc.bls.hash_to_curve import hash_to_G2
+from py_ecc.optimized_bls12_381 import (
+    FQ12, G1, Z1, Z2, add, final_exponentiate, multiply, neg, pairing
+)
+import asyncio
+import functools
 import hashlib
 import logging
+import multiprocessing
+import os
+import secrets
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+# 已验证公钥缓存的条数（实际只有少量验证者密钥，默认足够）
+PUBKEY_CACHE_SIZE = int(os.getenv("BLS_PUBKEY_CACHE_SIZE", "1024"))
+
+
+@functools.lru_cache(maxsize=PUBKEY_CACHE_SIZE)
+def load_public_key(public_key: bytes):
+    """
+    解压公钥并做 KeyValidate（非无穷远点 + 子群检查），结果缓存
+    
+    参数:
+        public_key: 48 字节压缩公钥
+    
+    返回:
+        G1 点；公钥无效时返回 None
+    """
+    try:
+        if not bls.KeyValidate(bytes(public_key)):
+            return None
+        return pubkey_to_G1(bytes(public_key))
+    except Exception:
+        return None
+
+
+@functools.lru_cache(maxsize=64)
+def aggregate_public_key(public_keys: tuple):
+    """
+    聚合一组公钥（一次性求和，结果缓存，已知验证者集合可预先计算）
+    
+    参数:
+        public_keys: 公钥元组
+    
+    返回:
+        聚合后的 G1 点；任一公钥无效时返回 None
+    """
+    aggregate = Z1
+    for public_key in public_keys:
+        point = load_public_key(public_key)
+        if point is None:
+            return None
+        aggregate = add(aggregate, point)
+    return aggregate
+
+
+def _core_verify(pk_point, message: bytes, signature: bytes) -> bool:
+    """用已解压、已验证的公钥点验证签名（与 bls.Verify 相同的配对检查）"""
+    if pk_point is None:
+        return False
+    try:
+        signature_point = signature_to_G2(signature)
+        if not subgroup_check(signature_point):
+            return False
+        message_point = hash_to_G2(message, bls.DST, bls.xmd_hash_function)
+        return final_exponentiate(
+            pairing(signature_point, G1, final_exponentiate=False)
+            * pairing(message_point, neg(pk_point), final_exponentiate=False)
+        ) == FQ12.one()
+    except Exception as e:
+        logger.error(f"Signature verification failed: {e}")
+        return False
+
 
 class BLSSigner:
     """BLS 签名器"""
@@ -51,11 +124,46 @@ class BLSSigner:
         返回:
             是否有效
         """
-        try:
-            return bls.Verify(public_key, message, signature)
-        except Exception as e:
-            logger.error(f"Signature verification failed: {e}")
-            return False
+        return _core_verify(load_public_key(public_key), message, signature)
+    
+    @staticmethod
+    def batch_verify(entries: list) -> list:
+        """
+        批量验证多条签名（随机线性组合）
+        
+        对每条签名取随机标量 r_i，检查
+            e(Σ r_i·σ_i, -G1) · Π e(H(m_i), r_i·pk_i) == 1
+        N 条签名只需 N+1 次 Miller loop 和 1 次最终幂，而逐条验证需要 2N 次配对。
+        批量检查失败时二分定位无效的条目。
+        
+        参数:
+            entries: (public_key, message, signature) 三元组列表
+        
+        返回:
+            与输入一一对应的布尔列表
+        """
+        results = [False] * len(entries)
+        prepared = []
+        for index, (public_key, message, signature) in enumerate(entries):
+            points = _prepare_verification(public_key, message, signature)
+            if points is not None:
+                prepared.append((index, points))
+        
+        def bisect(group):
+            if not group:
+                return
+            if _random_linear_check([points for _, points in group]):
+                for index, _ in group:
+                    results[index] = True
+                return
+            if len(group) == 1:
+                return
+            middle = len(group) // 2
+            bisect(group[:middle])
+            bisect(group[middle:])
+        
+        bisect(prepared)
+        return results
     
     @staticmethod
     def aggregate_signatures(signatures: list) -> bytes:
@@ -87,17 +195,238 @@ class BLSSigner:
         返回:
             是否有效
         """
-        try:
-            # 聚合公钥
-            agg_pk = public_keys[0]
-            for pk in public_keys[1:]:
-                agg_pk = bls.aggregate_pubkeys([agg_pk, pk])
-            
-            # 验证聚合签名
-            return bls.Verify(agg_pk, message, aggregated_sig)
-        except Exception as e:
-            logger.error(f"Aggregated signature verification failed: {e}")
-            return False
+        # 聚合公钥(缓存,已知验证者集合只计算一次)
+        agg_pk = aggregate_public_key(tuple(public_keys))
+        
+        # 验证聚合签名
+        return _core_verify(agg_pk, message, aggregated_sig)
+    
+    @staticmethod
+    def register_validator_set(public_keys: list) -> bytes:
+        """
+        预先验证并缓存一组验证者公钥及其聚合公钥
+        
+        参数:
+            public_keys: 公钥列表
+        
+        返回:
+            聚合公钥（压缩字节）
+        """
+        for public_key in public_keys:
+            if load_public_key(public_key) is None:
+                raise ValueError(f"Invalid validator public key: {bytes(public_key).hex()[:16]}...")
+        return G1_to_pubkey(aggregate_public_key(tuple(public_keys)))
+
+
+# 批量验证随机标量的位数（伪造通过检查的概率约为 2^-64）
+BATCH_VERIFY_SCALAR_BITS = 64
+
+
+def _prepare_verification(public_key: bytes, message: bytes, signature: bytes) -> Optional[Tuple]:
+    """
+    解压公钥/签名并做子群检查，返回 (pk 点, H(m) 点, 签名点)；编码或子群无效时返回 None
+    """
+    try:
+        pk_point = load_public_key(public_key)
+        if pk_point is None:
+            return None
+        signature_point = signature_to_G2(signature)
+        if not subgroup_check(signature_point):
+            return None
+        message_point = hash_to_G2(message, bls.DST, bls.xmd_hash_function)
+        return pk_point, message_point, signature_point
+    except Exception:
+        return None
+
+
+def _random_linear_check(points: List[Tuple]) -> bool:
+    """对一组已解压的 (pk, H(m), σ) 做一次随机线性组合配对检查"""
+    aggregate_signature = Z2
+    accumulator = FQ12.one()
+    for pk_point, message_point, signature_point in points:
+        r = secrets.randbits(BATCH_VERIFY_SCALAR_BITS) | 1
+        aggregate_signature = add(aggregate_signature, multiply(signature_point, r))
+        accumulator *= pairing(message_point, multiply(pk_point, r), final_exponentiate=False)
+    accumulator *= pairing(aggregate_signature, neg(G1), final_exponentiate=False)
+    return final_exponentiate(accumulator) == FQ12.one()
+
+
+@dataclass
+class SignedMessage:
+    """签名服务的输出"""
+    signature: bytes                        # 签名（DVT 模式下为聚合签名）
+    public_key: bytes                       # 验证该签名所用的公钥（DVT 模式下为参与者的聚合公钥）
+    signer_bitmap: Optional[str] = None     # DVT 模式: 第 i 位为 "1" 表示第 i 个验证者参与了签名
+
+
+# 签名子进程中的签名器（每个进程在初始化时加载一次私钥）
+_worker_signer: Optional[BLSSigner] = None
+
+
+def _init_signing_worker(private_key_hex: str) -> None:
+    """签名子进程初始化：加载私钥"""
+    global _worker_signer
+    _worker_signer = BLSSigner(private_key_hex)
+
+
+def _sign_chunk(messages: List[bytes]) -> List[bytes]:
+    """在签名子进程中依次签名一组消息"""
+    return [_worker_signer.sign_message(message) for message in messages]
+
+
+class SigningService:
+    """
+    多进程 BLS 签名服务
+
+    py_ecc 是纯 Python 实现，单次签名耗时几十到上百毫秒且一直持有 GIL，
+    线程池无法并行。这里用进程池，每个子进程只加载一次私钥，
+    批量消息按进程数切分后并行签名，吞吐随核数线性扩展。
+    """
+
+    def __init__(self, private_key_hex: str, max_workers: Optional[int] = None):
+        """
+        参数:
+            private_key_hex: 私钥的十六进制字符串
+            max_workers: 签名进程数（默认 CPU 核数）
+        """
+        self.signer = BLSSigner(private_key_hex)
+        self.pk = self.signer.pk
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=_init_signing_worker,
+            initargs=(private_key_hex,),
+        )
+        logger.info(f"BLS signing service started with {self.max_workers} worker processes")
+
+    def _chunks(self, messages: List[bytes]) -> List[List[bytes]]:
+        """把消息均匀切分给各个签名进程"""
+        n = min(self.max_workers, len(messages))
+        return [messages[i::n] for i in range(n)]
+
+    @staticmethod
+    def _interleave(chunks: List[List[bytes]], results: List[List[bytes]], total: int) -> List[bytes]:
+        """把按 messages[i::n] 切分的结果还原为原始顺序"""
+        ordered: List[bytes] = [b""] * total
+        n = len(chunks)
+        for i, chunk_result in enumerate(results):
+            ordered[i::n] = chunk_result
+        return ordered
+
+    def sign_many(self, messages: List[bytes]) -> List[bytes]:
+        """
+        批量签名（阻塞调用）
+
+        参数:
+            messages: 待签名的消息列表
+
+        返回:
+            与输入一一对应的签名列表
+        """
+        if not messages:
+            return []
+        chunks = self._chunks(list(messages))
+        results = list(self._executor.map(_sign_chunk, chunks))
+        return self._interleave(chunks, results, len(messages))
+
+    async def sign_many_async(self, messages: List[bytes]) -> List[bytes]:
+        """批量签名（异步版本，不阻塞事件循环）"""
+        if not messages:
+            return []
+        loop = asyncio.get_running_loop()
+        chunks = self._chunks(list(messages))
+        results = await asyncio.gather(*[
+            loop.run_in_executor(self._executor, _sign_chunk, chunk) for chunk in chunks
+        ])
+        return self._interleave(chunks, list(results), len(messages))
+
+    async def sign(self, message: bytes) -> SignedMessage:
+        """对单条消息签名"""
+        signature = (await self.sign_many_async([message]))[0]
+        return SignedMessage(signature=signature, public_key=self.pk)
+
+    def shutdown(self) -> None:
+        """关闭签名进程池"""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+class ThresholdSigningService:
+    """
+    DVT 门限签名服务
+
+    每个验证者在独立的签名进程中持有自己的私钥，同一条消息并发发给所有验证者，
+    收到 threshold 个签名后立即聚合返回，最慢的验证者不会拖慢响应。
+    """
+
+    def __init__(self, private_keys_hex: List[str], threshold: Optional[int] = None,
+                 workers_per_validator: int = 1):
+        """
+        参数:
+            private_keys_hex: 各验证者私钥的十六进制字符串
+            threshold: 门限（默认过半数）
+            workers_per_validator: 每个验证者的签名进程数
+        """
+        if not private_keys_hex:
+            raise ValueError("DVT signing requires at least one validator key")
+
+        self.threshold = threshold or len(private_keys_hex) // 2 + 1
+        if not 1 <= self.threshold <= len(private_keys_hex):
+            raise ValueError(f"Invalid DVT threshold {self.threshold} for {len(private_keys_hex)} validators")
+
+        self.validators = [
+            SigningService(sk, max_workers=workers_per_validator) for sk in private_keys_hex
+        ]
+        self.public_keys = [validator.pk for validator in self.validators]
+        # 完整验证者集合的聚合公钥（同时预热公钥缓存）
+        self.pk = BLSSigner.register_validator_set(self.public_keys)
+        logger.info(f"DVT signing service started: {self.threshold}-of-{len(self.validators)}")
+
+    async def sign(self, message: bytes) -> SignedMessage:
+        """
+        所有验证者并发签名，达到门限后聚合返回
+
+        返回:
+            SignedMessage（聚合签名、参与者聚合公钥、参与位图）
+        """
+        pending = {
+            asyncio.ensure_future(validator.sign_many_async([message])): index
+            for index, validator in enumerate(self.validators)
+        }
+        signatures = {}
+        failures = 0
+
+        while len(signatures) < self.threshold:
+            if not pending:
+                raise RuntimeError(
+                    f"DVT threshold not met: {len(signatures)}/{self.threshold} signatures, "
+                    f"{failures} validators failed"
+                )
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                index = pending.pop(task)
+                try:
+                    signatures[index] = task.result()[0]
+                except Exception as e:
+                    failures += 1
+                    logger.error(f"Validator {index + 1} failed to sign: {e}")
+
+        # 其余验证者的签名不再等待
+        for task in pending:
+            task.cancel()
+
+        signers = sorted(signatures)
+        signer_pks = tuple(self.public_keys[i] for i in signers)
+        return SignedMessage(
+            signature=bls.Aggregate([signatures[i] for i in signers]),
+            public_key=G1_to_pubkey(aggregate_public_key(signer_pks)),
+            signer_bitmap="".join("1" if i in signatures else "0" for i in range(len(self.validators))),
+        )
+
+    def shutdown(self) -> None:
+        """关闭所有验证者的签名进程"""
+        for validator in self.validators:
+            validator.shutdown()
 
 
 def construct_message(
@@ -141,15 +470,35 @@ def construct_message(
     return hashlib.sha256(message_bytes).digest()
 
 
+def construct_root_message(merkle_root: str, leaf_count: int) -> bytes:
+    """
+    构造 Merkle 批量证明中根签名的消息
+    
+    消息格式:
+    m = domain_sep || merkle_root || leaf_count
+    
+    参数:
+        merkle_root: Merkle 根（十六进制）
+        leaf_count: 叶子数
+    
+    返回:
+        消息的 SHA256 哈希
+    """
+    domain_sep = "ECHORANK_MERKLE_V1"
+    message_str = "||".join([domain_sep, merkle_root, str(leaf_count)])
+    return hashlib.sha256(message_str.encode('utf-8')).digest()
+
+
 # 测试代码
 if __name__ == "__main__":
     import secrets
     import time
+    from py_ecc.optimized_bls12_381 import curve_order
     
     logging.basicConfig(level=logging.INFO)
     
     # 生成测试密钥
-    sk_hex = hex(secrets.randbelow(bls.curve_order))
+    sk_hex = hex(secrets.randbelow(curve_order))
     print(f"Private Key: {sk_hex}")
     
     # 创建签名器
@@ -171,4 +520,15 @@ if __name__ == "__main__":
     
     # 验证
     is_valid = BLSSigner.verify_signature(signer.pk, message, signature)
-    print(f"Verification: {'✅ Valid' if is_valid else '❌ Invalid'}")
\ No newline at end of file
+    print(f"Verification: {'✅ Valid' if is_valid else '❌ Invalid'}")
+    
+    # 多进程批量签名: 结果必须与单进程签名逐条一致
+    messages = [secrets.token_bytes(32) for _ in range(8)]
+    service = SigningService(sk_hex, max_workers=4)
+    start = time.time()
+    signatures = service.sign_many(messages)
+    elapsed = time.time() - start
+    service.shutdown()
+    
+    assert signatures == [signer.sign_message(m) for m in messages]
+    print(f"sign_many: {len(messages)} signatures in {elapsed:.2f}s ✅")
\ No newline at end of file
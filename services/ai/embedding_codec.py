@@ -0,0 +1,102 @@
+# embedding_codec.py - 声纹向量的传输编码
+"""
+声纹向量在 HTTP 接口中的紧凑编码
+
+192 维 CAM++ 向量以 JSON 浮点数组传输约 4KB，序列化/解析也慢。
+可选编码（/voiceprint?encoding=...，各接口的 embedding 字段均可接收）:
+
+    json    JSON 浮点数组（默认，兼容旧客户端）
+    f32     base64 little-endian float32（无损，1KB）
+    f16     base64 little-endian float16（约 1e-3 相对误差，相似度误差可忽略）
+    int8    base64 对称 int8 量化 + scale（最小，余弦相似度误差约 1e-4）
+
+编码后的格式:
+    {"encoding": "f16", "dim": 192, "data": "<base64>"}
+    {"encoding": "int8", "dim": 192, "scale": 0.0123, "data": "<base64>"}
+"""
+
+import base64
+from typing import Any, Dict, List, Union
+
+import numpy as np
+
+ENCODINGS = ("json", "f32", "f16", "int8")
+
+# 各编码对应的 numpy dtype（显式 little-endian）
+_DTYPES = {
+    "f32": np.dtype("<f4"),
+    "f16": np.dtype("<f2"),
+    "int8": np.dtype("i1"),
+}
+
+EncodedEmbedding = Union[List[float], Dict[str, Any]]
+
+
+def encode_embedding(embedding: Any, encoding: str = "json") -> EncodedEmbedding:
+    """
+    编码单个声纹向量
+
+    参数:
+        embedding: (D,) 向量（(1, D) 会被展平）
+        encoding: json | f32 | f16 | int8
+
+    返回:
+        json 编码返回浮点列表，其它编码返回字典
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown embedding encoding: {encoding} (expected one of {', '.join(ENCODINGS)})")
+
+    vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+    if encoding == "json":
+        return vector.tolist()
+
+    payload: Dict[str, Any] = {"encoding": encoding, "dim": int(vector.shape[0])}
+    if encoding == "int8":
+        # 对称量化: q = round(x / scale)，scale = max|x| / 127
+        peak = float(np.max(np.abs(vector))) if vector.size else 0.0
+        scale = peak / 127.0 if peak > 0 else 1.0
+        payload["scale"] = scale
+        vector = np.clip(np.rint(vector / scale), -127, 127)
+
+    payload["data"] = base64.b64encode(vector.astype(_DTYPES[encoding]).tobytes()).decode("ascii")
+    return payload
+
+
+def _decode_one(payload: Dict[str, Any]) -> np.ndarray:
+    encoding = payload.get("encoding")
+    if encoding not in _DTYPES:
+        raise ValueError(f"Unknown embedding encoding: {encoding}")
+
+    try:
+        raw = base64.b64decode(payload["data"], validate=True)
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid {encoding} embedding data: {e}")
+
+    vector = np.frombuffer(raw, dtype=_DTYPES[encoding]).astype(np.float32)
+    dim = payload.get("dim")
+    if dim is not None and vector.shape[0] != int(dim):
+        raise ValueError(f"Embedding length {vector.shape[0]} does not match dim {dim}")
+    if encoding == "int8":
+        vector *= np.float32(payload.get("scale", 1.0))
+    return vector
+
+
+def decode_embedding(payload: Any) -> np.ndarray:
+    """
+    解码声纹（或一组声纹）为 float32 数组
+
+    参数:
+        payload: 浮点列表 / 嵌套浮点列表 / 编码字典 / 编码字典列表
+
+    返回:
+        (D,) 或 (N, D) float32 数组
+    """
+    if isinstance(payload, dict):
+        return _decode_one(payload)
+    if isinstance(payload, list) and payload and isinstance(payload[0], dict):
+        return np.stack([_decode_one(item) for item in payload])
+    try:
+        return np.asarray(payload, dtype=np.float32)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid embedding: {e}")
+
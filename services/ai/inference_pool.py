@@ -0,0 +1,193 @@
+# inference_pool.py - 推理执行器
+"""
+把同步的模型推理 / 签名调用移出事件循环
+
+FastAPI 的 async 处理函数直接调用 SenseVoice / CAM++ / py_ecc 会阻塞整个事件循环，
+一次几秒的推理期间连 /health 都无法响应。本模块提供一个有界的工作池：
+
+- thread 模式: ThreadPoolExecutor，组件在主进程内共享（torch 推理会释放 GIL）。
+  各线程的算子并发执行，torch 线程数限制为 核数 / 线程数，避免 N 个线程各占满全部核；
+  FunASR 模型的共享配置由 backends.funasr_inference / model_lock 保护
+- process 模式: ProcessPoolExecutor (fork)，子进程通过 copy-on-write 继承已加载的模型，
+  纯 Python 的计算（如 py_ecc）也能按核数扩展
+
+配置（环境变量）:
+    INFERENCE_EXECUTOR       thread | process（默认 thread）
+    INFERENCE_WORKERS        工作线程/进程数（默认 CPU 核数）
+    INFERENCE_TORCH_THREADS  每个工作线程/进程的 torch 线程数（默认 核数 / 工作线程/进程数）
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 已注册的组件（名字 -> 对象）。process 模式下 fork 出的子进程会继承这份字典。
+_components: Dict[str, Any] = {}
+
+
+def register(name: str, component: Any) -> None:
+    """注册一个可在工作池中调用的组件（必须在 start() 之前完成）"""
+    _components[name] = component
+
+
+def _invoke(name: str, method: str, args: tuple, kwargs: dict) -> Any:
+    """在工作线程/进程中执行 component.method(*args, **kwargs)"""
+    component = _components.get(name)
+    if component is None:
+        raise RuntimeError(f"Component '{name}' is not registered in this worker")
+    return getattr(component, method)(*args, **kwargs)
+
+
+def _set_torch_threads(torch_threads: int) -> None:
+    """
+    限制 torch 线程数，避免多个工作线程/进程互相抢占 CPU
+
+    FunASR 每次推理前会按模型配置的 ncpu 重设线程数，已注册组件的 set_torch_threads 同步修改模型配置
+    """
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+    for component in _components.values():
+        set_threads = getattr(component, "set_torch_threads", None)
+        if set_threads is not None:
+            set_threads(torch_threads)
+
+
+def _init_process_worker(torch_threads: int) -> None:
+    """子进程初始化"""
+    _set_torch_threads(torch_threads)
+
+
+class InferencePool:
+    """有界推理工作池"""
+
+    MODES = ("thread", "process")
+
+    def __init__(self, mode: str = "thread", max_workers: Optional[int] = None,
+                 torch_threads: Optional[int] = None):
+        """
+        参数:
+            mode: thread 或 process
+            max_workers: 工作线程/进程数
+            torch_threads: 每个工作线程/进程的 torch 线程数
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown inference executor mode: {mode}")
+
+        cpu_count = os.cpu_count() or 1
+        self.mode = mode
+        self.max_workers = max_workers or cpu_count
+        self.torch_threads = torch_threads or max(1, cpu_count // self.max_workers)
+        self._executor: Optional[Executor] = None
+
+    @classmethod
+    def from_env(cls) -> "InferencePool":
+        """从环境变量构造工作池"""
+        workers = os.getenv("INFERENCE_WORKERS")
+        torch_threads = os.getenv("INFERENCE_TORCH_THREADS")
+        return cls(
+            mode=os.getenv("INFERENCE_EXECUTOR", "thread").lower(),
+            max_workers=int(workers) if workers else None,
+            torch_threads=int(torch_threads) if torch_threads else None,
+        )
+
+    def start(self) -> None:
+        """创建执行器。process 模式下必须在模型加载、组件注册之后调用"""
+        if self._executor is not None:
+            return
+
+        if self.mode == "process":
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=_init_process_worker,
+                initargs=(self.torch_threads,),
+            )
+        else:
+            _set_torch_threads(self.torch_threads)
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="inference",
+            )
+
+        logger.info(
+            f"Inference pool started: mode={self.mode}, workers={self.max_workers}, "
+            f"torch_threads={self.torch_threads}, components={sorted(_components)}"
+        )
+
+    def shutdown(self) -> None:
+        """关闭执行器"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    @property
+    def running(self) -> bool:
+        return self._executor is not None
+
+    async def submit(self, name: str, method: str, *args, **kwargs) -> Any:
+        """
+        在工作池中执行已注册组件的方法并等待结果
+
+        参数:
+            name: 组件名（register 时使用的名字）
+            method: 方法名
+            *args, **kwargs: 方法参数（process 模式下必须可 pickle）
+
+        返回:
+            方法的返回值
+        """
+        if self._executor is None:
+            raise RuntimeError("Inference pool is not started")
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, _invoke, name, method, args, kwargs
+        )
+
+    async def submit_split(self, name: str, method: str, items: List[Any]) -> List[Any]:
+        """
+        把列表按 items[i::n] 交错分给 n 个 worker 并行执行，结果还原为原始顺序
+
+        component.method 必须接受一个列表并返回等长的结果列表
+        （如 EmotionAnalyzer.transcribe_segments）
+
+        参数:
+            name: 组件名
+            method: 方法名
+            items: 输入列表
+
+        返回:
+            与 items 一一对应的结果列表
+        """
+        if not items:
+            return []
+        n = min(self.max_workers, len(items))
+        chunks = [items[i::n] for i in range(n)]
+        results = await asyncio.gather(*[self.submit(name, method, chunk) for chunk in chunks])
+
+        ordered: List[Any] = [None] * len(items)
+        for i, chunk_result in enumerate(results):
+            ordered[i::n] = chunk_result
+        return ordered
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        """
+        在工作池中执行一个独立函数（不依赖已注册组件）
+
+        参数:
+            fn: 模块级函数或静态方法（process 模式下必须可 pickle）
+            *args: 函数参数
+        """
+        if self._executor is None:
+            raise RuntimeError("Inference pool is not started")
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
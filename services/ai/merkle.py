@@ -0,0 +1,97 @@
+# merkle.py - Merkle 树
+"""
+用于批量结果证明的二叉 Merkle 树（SHA-256）
+
+- 叶子哈希: H(0x00 || data)，内部节点: H(0x01 || left || right)，区分叶子与内部节点
+- 某一层节点数为奇数时复制最后一个节点
+- 证明是从叶子到根的兄弟节点列表，左右位置由叶子下标推出
+"""
+
+import hashlib
+from typing import List
+
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+
+def leaf_hash(data: bytes) -> bytes:
+    """叶子哈希"""
+    return hashlib.sha256(LEAF_PREFIX + data).digest()
+
+
+def node_hash(left: bytes, right: bytes) -> bytes:
+    """内部节点哈希"""
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+
+class MerkleTree:
+    """由一组叶子数据构建的 Merkle 树"""
+
+    def __init__(self, leaves: List[bytes]):
+        """
+        参数:
+            leaves: 叶子数据（原始字节，内部会做叶子哈希）
+        """
+        if not leaves:
+            raise ValueError("Merkle tree needs at least one leaf")
+
+        self.levels: List[List[bytes]] = [[leaf_hash(leaf) for leaf in leaves]]
+        while len(self.levels[-1]) > 1:
+            level = self.levels[-1]
+            if len(level) % 2 == 1:
+                level = level + [level[-1]]
+            self.levels.append([
+                node_hash(level[i], level[i + 1]) for i in range(0, len(level), 2)
+            ])
+
+    @property
+    def root(self) -> bytes:
+        return self.levels[-1][0]
+
+    @property
+    def leaf_count(self) -> int:
+        return len(self.levels[0])
+
+    def proof(self, index: int) -> List[bytes]:
+        """
+        生成第 index 个叶子的包含证明
+
+        返回:
+            从叶子层到根的兄弟节点哈希列表
+        """
+        if not 0 <= index < self.leaf_count:
+            raise IndexError(f"Leaf index {index} out of range")
+
+        siblings = []
+        for level in self.levels[:-1]:
+            sibling = index ^ 1
+            siblings.append(level[sibling] if sibling < len(level) else level[index])
+            index //= 2
+        return siblings
+
+
+def verify_proof(leaf: bytes, index: int, proof: List[bytes], root: bytes, leaf_count: int) -> bool:
+    """
+    验证包含证明
+
+    奇数层复制最后一个节点，最后一个叶子的证明在下标 leaf_count 处同样成立，
+    因此必须给出叶子数，只接受 0 <= index < leaf_count 且证明长度与树高一致的证明
+
+    参数:
+        leaf: 叶子数据（原始字节）
+        index: 叶子下标
+        proof: 兄弟节点哈希列表
+        root: 期望的根哈希
+        leaf_count: 树的叶子数（根签名覆盖的值）
+
+    返回:
+        是否有效
+    """
+    if not 0 <= index < leaf_count or len(proof) != (leaf_count - 1).bit_length():
+        return False
+
+    node = leaf_hash(leaf)
+    for sibling in proof:
+        node = node_hash(sibling, node) if index & 1 else node_hash(node, sibling)
+        index //= 2
+    return node == root
@@ -0,0 +1,163 @@
+# prefork.py - 预分叉多 worker 服务
+"""
+单个 uvicorn 进程只能用满一个事件循环；用 uvicorn --workers 启动多个进程时，
+每个 worker 都会重新导入并加载一遍 SenseVoice、VAD 和 CAM++。
+
+pre-fork 模式:
+    1. master 进程加载一次模型并预热（torch 单线程，fork 前不启动 OpenMP 线程池）
+    2. gc.freeze() 把已加载对象移出 GC 跟踪，避免 worker 的垃圾回收触碰这些页
+    3. master 绑定监听 socket，fork 出 N 个 worker，worker 通过 copy-on-write 共享模型权重
+    4. 每个 worker 设置自己的 torch 线程数（默认 核数 / worker 数），互不抢占 CPU，
+       然后在共享 socket 上运行 uvicorn.Server（签名服务、工作池等在 worker 内各自启动）
+    5. master 负责转发 SIGTERM/SIGINT，并重启意外退出的 worker
+
+配置（环境变量）:
+    AI_WORKERS          worker 进程数（默认 1，即单进程 uvicorn.run）
+    AI_WORKER_THREADS   每个 worker 的 torch 线程数（默认 核数 / worker 数）
+
+pre-fork 模式下 INFERENCE_WORKERS、BLS_SIGN_WORKERS 未设置时同样按 worker 数均分核数。
+声纹索引必须设置 VOICEPRINT_INDEX_PATH，worker 之间通过持久化文件共享（见 voiceprint_index.py）。
+"""
+
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+# worker 启动后这么短时间内退出视为启动失败，重启前等待
+RESPAWN_BACKOFF_S = 1.0
+
+
+def _set_torch_threads(threads: int) -> None:
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    """在 master 中绑定监听 socket，由所有 worker 继承"""
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app: Any, sock: socket.socket, torch_threads: int, log_level: str) -> None:
+    """worker 进程入口（fork 之后执行，以 SystemExit 结束，不返回）"""
+    import uvicorn
+
+    # uvicorn 运行期间安装自己的信号处理，退出时恢复原处理并重新发出收到的信号。
+    # 这里设为忽略（而不是 SIG_DFL），否则 worker 会被重新发出的 SIGTERM 直接杀死，
+    # 来不及执行下面的正常退出流程
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _set_torch_threads(torch_threads)
+
+    code = 0
+    try:
+        config = uvicorn.Config(app, log_level=log_level)
+        uvicorn.Server(config).run(sockets=[sock])
+    except Exception as e:
+        logger.error(f"Worker {os.getpid()} crashed: {e}")
+        code = 1
+
+    # 正常退出解释器而不是 os._exit: 退出钩子会等待 worker 内的签名/推理进程池关闭,
+    # 否则这些子进程会成为孤儿
+    sys.exit(code)
+
+
+def serve(
+    app: Any,
+    preload: Callable[[], None],
+    host: str = "0.0.0.0",
+    port: int = 8001,
+    workers: int = 1,
+    torch_threads: int = 0,
+    log_level: str = "info",
+) -> None:
+    """
+    加载模型后 fork 出多个 uvicorn worker 共享同一个监听 socket
+
+    参数:
+        app: ASGI 应用
+        preload: 在 master 中加载模型的函数
+        host, port: 监听地址
+        workers: worker 进程数
+        torch_threads: 每个 worker 的 torch 线程数（0 表示 核数 / worker 数）
+        log_level: uvicorn 日志级别
+    """
+    cpu_count = os.cpu_count() or 1
+    per_worker = max(1, cpu_count // workers)
+    torch_threads = torch_threads or per_worker
+
+    # worker 内的推理线程池与签名进程池按 worker 数均分核数，推理线程再均分 worker 的 torch 线程
+    os.environ.setdefault("INFERENCE_WORKERS", str(per_worker))
+    os.environ.setdefault("BLS_SIGN_WORKERS", str(per_worker))
+    os.environ.setdefault(
+        "INFERENCE_TORCH_THREADS", str(max(1, torch_threads // int(os.environ["INFERENCE_WORKERS"])))
+    )
+
+    # 1. master 加载模型（单线程，fork 之后不留下 OpenMP 线程池）
+    _set_torch_threads(1)
+    start = time.perf_counter()
+    preload()
+    logger.info(f"Models preloaded in master in {time.perf_counter() - start:.2f}s")
+
+    # 2. 冻结已加载对象，worker 中的 GC 不再写这些页（否则 copy-on-write 失效）
+    gc.collect()
+    gc.freeze()
+
+    # 3. 绑定 socket 并 fork worker
+    sock = _bind(host, port)
+    children: Dict[int, float] = {}
+    stopping = False
+
+    def spawn() -> None:
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(app, sock, torch_threads, log_level)
+        children[pid] = time.monotonic()
+        logger.info(f"Started worker {pid} (torch threads={torch_threads})")
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    logger.info(f"Pre-fork master {os.getpid()} serving on {host}:{port} with {workers} workers")
+    for _ in range(workers):
+        spawn()
+
+    # 4. 等待 worker 退出，意外退出时重启
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+        logger.error(f"Worker {pid} exited unexpectedly (status {status}), restarting")
+        if time.monotonic() - started < RESPAWN_BACKOFF_S:
+            time.sleep(RESPAWN_BACKOFF_S)
+        spawn()
+
+    sock.close()
+    logger.info("Pre-fork master stopped")
@@ -0,0 +1,400 @@
+# preprocess.py - 音频预处理引擎
+"""
+把上传的音频解码为模型输入（16kHz 单声道 float32）
+
+- 按文件头识别格式（audio_format）: Ogg/Opus 由 libopus 直接解码为 16kHz，PCM WAV 由 numpy 直接读取，
+  其它格式交给 torchaudio；无法解码的数据抛出 UnsupportedAudio，不再当作裸 PCM 猜测
+- 零复制: 上传数据只以 memoryview 访问，PCM 采样是上传缓冲区上的视图；类型转换与单声道混音
+  逐声道就地写入一个 float32 缓冲区。16kHz 音频直接写入返回的模型输入（每个请求唯一的一次分配），
+  其它采样率写入从 BufferPool 租用的暂存缓冲区，重采样后归还，供后续请求复用
+- 按源采样率缓存 Resample 模块，sinc 插值核只计算一次（Telegram 的 48kHz Opus 最常见）
+- 单声道混音和重采样在同一个 tensor 上完成，不再 torch -> numpy -> torch -> numpy 来回转换
+- EmotionAnalyzer 与 SpeakerVerifier 共用同一个实例
+- WaveformCache 按 audio_hash 缓存解码结果，同一段音频先后发到 /analyze 和 /voiceprint
+  时第二次不再解码和重采样
+- SilenceGate 在模型推理前按帧能量裁掉首尾静音、统计语音时长，静音/误触的短录音
+  不再进入 SenseVoice / CAM++
+
+配置（环境变量）:
+    WAVEFORM_CACHE_MB      解码波形缓存的内存预算（默认 256MB，0 表示关闭）
+    AUDIO_BUFFER_POOL_MB   空闲暂存缓冲区的内存预算（每个进程，默认 64MB，0 表示不复用）
+    SILENCE_POLICY         语音过短时的处理: neutral（不跑模型，直接返回 NEUTRAL）|
+                           reject（返回 422）| off（关闭裁剪与检查）（默认 neutral）
+    SILENCE_THRESHOLD_DB   有声帧的 RMS 门限（dBFS，默认 -45）
+    SILENCE_MIN_SPEECH_S   低于该语音时长视为无有效语音（默认 0.5 秒）
+"""
+
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+import torch
+import torchaudio
+
+from audio_format import UnsupportedAudio, decode_ogg_opus, opus_available, probe, read_wav_pcm
+
+logger = logging.getLogger(__name__)
+
+TARGET_SAMPLE_RATE = 16000
+
+AudioSource = Union[bytes, bytearray, memoryview, BinaryIO]
+
+
+class BufferPool:
+    """
+    请求之间复用的 float32 暂存缓冲区
+
+    按 2 的幂容量分桶，租用时取同一容量的空闲缓冲区；归还时空闲总量超过预算则丢弃，交给 GC
+    """
+
+    def __init__(self, max_bytes: int, min_samples: int = 1 << 16):
+        """
+        参数:
+            max_bytes: 空闲缓冲区的总字节数上限
+            min_samples: 最小容量（采样数），短音频共用同一个桶
+        """
+        self.max_bytes = max_bytes
+        self.min_samples = min_samples
+        self.idle_bytes = 0
+        self._free: Dict[int, List[np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> "BufferPool":
+        """从环境变量构造缓冲池"""
+        return cls(int(float(os.getenv("AUDIO_BUFFER_POOL_MB", "64")) * 1024 * 1024))
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "idle_megabytes": round(self.idle_bytes / (1024 * 1024), 2),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    @contextmanager
+    def lease(self, samples: int) -> Iterator[np.ndarray]:
+        """
+        租用长度为 samples 的 float32 缓冲区，with 结束时归还
+
+        缓冲区内容未初始化；归还后会被其它请求改写，不能在 with 之外保留引用
+        """
+        capacity = max(self.min_samples, 1 << max(samples - 1, 0).bit_length())
+        with self._lock:
+            free = self._free.get(capacity)
+            buffer = free.pop() if free else None
+            if buffer is None:
+                self.misses += 1
+            else:
+                self.idle_bytes -= buffer.nbytes
+                self.hits += 1
+
+        if buffer is None:
+            buffer = np.empty(capacity, dtype=np.float32)
+        try:
+            yield buffer[:samples]
+        finally:
+            with self._lock:
+                if self.idle_bytes + buffer.nbytes <= self.max_bytes:
+                    self._free.setdefault(capacity, []).append(buffer)
+                    self.idle_bytes += buffer.nbytes
+
+
+def _mix_into(frames: np.ndarray, full_scale: float, out: np.ndarray) -> None:
+    """
+    把 (frames, channels) 的原始采样转换为 [-1, 1] 的单声道 float32，写入 out
+
+    逐声道就地累加（ufunc 分块转换类型），不生成与输入等大的临时数组
+    """
+    channels = frames.shape[1]
+    np.copyto(out, frames[:, 0])
+    for channel in range(1, channels):
+        np.add(out, frames[:, channel], out=out)
+    scale = 1.0 / (full_scale * channels)
+    if scale != 1.0:
+        np.multiply(out, np.float32(scale), out=out)
+
+
+class AudioPreprocessor:
+    """带重采样核缓存与暂存缓冲池的预处理器"""
+
+    def __init__(self, target_rate: int = TARGET_SAMPLE_RATE, buffers: Optional[BufferPool] = None):
+        self.target_rate = target_rate
+        self.buffers = buffers or BufferPool(0)
+        self._resamplers: Dict[int, torchaudio.transforms.Resample] = {}
+        self._lock = threading.Lock()
+
+    def resampler(self, sample_rate: int) -> torchaudio.transforms.Resample:
+        """获取（必要时创建）从 sample_rate 到目标采样率的重采样器"""
+        resampler = self._resamplers.get(sample_rate)
+        if resampler is None:
+            with self._lock:
+                resampler = self._resamplers.get(sample_rate)
+                if resampler is None:
+                    logger.info(f"Building resampler {sample_rate}Hz -> {self.target_rate}Hz")
+                    resampler = torchaudio.transforms.Resample(sample_rate, self.target_rate)
+                    self._resamplers[sample_rate] = resampler
+        return resampler
+
+    def mix_to_model_input(self, frames: np.ndarray, full_scale: float, sample_rate: int) -> np.ndarray:
+        """
+        单声道混音 + 重采样
+
+        源采样率即 16kHz 时直接写入返回的数组；否则写入租用的暂存缓冲区，
+        以 torch.from_numpy 共享内存交给重采样器，完成后归还
+
+        参数:
+            frames: (frames, channels) 的 int16 / int32 / float 采样（可以是上传数据上的视图）
+            full_scale: 满幅值（int16 为 32768，float 为 1.0）
+            sample_rate: 源采样率
+
+        返回:
+            16kHz 单声道 float32 波形
+        """
+        if sample_rate == self.target_rate:
+            out = np.empty(len(frames), dtype=np.float32)
+            _mix_into(frames, full_scale, out)
+            return out
+
+        with self.buffers.lease(len(frames)) as native, torch.inference_mode():
+            _mix_into(frames, full_scale, native)
+            # 重采样输出是新的 tensor，不引用暂存缓冲区
+            return self.resampler(sample_rate)(torch.from_numpy(native)).contiguous().numpy()
+
+    def to_model_input(self, waveform: torch.Tensor, sample_rate: int) -> np.ndarray:
+        """
+        单声道混音 + 重采样
+
+        参数:
+            waveform: (channels, samples) 或 (samples,) 的波形
+            sample_rate: 源采样率
+
+        返回:
+            16kHz 单声道 float32 波形
+        """
+        if waveform.dim() == 1:
+            waveform = waveform.unsqueeze(0)
+        if waveform.shape[0] == 1:
+            # 单声道 float tensor 不需要混音: 16kHz 直接共享内存，其它采样率直接重采样
+            with torch.inference_mode():
+                mono = waveform[0].to(torch.float32)
+                if sample_rate != self.target_rate:
+                    mono = self.resampler(sample_rate)(mono)
+                return mono.contiguous().numpy()
+        return self.mix_to_model_input(waveform.detach().numpy().T, 1.0, sample_rate)
+
+    def decode(self, audio: AudioSource) -> Tuple[np.ndarray, int]:
+        """
+        解码音频（字节、memoryview 或文件对象）为模型输入
+
+        返回:
+            (16kHz 单声道 float32 波形, 16000)
+        """
+        # 字节与 BytesIO 只取内存视图，不复制上传数据；其它文件对象读入一次
+        if isinstance(audio, (bytes, bytearray, memoryview)):
+            data, audio_buffer = memoryview(audio), None
+        elif hasattr(audio, "getbuffer"):
+            audio.seek(0)
+            data, audio_buffer = audio.getbuffer(), audio
+        else:
+            audio.seek(0)
+            data, audio_buffer = memoryview(audio.read()), None
+
+        # 按文件头分派: Opus 与 PCM WAV 走快速路径，其它格式交给 torchaudio
+        info = probe(data)
+        if info.format == "ogg_opus" and opus_available() and info.channels in (1, 2):
+            return decode_ogg_opus(data, info, self.target_rate), self.target_rate
+        if info.format == "wav":
+            pcm = read_wav_pcm(data)
+            if pcm is not None:
+                return self.mix_to_model_input(*pcm), self.target_rate
+
+        if audio_buffer is None:
+            audio_buffer = io.BytesIO(data)
+        del data
+
+        try:
+            waveform, sample_rate = torchaudio.load(audio_buffer)
+        except Exception as e:
+            raise UnsupportedAudio(f"Cannot decode {info.format} audio: {e}")
+
+        return self.to_model_input(waveform, sample_rate), self.target_rate
+
+
+class WaveformCache:
+    """按内存预算淘汰的解码波形 LRU 缓存（键为 audio_hash）"""
+
+    def __init__(self, max_bytes: int):
+        """
+        参数:
+            max_bytes: 缓存波形的总字节数上限
+        """
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> "WaveformCache":
+        """从环境变量构造缓存"""
+        return cls(int(float(os.getenv("WAVEFORM_CACHE_MB", "256")) * 1024 * 1024))
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "megabytes": round(self.current_bytes / (1024 * 1024), 2),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def get(self, audio_hash: str) -> Optional[np.ndarray]:
+        """查询缓存，命中时返回只读波形"""
+        with self._lock:
+            waveform = self._entries.get(audio_hash)
+            if waveform is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(audio_hash)
+            self.hits += 1
+            return waveform
+
+    def put(self, audio_hash: str, waveform: np.ndarray) -> None:
+        """写入缓存；超过预算时淘汰最久未使用的条目，单条超过预算则不缓存"""
+        if waveform.nbytes > self.max_bytes:
+            return
+
+        # 缓存的波形被多个请求共享，禁止就地修改
+        waveform.setflags(write=False)
+        with self._lock:
+            previous = self._entries.pop(audio_hash, None)
+            if previous is not None:
+                self.current_bytes -= previous.nbytes
+            self._entries[audio_hash] = waveform
+            self.current_bytes += waveform.nbytes
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+
+
+class SilenceGate:
+    """
+    能量门限的静音裁剪与短语音拦截
+
+    以 20ms 帧计算 RMS，高于门限的帧视为有声；裁掉第一个有声帧之前、最后一个有声帧
+    之后的静音（两端各保留 padding），中间的停顿交给 VAD 处理
+    """
+
+    POLICIES = ("neutral", "reject", "off")
+
+    def __init__(self, policy: str = "neutral", threshold_db: float = -45.0,
+                 min_speech_s: float = 0.5, frame_ms: int = 20, padding_ms: int = 200):
+        """
+        参数:
+            policy: neutral | reject | off
+            threshold_db: 有声帧的 RMS 门限（dBFS）
+            min_speech_s: 最短有效语音时长（秒）
+            frame_ms: 帧长（毫秒）
+            padding_ms: 裁剪时两端保留的静音（毫秒）
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown silence policy: {policy}")
+        self.policy = policy
+        self.threshold_db = threshold_db
+        self.min_speech_s = min_speech_s
+        self.frame = TARGET_SAMPLE_RATE * frame_ms // 1000
+        self.padding = TARGET_SAMPLE_RATE * padding_ms // 1000
+
+        # 统计信息（只在主进程中更新）
+        self.clips = 0
+        self.short_clips = 0
+        self.trimmed_s = 0.0
+        self.skipped_s = 0.0
+
+    @classmethod
+    def from_env(cls) -> "SilenceGate":
+        """从环境变量构造"""
+        return cls(
+            policy=os.getenv("SILENCE_POLICY", "neutral").lower(),
+            threshold_db=float(os.getenv("SILENCE_THRESHOLD_DB", "-45")),
+            min_speech_s=float(os.getenv("SILENCE_MIN_SPEECH_S", "0.5")),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.policy != "off"
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "policy": self.policy,
+            "clips": self.clips,
+            "short_clips": self.short_clips,
+            "trimmed_s": round(self.trimmed_s, 1),
+            "skipped_s": round(self.skipped_s, 1),
+            "saved_s": round(self.trimmed_s + self.skipped_s, 1),
+        }
+
+    def measure(self, audio: np.ndarray) -> Tuple[int, int, float]:
+        """
+        检测有声区间（可在工作进程中调用）
+
+        返回:
+            (起始采样点, 结束采样点, 语音时长秒)；没有有声帧时为 (0, 0, 0.0)
+        """
+        frames = len(audio) // self.frame
+        if frames == 0:
+            return 0, 0, 0.0
+
+        framed = audio[:frames * self.frame].reshape(frames, self.frame)
+        # einsum 逐帧求平方和，不生成与音频等大的临时数组
+        energy = np.einsum("ij,ij->i", framed, framed) / self.frame
+        voiced = np.flatnonzero(energy > 10 ** (self.threshold_db / 10))
+        if voiced.size == 0:
+            return 0, 0, 0.0
+
+        start = max(0, int(voiced[0]) * self.frame - self.padding)
+        end = min(len(audio), (int(voiced[-1]) + 1) * self.frame + self.padding)
+        return start, end, voiced.size * self.frame / TARGET_SAMPLE_RATE
+
+    def is_short(self, speech_s: float) -> bool:
+        return self.enabled and speech_s < self.min_speech_s
+
+    def record(self, total_samples: int, kept_samples: int) -> None:
+        """记录一次检查结果；kept_samples 为 0 表示整段跳过"""
+        self.clips += 1
+        if kept_samples == 0:
+            self.short_clips += 1
+            self.skipped_s += total_samples / TARGET_SAMPLE_RATE
+        else:
+            self.trimmed_s += (total_samples - kept_samples) / TARGET_SAMPLE_RATE
+
+
+def decode_and_measure(audio: AudioSource, gate: SilenceGate) -> Tuple[np.ndarray, Tuple[int, int, float]]:
+    """解码并检测有声区间（可在工作进程中调用，解码与能量统计在同一次工作池调用中完成）"""
+    waveform = default_preprocessor.decode(audio)[0]
+    span = gate.measure(waveform) if gate.enabled else (0, len(waveform), len(waveform) / TARGET_SAMPLE_RATE)
+    return waveform, span
+
+
+# 进程内共享的预处理器（每个工作进程各有一个缓冲池）
+default_preprocessor = AudioPreprocessor(buffers=BufferPool.from_env())
+
+
+def decode_audio(audio: AudioSource) -> np.ndarray:
+    """用共享预处理器解码音频，返回 16kHz 单声道波形（可在工作进程中调用）"""
+    return default_preprocessor.decode(audio)[0]
+
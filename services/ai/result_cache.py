@@ -0,0 +1,177 @@
+# result_cache.py - 分析结果缓存
+"""
+以 audio_hash + 模型版本为键的分析结果缓存
+
+同一段音频的重复上传（Bot 超时重试、转发的语音、测试脚本）不再重复跑模型：
+
+- 内存 LRU（OrderedDict）
+- 可选磁盘层：每个结果一个 JSON 文件，服务重启后仍可命中
+- single-flight：同一个键的并发请求共享同一次推理
+
+缓存的只是结构化分析结果；时间戳 / nonce / 签名仍然每个请求单独生成。
+
+配置（环境变量）:
+    ANALYSIS_CACHE_SIZE   内存缓存条数（默认 1024，0 表示关闭缓存）
+    ANALYSIS_CACHE_DIR    磁盘缓存目录（留空表示只用内存）
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_SAFE_NAME = re.compile(r"[^A-Za-z0-9._-]")
+
+
+class AnalysisCache:
+    """LRU + 磁盘两级结果缓存，带 single-flight 去重"""
+
+    def __init__(self, model_version: str, max_entries: int = 1024, disk_dir: Optional[str] = None):
+        """
+        参数:
+            model_version: 模型/算法版本，参与缓存键，升级模型后旧结果自动失效
+            max_entries: 内存 LRU 条数，0 表示关闭缓存（仍保留 single-flight）
+            disk_dir: 磁盘缓存目录，None 表示不落盘
+        """
+        self.model_version = model_version
+        self.max_entries = max_entries
+        self.disk_dir = None
+        if disk_dir:
+            self.disk_dir = os.path.join(disk_dir, _SAFE_NAME.sub("_", model_version))
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        # 统计信息
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.shared = 0
+
+    @classmethod
+    def from_env(cls, model_version: str) -> "AnalysisCache":
+        """从环境变量构造缓存"""
+        return cls(
+            model_version,
+            max_entries=int(os.getenv("ANALYSIS_CACHE_SIZE", "1024")),
+            disk_dir=os.getenv("ANALYSIS_CACHE_DIR") or None,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "shared_inflight": self.shared,
+        }
+
+    def get(self, audio_hash: str) -> Optional[Dict[str, Any]]:
+        """查询缓存（内存 -> 磁盘），未命中返回 None"""
+        if not self.enabled:
+            return None
+
+        entry = self._entries.get(audio_hash)
+        if entry is not None:
+            self._entries.move_to_end(audio_hash)
+            return entry
+
+        entry = self._read_disk(audio_hash)
+        if entry is not None:
+            self.disk_hits += 1
+            self._remember(audio_hash, entry)
+        return entry
+
+    def put(self, audio_hash: str, result: Dict[str, Any]) -> None:
+        """写入缓存"""
+        if not self.enabled:
+            return
+        self._remember(audio_hash, result)
+        self._write_disk(audio_hash, result)
+
+    async def get_or_compute(
+        self,
+        audio_hash: str,
+        compute: Callable[[], Awaitable[Dict[str, Any]]],
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        获取缓存结果；未命中时执行 compute，同一键的并发调用只执行一次
+
+        参数:
+            audio_hash: 音频哈希
+            compute: 产生分析结果的协程工厂
+
+        返回:
+            (结果, 是否来自缓存或共享的进行中推理)
+        """
+        cached = self.get(audio_hash)
+        if cached is not None:
+            self.hits += 1
+            return cached, True
+
+        inflight = self._inflight.get(audio_hash)
+        if inflight is not None:
+            self.shared += 1
+            return await asyncio.shield(inflight), True
+
+        self.misses += 1
+        # 推理放在独立的 task 中，发起者断开连接不会取消其他等待者共享的推理
+        task = asyncio.ensure_future(self._compute_and_store(audio_hash, compute))
+        self._inflight[audio_hash] = task
+        return await asyncio.shield(task), False
+
+    async def _compute_and_store(
+        self,
+        audio_hash: str,
+        compute: Callable[[], Awaitable[Dict[str, Any]]],
+    ) -> Dict[str, Any]:
+        try:
+            result = await compute()
+            self.put(audio_hash, result)
+            return result
+        finally:
+            self._inflight.pop(audio_hash, None)
+
+    def _remember(self, audio_hash: str, result: Dict[str, Any]) -> None:
+        self._entries[audio_hash] = result
+        self._entries.move_to_end(audio_hash)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_path(self, audio_hash: str) -> str:
+        return os.path.join(self.disk_dir, f"{_SAFE_NAME.sub('_', audio_hash)}.json")
+
+    def _read_disk(self, audio_hash: str) -> Optional[Dict[str, Any]]:
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(audio_hash), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Failed to read cached result {audio_hash[:16]}...: {e}")
+            return None
+
+    def _write_disk(self, audio_hash: str, result: Dict[str, Any]) -> None:
+        if not self.disk_dir:
+            return
+        path = self._disk_path(audio_hash)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Failed to write cached result {audio_hash[:16]}...: {e}")
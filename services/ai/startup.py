@@ -0,0 +1,83 @@
+# startup.py - 后台启动与启动耗时报告
+"""
+服务启动时不再阻塞在模型加载上：uvicorn 立即开始监听（存活探针可用），
+模型导入、加载、预热在后台执行，完成后就绪探针才返回 200。
+
+StartupReport 记录每个步骤（导入 / 模型加载 / 预热 / 组件启动）的状态和耗时，
+通过 /health 与 /health/ready 对外暴露，滚动重启时可以看出时间花在哪里。
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class StartupReport:
+    """启动步骤的状态与耗时"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.steps: Dict[str, Dict[str, Any]] = {}
+        self.finished = False
+        self.ready_after_s: Optional[float] = None
+
+    def _elapsed(self) -> float:
+        return round(time.perf_counter() - self._start, 3)
+
+    async def run(self, name: str, fn: Callable[..., Any], *args) -> Any:
+        """
+        在线程中执行一个启动步骤并记录耗时
+
+        步骤失败只记录错误并返回 None（与服务的降级运行方式一致）
+
+        参数:
+            name: 步骤名（如 "load:sensevoice"）
+            fn: 同步函数
+            *args: 函数参数
+        """
+        step = {"status": "running", "started_at_s": self._elapsed()}
+        self.steps[name] = step
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(None, fn, *args)
+            step["status"] = "ok"
+            return result
+        except Exception as e:
+            step["status"] = "failed"
+            step["error"] = str(e)
+            logger.error(f"❌ Startup step {name} failed: {e}")
+            return None
+        finally:
+            step["seconds"] = round(time.perf_counter() - start, 3)
+
+    def skip(self, name: str, reason: str) -> None:
+        """记录一个被跳过的步骤"""
+        self.steps[name] = {"status": "skipped", "reason": reason}
+
+    def finish(self) -> None:
+        """所有启动步骤结束"""
+        self.finished = True
+        self.ready_after_s = self._elapsed()
+
+    def failed(self) -> list:
+        return [name for name, step in self.steps.items() if step["status"] == "failed"]
+
+    def as_dict(self) -> dict:
+        return {
+            "finished": self.finished,
+            "elapsed_s": self.ready_after_s if self.finished else self._elapsed(),
+            "steps": self.steps,
+        }
+
+    def log_summary(self) -> None:
+        """把各步骤耗时写入日志"""
+        logger.info(f"Startup report (ready after {self.ready_after_s:.2f}s):")
+        for name, step in self.steps.items():
+            seconds = step.get("seconds")
+            timing = f"{seconds:8.2f}s" if seconds is not None else " " * 9
+            logger.info(f"   {name:<28} {step['status']:<8} {timing}")
@@ -0,0 +1,79 @@
+# streaming.py - 长音频流式分析
+"""
+/analyze_stream 的分段与 SSE 输出
+
+/analyze 要等整段音频跑完 VAD + SenseVoice 才返回，几十分钟的录音（分享 Q&A、
+圆桌反馈）首个结果的等待时间随时长线性增长。流式分析:
+
+    1. 解码后按固定窗口（STREAM_VAD_WINDOW_S）逐窗做 VAD，不等整段 VAD 完成
+    2. 每个语音片段单独送入微批调度器推理，完成一段推送一段（SSE）
+    3. 每段附带截至当前的累计情感
+    4. 最后合并所有片段，与 /analyze 相同方式签名后推送最终结果
+
+首个结果的延迟 ≈ 解码 + 一个窗口的 VAD + 一个片段的推理，与音频总时长无关。
+
+跨窗口边界的片段: 窗口末尾被截断的片段丢弃，下一个窗口从该片段起点开始，
+保证每个片段都是完整的。
+
+配置（环境变量）:
+    STREAM_VAD_WINDOW_S   每次 VAD 的窗口长度（默认 60 秒，需大于 VAD 的单段上限 30 秒）
+"""
+
+import json
+import os
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Tuple
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+SAMPLES_PER_MS = SAMPLE_RATE // 1000
+
+STREAM_VAD_WINDOW_S = float(os.getenv("STREAM_VAD_WINDOW_S", "60"))
+
+# 片段结束点距窗口末尾小于该值时视为被窗口截断
+BOUNDARY_MARGIN_MS = 200
+
+Segment = Tuple[int, int]
+
+
+def sse_event(event: str, data: Any) -> str:
+    """格式化一条 Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def iter_segments(
+    audio_array: np.ndarray,
+    detect: Callable[[np.ndarray], Awaitable[List[Segment]]],
+    window_s: float = STREAM_VAD_WINDOW_S,
+) -> AsyncIterator[Segment]:
+    """
+    逐窗口做 VAD，按时间顺序产出整段音频上的语音片段
+
+    参数:
+        audio_array: 16kHz 单声道波形
+        detect: VAD 协程，输入窗口波形，返回窗口内的 [(起始毫秒, 结束毫秒), ...]
+        window_s: 窗口长度（秒）
+
+    产出:
+        (起始毫秒, 结束毫秒)，相对整段音频
+    """
+    total_ms = len(audio_array) // SAMPLES_PER_MS
+    window_ms = int(window_s * 1000)
+    start_ms = 0
+
+    while start_ms < total_ms:
+        end_ms = min(start_ms + window_ms, total_ms)
+        window = audio_array[start_ms * SAMPLES_PER_MS:end_ms * SAMPLES_PER_MS]
+        segments = [(beg + start_ms, end + start_ms) for beg, end in await detect(window)]
+
+        next_start = end_ms
+        if end_ms < total_ms and segments and segments[-1][1] >= end_ms - BOUNDARY_MARGIN_MS:
+            # 最后一个片段可能被窗口截断: 留给下一个窗口重新检测
+            # （片段从窗口起点开始时说明它本身超过窗口长度，只能照常输出，保证向前推进）
+            if segments[-1][0] > start_ms:
+                next_start = segments.pop()[0]
+
+        for segment in segments:
+            yield segment
+        start_ms = next_start
+
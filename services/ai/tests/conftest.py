@@ -0,0 +1,6 @@
+# conftest.py - 测试共用配置
+# 服务模块是 services/ai 下的平铺模块，测试直接按模块名导入
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,58 @@
+# test_attestation.py - Merkle 批量证明: 进行中签名的任务引用与关闭时的排空
+import asyncio
+
+from attestation import MerkleAttestor
+from bls_signer import SignedMessage
+from merkle import verify_proof
+
+
+def _attestor(release=None, window_ms=50):
+    signed_roots = []
+
+    async def sign(message):
+        if release is not None:
+            await release.wait()
+        signed_roots.append(message)
+        return SignedMessage(signature=b"sig", public_key=b"pk")
+
+    async def verify(message, signed):
+        return True
+
+    return MerkleAttestor(sign, verify, window_ms=window_ms), signed_roots
+
+
+def test_running_signatures_are_held_until_done():
+    async def main():
+        release = asyncio.Event()
+        attestor, _ = _attestor(release, window_ms=0)
+        caller = asyncio.ensure_future(attestor.attest(b"result"))
+        await asyncio.sleep(0.01)
+        assert attestor.stats["running"] == 1
+
+        release.set()
+        result = await caller
+        assert result["leaf_count"] == 1 and result["verified"] is True
+        await asyncio.sleep(0)
+        assert attestor.stats["running"] == 0
+
+    asyncio.run(main())
+
+
+def test_drain_signs_pending_and_waits_for_running_batches():
+    async def main():
+        # 窗口很长: 不排空的话消息会一直留在队列里
+        attestor, signed_roots = _attestor(window_ms=60_000)
+        callers = [asyncio.ensure_future(attestor.attest(bytes([i]))) for i in range(3)]
+        await asyncio.sleep(0)
+
+        await attestor.drain()
+        assert len(signed_roots) == 1
+        assert attestor.stats["running"] == 0
+
+        for i, caller in enumerate(callers):
+            result = caller.result()
+            proof = [bytes.fromhex(node) for node in result["proof"]]
+            assert verify_proof(bytes([i]), result["leaf_index"], proof, bytes.fromhex(result["root"]),
+                                result["leaf_count"])
+
+    asyncio.run(main())
@@ -0,0 +1,125 @@
+# test_audio_format.py - 音频头探测与 Ogg 解复用: 截断的流一律抛出 UnsupportedAudio（接口返回 415）
+import io
+import struct
+import wave
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import audio_format
+from audio_format import OPUS_RATE, UnsupportedAudio, decode_ogg_opus, iter_ogg_packets, probe, read_wav_pcm
+from preprocess import AudioPreprocessor
+
+
+def ogg_page(packets, granule, serial=1, sequence=0, continued=False):
+    """构造一个 Ogg 页（CRC 置零）；packets 中最后一个元素为 None 表示数据包在下一页继续"""
+    lacing, body = [], b""
+    for packet in packets:
+        if packet is None:
+            lacing.pop()
+            continue
+        lacing += [255] * (len(packet) // 255) + [len(packet) % 255]
+        body += packet
+    header = struct.pack("<4sBBqIIIB", b"OggS", 0, 1 if continued else 0, granule, serial, sequence, 0, len(lacing))
+    return header + bytes(lacing) + body
+
+
+OPUS_HEAD = b"OpusHead" + struct.pack("<BBHIhB", 1, 1, 312, 16000, 0, 0)
+FIRST_PAGE = ogg_page([OPUS_HEAD], 0)
+STREAM = (FIRST_PAGE
+          + ogg_page([b"OpusTags" + bytes(8)], 0, sequence=1)
+          + ogg_page([b"\x01" * 40, b"\x02" * 30], 3 * OPUS_RATE + 312, sequence=2))
+
+
+class FakeDecoder:
+    """代替 libopus: 每个包解码为 20ms 的静音"""
+
+    def __init__(self, rate, channels):
+        self.rate = rate
+
+    def decode_float(self, packet, max_frame):
+        return bytes(4 * self.rate // 50)
+
+
+@pytest.fixture
+def fake_opuslib(monkeypatch):
+    monkeypatch.setattr(audio_format, "opuslib", SimpleNamespace(Decoder=FakeDecoder, OpusError=Exception))
+
+
+def test_complete_stream_decodes(fake_opuslib):
+    info = probe(memoryview(STREAM))
+    assert [bytes(p) for p in iter_ogg_packets(memoryview(STREAM))][2:] == [b"\x01" * 40, b"\x02" * 30]
+    assert decode_ogg_opus(memoryview(STREAM), info).dtype == np.float32
+
+
+@pytest.mark.parametrize("cut", [len(FIRST_PAGE) + n for n in (1, 4, 14, 20, 26, 27, 30)])
+def test_stream_truncated_in_second_page_is_unsupported(fake_opuslib, cut):
+    """第一页完整、第二页（OpusTags）被截断: probe 能通过，解码时必须是 UnsupportedAudio 而不是 struct.error"""
+    data = memoryview(STREAM[:cut])
+    info = probe(data)
+    with pytest.raises(UnsupportedAudio):
+        decode_ogg_opus(data, info)
+    with pytest.raises(UnsupportedAudio):
+        AudioPreprocessor().decode(STREAM[:cut])
+
+
+def test_every_truncation_raises_only_unsupported_audio():
+    for cut in range(len(STREAM)):
+        try:
+            list(iter_ogg_packets(memoryview(STREAM[:cut])))
+        except UnsupportedAudio:
+            pass
+
+
+def test_ogg_opus_packet_spanning_pages():
+    long_packet = bytes(range(256)) * 2          # 512 字节: 255 + 255 + 2
+    stream = (FIRST_PAGE
+              + ogg_page([b"OpusTags" + bytes(8)], 0, sequence=1)
+              + ogg_page([b"\x01" * 40, long_packet[:255], None], 48000, sequence=2)
+              + ogg_page([long_packet[255:]], 96000, sequence=3, continued=True)
+              + ogg_page([b"\x02" * 30], 3 * OPUS_RATE + 312, sequence=4))
+    info = probe(memoryview(stream))
+    assert info.format == "ogg_opus" and info.channels == 1 and info.pre_skip == 312
+    assert info.duration_s == pytest.approx(3.0)
+    packets = [bytes(p) for p in iter_ogg_packets(memoryview(stream))]
+    assert packets[2:] == [b"\x01" * 40, long_packet, b"\x02" * 30]
+
+
+def test_wav_pcm_is_read_without_copying():
+    """44.1kHz 立体声 int16，2 秒"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(44100)
+        w.writeframes((np.arange(88200 * 2) % 2000 - 1000).astype("<i2").tobytes())
+    data = buffer.getbuffer()
+    info = probe(data)
+    assert (info.format, info.sample_rate, info.channels, info.duration_s) == ("wav", 44100, 2, 2.0)
+    samples, full_scale, rate = read_wav_pcm(data)
+    assert samples.shape == (88200, 2) and samples.dtype == np.int16 and full_scale == 32768 and rate == 44100
+    assert samples[1, 0] == -998 and samples[0, 1] == -999 and not samples.flags.owndata
+    del data, samples
+
+
+def test_flac_streaminfo():
+    """48kHz 单声道 16bit，96000 个采样"""
+    packed = (48000 << 44) | (0 << 41) | (15 << 36) | 96000
+    streaminfo = bytes(10) + packed.to_bytes(8, "big") + bytes(16)
+    info = probe(memoryview(b"fLaC" + b"\x80\x00\x00\x22" + streaminfo))
+    assert (info.format, info.sample_rate, info.channels, info.duration_s) == ("flac", 48000, 1, 2.0)
+
+
+def test_mp4_duration_from_mvhd():
+    """ftyp + moov/mvhd（timescale 1000，5500ms）"""
+    mvhd = struct.pack(">I4sB3xIIII", 28, b"mvhd", 0, 0, 0, 1000, 5500)
+    mp4 = struct.pack(">I4s4sI", 16, b"ftyp", b"M4A ", 0) + struct.pack(">I4s", 8 + len(mvhd), b"moov") + mvhd
+    info = probe(memoryview(mp4))
+    assert info.format == "mp4" and info.duration_s == 5.5
+
+
+@pytest.mark.parametrize("data", [b"OggS", b"RIFF\x00\x00\x00\x00WAVE", b"\x00\x01" * 100, STREAM[:40], b""])
+def test_unrecognised_or_truncated_headers_are_rejected(data):
+    with pytest.raises(UnsupportedAudio):
+        probe(memoryview(data))
@@ -0,0 +1,77 @@
+# test_audio_io.py - 上传大小: 在解析 multipart 表单之前拒绝
+import asyncio
+import hashlib
+
+import pytest
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+import app as app_module
+from audio_io import MAX_UPLOAD_BYTES, MULTIPART_OVERHEAD, UploadSizeLimit, read_upload
+
+LIMIT = 64 * 1024
+
+
+@pytest.fixture
+def upload_app():
+    """最小的上传接口；记录路由是否被调用（表单是否被解析）"""
+    app = FastAPI()
+    app.add_middleware(UploadSizeLimit, max_bytes=LIMIT + MULTIPART_OVERHEAD)
+    app.state.calls = 0
+
+    @app.post("/upload")
+    async def upload(audio: UploadFile = File(...)):
+        app.state.calls += 1
+        uploaded = await read_upload(audio, max_bytes=LIMIT)
+        return {"hash": uploaded.audio_hash, "size": uploaded.size}
+
+    return app
+
+
+def test_small_upload_is_read_and_hashed(upload_app):
+    payload = b"\x01" * 1000
+    response = TestClient(upload_app).post("/upload", files={"audio": ("a.wav", payload)})
+    assert response.status_code == 200
+    assert response.json() == {"hash": hashlib.sha256(payload).hexdigest(), "size": 1000}
+
+
+def test_declared_oversize_body_is_rejected_before_form_parsing(upload_app):
+    payload = b"\x01" * (LIMIT + MULTIPART_OVERHEAD + 1)
+    response = TestClient(upload_app).post("/upload", files={"audio": ("a.wav", payload)})
+    assert response.status_code == 413
+    assert upload_app.state.calls == 0
+
+
+def test_chunked_oversize_body_is_cut_off_while_receiving(upload_app):
+    """没有 Content-Length 的分块上传: 接收量超过上限时中止，不等整个请求体收完（TestClient 会一次性发送，这里直接走 ASGI）"""
+    boundary = "b0undary"
+    chunks = [f'--{boundary}\r\nContent-Disposition: form-data; name="audio"; filename="a.wav"\r\n\r\n'.encode()]
+    chunks += [b"\x01" * 16 * 1024] * 64 + [f"\r\n--{boundary}--\r\n".encode()]
+    pulled = []
+    sent = []
+
+    async def receive():
+        body = chunks[len(pulled)]
+        pulled.append(len(body))
+        return {"type": "http.request", "body": body, "more_body": len(pulled) < len(chunks)}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "http_version": "1.1", "method": "POST", "path": "/upload", "raw_path": b"/upload",
+        "root_path": "", "scheme": "http", "query_string": b"", "client": ("test", 1), "server": ("test", 80),
+        "headers": [(b"content-type", f"multipart/form-data; boundary={boundary}".encode())],
+    }
+    asyncio.run(upload_app(scope, receive, send))
+
+    assert sent[0]["type"] == "http.response.start" and sent[0]["status"] == 413
+    assert upload_app.state.calls == 0
+    assert sum(pulled) <= LIMIT + MULTIPART_OVERHEAD + 16 * 1024 < sum(map(len, chunks))
+
+
+def test_app_rejects_oversize_upload_before_the_endpoint():
+    """/analyze 在不加载模型时会返回 503；超过上限的上传在进入路由之前就是 413"""
+    payload = b"\x00" * (MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD + 1)
+    response = TestClient(app_module.app).post("/analyze", files={"audio": ("a.wav", payload)})
+    assert response.status_code == 413
@@ -0,0 +1,66 @@
+# test_batcher.py - 微批调度: 进行中批次的任务引用与关闭时的排空
+import asyncio
+
+import numpy as np
+import pytest
+
+from batcher import MicroBatcher
+
+
+def test_running_batches_are_held_until_done():
+    async def main():
+        release = asyncio.Event()
+
+        async def run_batch(arrays):
+            await release.wait()
+            return [len(a) for a in arrays]
+
+        batcher = MicroBatcher(run_batch, max_wait_ms=0)
+        caller = asyncio.ensure_future(batcher.submit(np.zeros(10, dtype=np.float32)))
+        await asyncio.sleep(0)
+        assert batcher.stats["running"] == 1
+
+        release.set()
+        assert await caller == 10
+        await asyncio.sleep(0)
+        assert batcher.stats["running"] == 0
+
+    asyncio.run(main())
+
+
+def test_drain_flushes_pending_and_waits_for_running_batches():
+    async def main():
+        finished = []
+
+        async def run_batch(arrays):
+            await asyncio.sleep(0.01)
+            finished.append(len(arrays))
+            return [None] * len(arrays)
+
+        # 等待时间很长: 不排空的话请求会一直留在队列里
+        batcher = MicroBatcher(run_batch, max_wait_ms=60_000)
+        callers = [asyncio.ensure_future(batcher.submit(np.zeros(10, dtype=np.float32))) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert batcher.stats["pending"] == 3
+
+        await batcher.drain()
+        assert finished == [3] and batcher.stats["running"] == 0
+        assert all(caller.done() for caller in callers)
+
+    asyncio.run(main())
+
+
+def test_cancelled_batch_cancels_its_callers():
+    async def main():
+        async def run_batch(arrays):
+            await asyncio.sleep(60)
+
+        batcher = MicroBatcher(run_batch, max_wait_ms=0)
+        caller = asyncio.ensure_future(batcher.submit(np.zeros(10, dtype=np.float32)))
+        await asyncio.sleep(0)
+        for task in list(batcher._tasks):
+            task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+
+    asyncio.run(main())
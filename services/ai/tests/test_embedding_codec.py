@@ -0,0 +1,45 @@
+# test_embedding_codec.py - 声纹向量传输编码的往返误差与非法输入
+import json
+
+import numpy as np
+import pytest
+
+from embedding_codec import ENCODINGS, decode_embedding, encode_embedding
+
+VECTOR = np.random.default_rng(0).standard_normal(192).astype(np.float32) * 0.3
+
+
+def _cosine(a, b):
+    return float(a @ b / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+@pytest.mark.parametrize("encoding,tolerance", [("json", 0.0), ("f32", 0.0), ("f16", 1e-3), ("int8", 1e-2)])
+def test_round_trip_error(encoding, tolerance):
+    wire = json.loads(json.dumps(encode_embedding(VECTOR, encoding)))
+    decoded = decode_embedding(wire)
+    assert decoded.dtype == np.float32 and decoded.shape == (192,)
+    assert float(np.max(np.abs(decoded - VECTOR)) / np.max(np.abs(VECTOR))) <= tolerance
+    assert abs(_cosine(decoded, VECTOR) - 1.0) < 1e-3
+
+
+def test_row_vector_and_encoded_lists():
+    assert decode_embedding(encode_embedding(VECTOR[np.newaxis, :], "f16")).shape == (192,)
+    stacked = decode_embedding([encode_embedding(VECTOR, "int8"), encode_embedding(VECTOR, "f32")])
+    assert stacked.shape == (2, 192)
+
+
+def test_unknown_encoding_is_rejected():
+    assert "json" in ENCODINGS
+    with pytest.raises(ValueError):
+        encode_embedding(VECTOR, "f64")
+
+
+@pytest.mark.parametrize("payload", [
+    {"encoding": "f64", "data": ""},
+    {"encoding": "f16", "dim": 3, "data": "AAAA"},       # 长度与 dim 不符
+    {"encoding": "f32", "data": "not base64!"},
+    {"encoding": "f32"},
+])
+def test_malformed_payload_is_rejected(payload):
+    with pytest.raises(ValueError):
+        decode_embedding(payload)
@@ -0,0 +1,73 @@
+# test_inference_pool.py - thread 模式: torch 线程数上限与 FunASR 模型配置的并发安全
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import torch
+
+import inference_pool as pool_registry
+from backends import TorchSenseVoice, set_funasr_threads
+from inference_pool import InferencePool
+
+
+class FakeAutoModel:
+    """按 FunASR AutoModel 的方式处理配置: 未传入 kwargs 时，调用参数合并进共享的 self.kwargs 再读取"""
+
+    def __init__(self):
+        self.kwargs = {"ncpu": 4, "batch_size": 1}
+        self.vad_kwargs = {"ncpu": 4}
+        self._base_kwargs_map = {"kwargs": dict(self.kwargs), "vad_kwargs": dict(self.vad_kwargs)}
+
+    def inference(self, audio, model=None, kwargs=None, **cfg):
+        kwargs = self.kwargs if kwargs is None else kwargs
+        kwargs.update(cfg)
+        time.sleep(0.005)  # 推理期间其他线程可以改写共享配置
+        return [{"text": str(kwargs["batch_size"])} for _ in range(kwargs["batch_size"])]
+
+
+def test_concurrent_batches_keep_their_own_batch_size():
+    automodel = FakeAutoModel()
+    backend = TorchSenseVoice(automodel)
+    batches = [[None] * size for size in (1, 2, 3, 4, 5, 6, 7, 8) * 4]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(backend.transcribe, batches))
+    for batch, texts in zip(batches, results):
+        assert texts == [str(len(batch))] * len(batch)
+    assert automodel.kwargs == {"ncpu": 4, "batch_size": 1}
+
+
+def test_set_funasr_threads_updates_runtime_and_baseline_configs():
+    automodel = FakeAutoModel()
+    set_funasr_threads(automodel, 2)
+    assert automodel.kwargs["ncpu"] == automodel.vad_kwargs["ncpu"] == 2
+    assert all(config["ncpu"] == 2 for config in automodel._base_kwargs_map.values())
+
+
+class ThreadRecorder:
+    def __init__(self):
+        self.threads = []
+
+    def set_torch_threads(self, threads):
+        self.threads.append(threads)
+
+
+@pytest.fixture
+def restore_torch_threads():
+    threads = torch.get_num_threads()
+    yield
+    torch.set_num_threads(threads)
+
+
+def test_thread_mode_caps_torch_threads(monkeypatch, restore_torch_threads):
+    component = ThreadRecorder()
+    monkeypatch.setitem(pool_registry._components, "recorder", component)
+    monkeypatch.setattr(pool_registry.os, "cpu_count", lambda: 8)
+
+    pool = InferencePool("thread", max_workers=4)
+    assert pool.torch_threads == 2
+    pool.start()
+    try:
+        assert torch.get_num_threads() == 2
+        assert component.threads == [2]
+    finally:
+        pool.shutdown()
@@ -0,0 +1,20 @@
+# test_long_audio_parallel.py - LONG_AUDIO_PARALLEL 的默认值随工作池模式变化
+from types import SimpleNamespace
+
+import pytest
+
+import app as app_module
+
+
+@pytest.mark.parametrize("setting,mode,workers,expected", [
+    (None, "process", 4, True),
+    (None, "thread", 4, False),
+    (True, "thread", 4, True),
+    (False, "process", 4, False),
+    (None, "process", 1, False),
+    (True, "thread", 1, False),
+])
+def test_parallel_default_follows_pool_mode(monkeypatch, setting, mode, workers, expected):
+    monkeypatch.setattr(app_module, "LONG_AUDIO_PARALLEL", setting)
+    monkeypatch.setattr(app_module, "inference_pool", SimpleNamespace(mode=mode, max_workers=workers))
+    assert app_module._use_long_audio_parallel() is expected
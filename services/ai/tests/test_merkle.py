@@ -0,0 +1,31 @@
+# test_merkle.py - 包含证明: 每个叶子都能验证，越界下标（复制出的虚拟叶子）不能
+import pytest
+
+from merkle import MerkleTree, verify_proof
+
+
+@pytest.mark.parametrize("leaf_count", [1, 2, 3, 5, 8, 13])
+def test_every_leaf_verifies(leaf_count):
+    leaves = [bytes([i]) for i in range(leaf_count)]
+    tree = MerkleTree(leaves)
+    for index, leaf in enumerate(leaves):
+        assert verify_proof(leaf, index, tree.proof(index), tree.root, leaf_count)
+        assert not verify_proof(b"other", index, tree.proof(index), tree.root, leaf_count)
+
+
+@pytest.mark.parametrize("leaf_count", [1, 3, 5, 13])
+def test_last_leaf_does_not_verify_at_phantom_index(leaf_count):
+    """奇数层复制最后一个节点: 最后一个叶子的证明在下标 leaf_count 处也能算出同一个根"""
+    leaves = [bytes([i]) for i in range(leaf_count)]
+    tree = MerkleTree(leaves)
+    proof = tree.proof(leaf_count - 1)
+    assert not verify_proof(leaves[-1], leaf_count, proof, tree.root, leaf_count)
+    assert not verify_proof(leaves[-1], -1, proof, tree.root, leaf_count)
+
+
+def test_leaf_count_must_match_proof_depth():
+    leaves = [bytes([i]) for i in range(5)]
+    tree = MerkleTree(leaves)
+    proof = tree.proof(4)
+    assert not verify_proof(leaves[4], 4, proof, tree.root, 16)
+    assert not verify_proof(leaves[4], 4, proof + [tree.root], tree.root, 5)
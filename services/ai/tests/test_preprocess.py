@@ -0,0 +1,81 @@
+# test_preprocess.py - 解码路径: 文件对象输入、16kHz 单次分配、暂存缓冲区复用
+import io
+import tracemalloc
+import wave
+
+import numpy as np
+import pytest
+import torch
+
+from preprocess import TARGET_SAMPLE_RATE, AudioPreprocessor, BufferPool
+
+
+def wav_bytes(sample_rate: int, channels: int, seconds: int) -> bytes:
+    rng = np.random.default_rng(sample_rate + channels)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes((rng.standard_normal(sample_rate * seconds * channels) * 3000).astype("<i2").tobytes())
+    return buffer.getvalue()
+
+
+def reference(payload: bytes, sample_rate: int, channels: int, preprocessor: AudioPreprocessor) -> np.ndarray:
+    """逐步转换的参考实现（astype + 除法 + 混音 + 重采样）"""
+    samples = np.frombuffer(payload, dtype="<i2", offset=44).astype(np.float32) / 32768.0
+    mono = samples.reshape(-1, channels).mean(axis=1).astype(np.float32)
+    if sample_rate == TARGET_SAMPLE_RATE:
+        return mono
+    return preprocessor.resampler(sample_rate)(torch.from_numpy(mono)).numpy()
+
+
+@pytest.fixture
+def preprocessor():
+    return AudioPreprocessor(buffers=BufferPool(64 * 1024 * 1024))
+
+
+@pytest.mark.parametrize("sample_rate,channels", [(16000, 1), (48000, 2)])
+def test_decode_accepts_bytes_bytesio_and_real_files(tmp_path, preprocessor, sample_rate, channels):
+    payload = wav_bytes(sample_rate, channels, 2)
+    path = tmp_path / "clip.wav"
+    path.write_bytes(payload)
+
+    expected = reference(payload, sample_rate, channels, preprocessor)
+    with open(path, "rb") as f:
+        from_file = preprocessor.decode(f)[0]
+    for waveform in (from_file, preprocessor.decode(payload)[0], preprocessor.decode(io.BytesIO(payload))[0]):
+        np.testing.assert_allclose(waveform, expected, atol=1e-5)
+
+
+@pytest.mark.parametrize("channels", [1, 2])
+def test_16khz_decode_allocates_only_the_model_input(preprocessor, channels):
+    """16kHz 路径不经过 torch，tracemalloc 能看到全部分配: 峰值 = 返回的模型输入 + 少量元数据"""
+    payload = io.BytesIO(wav_bytes(16000, channels, 60))
+    preprocessor.decode(payload)
+
+    tracemalloc.start()
+    try:
+        waveform = preprocessor.decode(payload)[0]
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert peak <= waveform.nbytes + 256 * 1024
+
+
+def test_resample_path_reuses_pooled_scratch(preprocessor):
+    """非 16kHz 的混音写入租用的暂存缓冲区，后续请求复用同一个缓冲区（重采样本身由 torch 分配）"""
+    for sample_rate, channels in [(48000, 2), (44100, 2), (48000, 1)]:
+        payload = wav_bytes(sample_rate, channels, 5)
+        waveform = preprocessor.decode(payload)[0]
+        np.testing.assert_allclose(waveform, reference(payload, sample_rate, channels, preprocessor), atol=1e-5)
+
+    stats = preprocessor.buffers.stats
+    assert stats["misses"] == 1 and stats["hits"] == 2 and stats["idle_megabytes"] > 0
+
+
+def test_buffer_pool_drops_buffers_over_budget():
+    pool = BufferPool(max_bytes=1024)
+    with pool.lease(10_000) as scratch:
+        assert scratch.shape == (10_000,) and scratch.dtype == np.float32
+    assert pool.idle_bytes == 0 and pool.misses == 1
@@ -0,0 +1,89 @@
+# test_sensevoice_tags.py - 标签解析: 与旧实现一致、片段与时长加权、整段解析不慢于旧实现
+import re
+import timeit
+from typing import Dict
+
+import pytest
+
+from sensevoice_tags import (
+    EMOTIONS, EVENTS, IGNORED_EVENTS, LANGUAGES, TagTally, parse_tags, summarize_tags, summarize_text,
+)
+
+HAPPY = "<|zh|><|HAPPY|><|Speech|><|withitn|>这次活动很棒！"
+SAD = "<|zh|><|SAD|><|Cry|><|withitn|>可惜。"
+NEUTRAL = "<|en|><|NEUTRAL|><|Applause|><|woitn|>thank you all "
+
+
+def legacy(text: str) -> Dict:
+    """旧实现: 每种标签各扫描一遍整段文本，按出现次数取主导情感"""
+    counts = {e: text.count(f"<|{e}|>") for e in EMOTIONS if f"<|{e}|>" in text}
+    if counts:
+        emotion = max(counts, key=counts.get)
+        intensity = min(0.65 + (counts[emotion] - 1) * 0.15, 0.98)
+        if emotion == "NEUTRAL":
+            intensity = min(intensity, 0.6)
+    else:
+        emotion, intensity = "NEUTRAL", 0.5
+    return {
+        "emotion": emotion,
+        "intensity": intensity,
+        "language": next((lang for lang in LANGUAGES if f"<|{lang}|>" in text), "unknown"),
+        "events": [e for tag, e in EVENTS.items() if f"<|{tag}|>" in text and e not in IGNORED_EVENTS],
+        "text": " ".join(re.sub(r"<\|[^>]+\|>", "", text).split()).strip(),
+    }
+
+
+TRANSCRIPTS = [
+    "", "没有标签的文本", HAPPY, HAPPY + SAD, HAPPY + NEUTRAL + NEUTRAL,
+    "<|zh|><|EMO_UNKNOWN|><|BGM|><|woitn|>",
+    NEUTRAL + "<|zh|><|NEUTRAL|><|Speech|><|woitn|>" + SAD,
+    "a < b " + HAPPY + "x<y |> z",
+]
+
+
+@pytest.mark.parametrize("raw", TRANSCRIPTS)
+def test_matches_legacy_parser(raw):
+    expected = legacy(raw)
+    for got in (summarize_tags(parse_tags(raw)), summarize_text([raw])):
+        for key in ("emotion", "intensity", "events", "text"):
+            assert got[key] == expected[key], (key, got[key], expected[key])
+
+
+@pytest.mark.parametrize("raw", TRANSCRIPTS)
+def test_summarize_text_matches_segment_path(raw):
+    assert summarize_text([raw], [1000]) == summarize_tags(parse_tags(raw, 1000))
+
+
+def test_segments_and_duration_weighting():
+    segments = parse_tags(HAPPY + SAD)
+    assert [(s.language, s.emotion, s.event, s.text) for s in segments] == [
+        ("zh", "HAPPY", "speech", "这次活动很棒！"), ("zh", "SAD", "cry", "可惜。")]
+
+    # 短促的 HAPPY 出现两次，长段 SAD 只出现一次: 按时长加权 SAD 占主导，按次数则是 HAPPY
+    raw_texts, durations = [HAPPY, SAD, HAPPY], [1500, 12000, 1500]
+    summary = summarize_text(raw_texts, durations)
+    assert summary["emotion"] == "SAD" and summary["intensity"] == 0.65
+    assert summary["emotion_distribution"] == {"HAPPY": 0.2, "SAD": 0.8}
+    assert summary == summarize_tags([s for raw, ms in zip(raw_texts, durations) for s in parse_tags(raw, ms)])
+    assert legacy("".join(raw_texts))["emotion"] == "HAPPY"
+
+
+def test_repeated_field_starts_an_empty_segment():
+    segments = parse_tags("<|zh|><|NEUTRAL|><|Speech|><|woitn|>" + SAD)
+    assert [(s.emotion, s.text) for s in segments] == [("NEUTRAL", ""), ("SAD", "可惜。")]
+
+
+def test_incremental_tally_matches_full_parse():
+    parts = [HAPPY, SAD, NEUTRAL] * 20
+    tally = TagTally()
+    for part in parts:
+        tally.add(parse_tags(part, 1000))
+    assert tally.summary() == {k: v for k, v in summarize_text(parts, [1000] * len(parts)).items() if k != "text"}
+
+
+def test_full_transcript_is_no_slower_than_legacy():
+    """600 个 VAD 片段的整段解析（含情感分布）不慢于旧的多遍扫描"""
+    text = "".join([HAPPY, SAD, NEUTRAL] * 200)
+    legacy_time = min(timeit.repeat(lambda: legacy(text), number=20, repeat=7))
+    single_pass = min(timeit.repeat(lambda: summarize_text([text]), number=20, repeat=7))
+    assert single_pass <= legacy_time, f"{single_pass / 20 * 1000:.2f} ms vs legacy {legacy_time / 20 * 1000:.2f} ms"
@@ -0,0 +1,52 @@
+# test_streaming.py - 逐窗口 VAD 与整段 VAD 的片段一致，SSE 格式
+import asyncio
+import json
+from typing import List
+
+import numpy as np
+import pytest
+
+from streaming import SAMPLE_RATE, SAMPLES_PER_MS, Segment, iter_segments, sse_event
+
+
+def energy_segments(audio: np.ndarray) -> List[Segment]:
+    """用能量门限模拟 VAD: 每 10ms 一帧，连续的有声帧组成片段"""
+    frames = len(audio) // (10 * SAMPLES_PER_MS)
+    voiced = np.abs(audio[:frames * 160].reshape(frames, 160)).mean(axis=1) > 0.05
+    segments, beg = [], None
+    for i, flag in enumerate(list(voiced) + [False]):
+        if flag and beg is None:
+            beg = i * 10
+        elif not flag and beg is not None:
+            segments.append((beg, i * 10))
+            beg = None
+    return segments
+
+
+async def detect(window: np.ndarray) -> List[Segment]:
+    return energy_segments(window)
+
+
+@pytest.fixture(scope="module")
+def audio():
+    """150 秒音频，每 7 秒一段 4 秒的 "语音"，部分片段跨越 60 秒窗口边界"""
+    rng = np.random.default_rng(0)
+    audio = (rng.standard_normal(150 * SAMPLE_RATE) * 0.01).astype(np.float32)
+    for start_s in range(1, 146, 7):
+        audio[start_s * SAMPLE_RATE:(start_s + 4) * SAMPLE_RATE] *= 20
+    return audio
+
+
+@pytest.mark.parametrize("window_s", [60, 45, 1000])
+def test_windowed_segments_match_full_clip_vad(audio, window_s):
+    async def collect():
+        return [segment async for segment in iter_segments(audio, detect, window_s)]
+
+    assert asyncio.run(collect()) == energy_segments(audio)
+
+
+def test_sse_event():
+    event = sse_event("segment", {"index": 0, "transcript": "你好"})
+    assert event.startswith("event: segment\ndata: ") and event.endswith("\n\n")
+    assert "你好" in event
+    assert json.loads(event.split("data: ", 1)[1]) == {"index": 0, "transcript": "你好"}
@@ -0,0 +1,27 @@
+# test_verification.py - deferred 模式关闭时审计剩余签名
+import asyncio
+
+from verification import SignatureVerifier
+
+
+def test_stop_drains_past_failing_batches():
+    async def main():
+        calls = []
+
+        async def run(func, batch):
+            calls.append(len(batch))
+            if len(calls) == 1:
+                raise RuntimeError("worker died")
+            return [True] * len(batch)
+
+        verifier = SignatureVerifier(run, mode="deferred", audit_batch=2)
+        for i in range(5):
+            await verifier.check(b"pk", bytes([i]), b"sig")
+
+        # 第一批审计失败不影响其余批次，stop() 也不抛出异常
+        await verifier.stop()
+        assert calls == [2, 2, 1]
+        assert verifier.stats["pending_audit"] == 0
+        assert verifier.audited == 3
+
+    asyncio.run(main())
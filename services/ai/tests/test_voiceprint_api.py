@@ -0,0 +1,133 @@
+# test_voiceprint_api.py - 声纹登记/检索接口与参数校验
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+from voiceprint_index import VoiceprintIndex
+
+# 不进入 lifespan: 这些接口不依赖模型
+client = TestClient(app_module.app)
+
+
+@pytest.fixture
+def index(monkeypatch, tmp_path):
+    """真实的持久化索引（8 维），代替模块级的 voiceprint_index"""
+    index = VoiceprintIndex(dim=8, path=str(tmp_path / "voiceprints"))
+    monkeypatch.setattr(app_module, "voiceprint_index", index)
+    return index
+
+
+@pytest.fixture
+def voices():
+    rng = np.random.default_rng(0)
+    return {f"tg:{i}": rng.standard_normal(8) for i in range(4)}
+
+
+def _enroll(voices):
+    for voice_id, vector in voices.items():
+        response = client.post("/enroll_voiceprint", json={"voice_id": voice_id, "embedding": vector.tolist()})
+        assert response.status_code == 200
+    return response.json()
+
+
+def test_enroll_then_identify_ranks_by_similarity(index, voices):
+    assert _enroll(voices)["index_size"] == 4
+
+    # 与 tg:2 接近、与其它声纹较远的查询
+    query = voices["tg:2"] + 0.1 * np.random.default_rng(1).standard_normal(8)
+    response = client.post("/identify", json={"embedding": query.tolist(), "top_k": 4, "threshold": -1.0})
+    assert response.status_code == 200
+    body = response.json()
+    similarities = [match["similarity"] for match in body["matches"]]
+    assert body["matches"][0]["voice_id"] == "tg:2" and body["matched"] is True
+    assert similarities == sorted(similarities, reverse=True) and len(similarities) == 4
+    assert body["index_size"] == 4
+
+
+def test_identify_threshold_and_exclude(index, voices):
+    _enroll(voices)
+    query = voices["tg:1"].tolist()
+
+    response = client.post("/identify", json={"embedding": query, "threshold": 0.99})
+    assert [match["voice_id"] for match in response.json()["matches"]] == ["tg:1"]
+
+    response = client.post("/identify", json={"embedding": query, "threshold": 0.99, "exclude": "tg:1"})
+    assert response.json()["matches"] == [] and response.json()["matched"] is False
+
+    response = client.post("/identify", json={"embedding": query, "top_k": 1, "threshold": -1.0, "exclude": "tg:1"})
+    [match] = response.json()["matches"]
+    assert match["voice_id"] != "tg:1"
+
+
+def test_enroll_overwrites_and_remove(index, voices):
+    _enroll(voices)
+    response = client.post("/enroll_voiceprint", json={"voice_id": "tg:0", "embedding": voices["tg:3"].tolist()})
+    assert response.json()["index_size"] == 4
+    assert len(index.search(voices["tg:3"], top_k=2, threshold=0.99)) == 2
+
+    response = client.post("/remove_voiceprint", json={"voice_id": "tg:0"})
+    assert response.json() == {"success": True, "removed": True, "index_size": 3}
+    response = client.post("/remove_voiceprint", json={"voice_id": "tg:0"})
+    assert response.json()["removed"] is False
+
+
+def test_enroll_rejects_wrong_dim(index):
+    response = client.post("/enroll_voiceprint", json={"voice_id": "tg:0", "embedding": [0.1] * 3})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("field,value", [
+    ("top_k", "abc"), ("top_k", 2.5), ("top_k", 0), ("top_k", True),
+    ("threshold", "high"), ("threshold", "nan"), ("threshold", [0.5]),
+])
+def test_identify_rejects_malformed_params(index, field, value):
+    response = client.post("/identify", json={"embedding": [0.1] * 8, field: value})
+    assert response.status_code == 400
+    assert field in response.json()["detail"]
+
+
+@pytest.mark.parametrize("value", ["1e400", "Infinity", "-Infinity"])
+def test_identify_rejects_non_finite_top_k(index, value):
+    body = '{"embedding": [%s], "top_k": %s}' % (", ".join(["0.1"] * 8), value)
+    response = client.post("/identify", content=body, headers={"Content-Type": "application/json"})
+    assert response.status_code == 400
+    assert "top_k" in response.json()["detail"]
+
+
+def test_identify_accepts_numeric_strings(index):
+    response = client.post("/identify", json={"embedding": [0.1] * 8, "top_k": "3", "threshold": "0.5"})
+    assert response.status_code == 200
+    assert response.json()["success"] is True
+
+
+class _CosineVerifier:
+    """与 SpeakerVerifier.similarity_matrix 相同的计算（analyzer 依赖 funasr，不在这里导入）"""
+
+    @staticmethod
+    def similarity_matrix(emb1, emb2):
+        a, b = np.atleast_2d(emb1), np.atleast_2d(emb2)
+        a = a / np.linalg.norm(a, axis=1, keepdims=True)
+        b = b / np.linalg.norm(b, axis=1, keepdims=True)
+        return a @ b.T
+
+
+@pytest.fixture
+def verifier(monkeypatch):
+    monkeypatch.setattr(app_module, "speaker_verifier", _CosineVerifier)
+
+
+@pytest.mark.parametrize("field,value", [("top_k", "abc"), ("top_k", 1.5), ("top_k", -1), ("threshold", "x")])
+def test_compare_rejects_malformed_params(verifier, field, value):
+    matrix = np.random.default_rng(0).standard_normal((3, 8)).tolist()
+    response = client.post("/compare_voiceprints", json={"embedding1": matrix, "embedding2": matrix, field: value})
+    assert response.status_code == 400
+    assert field in response.json()["detail"]
+
+
+def test_compare_top_k(verifier):
+    matrix = np.random.default_rng(0).standard_normal((3, 8)).tolist()
+    response = client.post("/compare_voiceprints",
+                           json={"embedding1": matrix, "embedding2": matrix, "top_k": "1", "threshold": 0.9})
+    assert response.status_code == 200
+    assert [[match["index"] for match in row] for row in response.json()["matches"]] == [[0], [1], [2]]
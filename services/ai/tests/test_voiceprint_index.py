@@ -0,0 +1,120 @@
+# test_voiceprint_index.py - top-k 检索、删除、持久化与 pre-fork 多 worker 共享声纹索引
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from voiceprint_index import VoiceprintIndex, normalize
+
+
+@pytest.fixture
+def vectors():
+    rng = np.random.default_rng(0)
+    return {f"user_{i}": rng.standard_normal(8) for i in range(5)}
+
+
+@pytest.fixture
+def index(vectors):
+    # 初始容量 2: 登记过程中会扩容
+    index = VoiceprintIndex(dim=8, capacity=2)
+    for voice_id, vector in vectors.items():
+        index.add(voice_id, vector)
+    return index
+
+
+def test_search_matches_pairwise_cosine(index, vectors):
+    best_id, best_score = index.search(vectors["user_3"], top_k=3)[0]
+    assert best_id == "user_3" and best_score == pytest.approx(1.0, abs=1e-5)
+
+    query = np.random.default_rng(1).standard_normal(8)
+    expected = sorted(vectors, key=lambda voice_id: -float(normalize(vectors[voice_id]) @ normalize(query)))[:3]
+    assert [voice_id for voice_id, _ in index.search(query, top_k=3)] == expected
+
+
+def test_remove_moves_last_row(index, vectors):
+    assert index.remove("user_1") and not index.remove("user_1")
+    assert "user_1" not in [voice_id for voice_id, _ in index.search(vectors["user_1"], top_k=10)]
+    # user_4 被移动到 user_1 原来的行，仍可检索
+    assert index.search(vectors["user_4"], top_k=1)[0][0] == "user_4"
+
+
+def test_save_and_reload(index, vectors, tmp_path):
+    index.remove("user_1")
+    index.path = str(tmp_path / "voiceprints")
+    index.save()
+    reloaded = VoiceprintIndex(dim=8, path=index.path)
+    assert len(reloaded) == 4
+    assert reloaded.search(vectors["user_2"], top_k=1)[0][0] == "user_2"
+    # mmap 打开的索引在扩容后仍可写入
+    reloaded.add("user_9", np.random.default_rng(2).standard_normal(8))
+    assert len(reloaded) == 5
+
+
+def _worker(index, commands, results):
+    """模拟一个 pre-fork worker: 执行 master 发来的 add / search / len 命令"""
+    for command, *args in iter(commands.get, None):
+        if command == "add":
+            index.add(*args)
+            results.put(len(index))
+        elif command == "search":
+            results.put(index.search(args[0], top_k=1))
+        elif command == "len":
+            results.put(len(index))
+        elif command == "save":
+            index.save()
+            results.put(None)
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """在 fork 之前构造索引（与 prefork.serve 相同），返回两个 worker 的命令函数"""
+    context = multiprocessing.get_context("fork")
+    index = VoiceprintIndex(dim=8, path=str(tmp_path / "voiceprints"), shared=True)
+    handles = []
+    for _ in range(2):
+        commands, results = context.Queue(), context.Queue()
+        process = context.Process(target=_worker, args=(index, commands, results), daemon=True)
+        process.start()
+        handles.append((process, commands, results))
+
+    def call(worker, *command):
+        _, commands, results = handles[worker]
+        commands.put(command)
+        return results.get(timeout=10)
+
+    yield call
+    for process, commands, _ in handles:
+        commands.put(None)
+        process.join(timeout=10)
+
+
+def test_enroll_on_one_worker_identify_on_another(workers):
+    rng = np.random.default_rng(0)
+    alice, bob = rng.standard_normal(8), rng.standard_normal(8)
+
+    assert workers(0, "add", "tg:alice", alice) == 1
+    assert workers(1, "add", "tg:bob", bob) == 2
+
+    [(voice_id, score)] = workers(1, "search", alice)
+    assert voice_id == "tg:alice" and score == pytest.approx(1.0, abs=1e-5)
+    [(voice_id, _)] = workers(0, "search", bob)
+    assert voice_id == "tg:bob"
+
+
+def test_shutdown_save_keeps_other_workers_enrollments(workers, tmp_path):
+    rng = np.random.default_rng(1)
+    for i in range(4):
+        workers(i % 2, "add", f"tg:{i}", rng.standard_normal(8))
+
+    # 两个 worker 依次退出，后退出的不能覆盖先前的登记
+    workers(0, "save")
+    workers(1, "save")
+    reloaded = VoiceprintIndex(dim=8, path=str(tmp_path / "voiceprints"))
+    assert len(reloaded) == 4
+
+
+def test_shared_index_requires_path(monkeypatch):
+    monkeypatch.setenv("AI_WORKERS", "2")
+    monkeypatch.delenv("VOICEPRINT_INDEX_PATH", raising=False)
+    with pytest.raises(ValueError, match="VOICEPRINT_INDEX_PATH"):
+        VoiceprintIndex.from_env()
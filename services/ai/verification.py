@@ -0,0 +1,172 @@
+# verification.py - 签名自检策略
+"""
+控制 /analyze 签名后的自检方式
+
+每次签名后都做一次完整的配对验证，开销是签名本身的数倍。这里提供三种策略：
+
+- always:   每个请求都同步验证（原有行为）
+- sampled:  按比例抽样同步验证，未抽中的请求 verified 为 null
+- deferred: 请求不等待验证；后台审计任务定期批量验证最近的签名（BLSSigner.batch_verify），失败时报警
+
+配置（环境变量）:
+    SIGNATURE_VERIFY_MODE         always | sampled | deferred（默认 always）
+    SIGNATURE_VERIFY_SAMPLE_RATE  sampled 模式的抽样比例（默认 0.1）
+    SIGNATURE_AUDIT_INTERVAL_S    deferred 模式的审计间隔（默认 5 秒）
+    SIGNATURE_AUDIT_BATCH         每轮审计最多验证的签名数（默认 64）
+"""
+
+import asyncio
+import logging
+import os
+import random
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Optional, Tuple
+
+from bls_signer import BLSSigner
+
+logger = logging.getLogger(__name__)
+
+# 待审计队列上限，超出后丢弃最旧的记录
+MAX_PENDING_AUDITS = 10000
+
+# run(fn, *args) -> 在工作池中执行阻塞函数
+BlockingRunner = Callable[..., Awaitable[Any]]
+
+
+class SignatureVerifier:
+    """按策略执行签名自检，并负责 deferred 模式的后台审计"""
+
+    MODES = ("always", "sampled", "deferred")
+
+    def __init__(
+        self,
+        run: BlockingRunner,
+        mode: str = "always",
+        sample_rate: float = 0.1,
+        audit_interval_s: float = 5.0,
+        audit_batch: int = 64,
+    ):
+        """
+        参数:
+            run: 在工作池中执行阻塞函数的协程，例如 InferencePool.run
+            mode: always | sampled | deferred
+            sample_rate: sampled 模式的抽样比例
+            audit_interval_s: deferred 模式的审计间隔（秒）
+            audit_batch: 每轮审计最多验证的签名数
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown signature verification mode: {mode}")
+
+        self.run = run
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.audit_interval_s = audit_interval_s
+        self.audit_batch = audit_batch
+
+        self._pending: Deque[Tuple[bytes, bytes, bytes]] = deque(maxlen=MAX_PENDING_AUDITS)
+        self._task: Optional[asyncio.Task] = None
+
+        # 统计信息
+        self.verified = 0
+        self.skipped = 0
+        self.audited = 0
+        self.failures = 0
+
+    @classmethod
+    def from_env(cls, run: BlockingRunner) -> "SignatureVerifier":
+        """从环境变量构造验证器"""
+        return cls(
+            run,
+            mode=os.getenv("SIGNATURE_VERIFY_MODE", "always").lower(),
+            sample_rate=float(os.getenv("SIGNATURE_VERIFY_SAMPLE_RATE", "0.1")),
+            audit_interval_s=float(os.getenv("SIGNATURE_AUDIT_INTERVAL_S", "5")),
+            audit_batch=int(os.getenv("SIGNATURE_AUDIT_BATCH", "64")),
+        )
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "verified": self.verified,
+            "skipped": self.skipped,
+            "audited": self.audited,
+            "pending_audit": len(self._pending),
+            "failures": self.failures,
+        }
+
+    def start(self) -> None:
+        """启动后台审计任务（仅 deferred 模式）"""
+        if self.mode == "deferred" and self._task is None:
+            self._task = asyncio.ensure_future(self._audit_loop())
+
+    async def stop(self) -> None:
+        """停止后台审计，并把剩余的签名审计完"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        while self._pending:
+            try:
+                await self.audit_once()
+            except Exception as e:
+                # 失败的批次已出队，继续审计剩余的签名
+                logger.error(f"Signature audit error: {e}")
+
+    async def check(self, public_key: bytes, message: bytes, signature: bytes) -> Optional[bool]:
+        """
+        按策略检查一条刚生成的签名
+
+        返回:
+            True / False: 已同步验证的结果
+            None: 本次未同步验证（未被抽样，或已交给后台审计）
+        """
+        if self.mode == "deferred":
+            if len(self._pending) == self._pending.maxlen:
+                logger.warning("Signature audit queue full, dropping oldest entry")
+            self._pending.append((public_key, message, signature))
+            return None
+
+        if self.mode == "sampled" and random.random() >= self.sample_rate:
+            self.skipped += 1
+            return None
+
+        is_valid = await self.run(BLSSigner.verify_signature, public_key, message, signature)
+        self.verified += 1
+        if not is_valid:
+            self.failures += 1
+        return is_valid
+
+    async def audit_once(self) -> int:
+        """
+        批量审计一批待验证签名，对无效签名报警
+
+        返回:
+            本轮审计的签名数
+        """
+        batch = []
+        while self._pending and len(batch) < self.audit_batch:
+            batch.append(self._pending.popleft())
+        if not batch:
+            return 0
+
+        results = await self.run(BLSSigner.batch_verify, batch)
+        for (public_key, message, _), is_valid in zip(batch, results):
+            if not is_valid:
+                self.failures += 1
+                logger.error(
+                    f"❌ Signature audit FAILED for message {message.hex()[:16]}... "
+                    f"(public key {public_key.hex()[:16]}...)"
+                )
+
+        self.audited += len(batch)
+        return len(batch)
+
+    async def _audit_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.audit_interval_s)
+            try:
+                while await self.audit_once() == self.audit_batch:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Signature audit error: {e}")
@@ -0,0 +1,286 @@
+# voiceprint_index.py - 声纹 1:N 检索索引
+"""
+已登记声纹的内存索引，用于识别同一个人用多个 Telegram 账号提交反馈
+
+- 所有向量 L2 归一化后按行存放在一个连续的 float32 矩阵中，
+  余弦相似度 = 一次矩阵向量乘法，top-k 用 argpartition 选出后只对 k 个结果排序
+- 新增: 写入末尾（容量不足时按倍数扩容）；删除: 用最后一行覆盖被删除行（O(1)）
+- 持久化: 矩阵保存为 .npy 文件，启动时以 copy-on-write 方式 mmap 打开，
+  百万级索引无需一次性读入内存；id 列表保存在同名 .ids.json 中
+- 多进程共享（pre-fork 多 worker）: 持久化文件是唯一的数据源，每次操作在 .lock 文件上加 flock，
+  .lock 中记录写入代数；其它 worker 写入后代数变化，下一次操作前重新 mmap 打开。
+  登记/删除在排它锁内立即落盘，关闭时不再整体保存（避免最后退出的 worker 覆盖其它 worker 的登记）
+
+配置（环境变量）:
+    VOICEPRINT_INDEX_PATH   索引文件路径前缀（默认不持久化；AI_WORKERS > 1 时必须设置）
+    VOICEPRINT_DIM          声纹维度（默认 192，CAM++ 输出）
+"""
+
+import fcntl
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIM = 192
+
+
+def normalize(embedding: Sequence[float], dim: Optional[int] = None) -> np.ndarray:
+    """
+    把声纹转为 L2 归一化的一维 float32 向量
+
+    参数:
+        embedding: 列表 / numpy 数组 / (1, D) 形状的张量
+        dim: 期望的维度，不匹配时抛出 ValueError
+    """
+    vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+    if dim is not None and vector.shape[0] != dim:
+        raise ValueError(f"Expected {dim}-dim embedding, got {vector.shape[0]}")
+    norm = float(np.linalg.norm(vector))
+    if norm == 0.0 or not np.isfinite(norm):
+        raise ValueError("Embedding has zero or non-finite norm")
+    return vector / norm
+
+
+class VoiceprintIndex:
+    """归一化 float32 矩阵上的暴力 top-k 余弦检索"""
+
+    def __init__(self, dim: int = DEFAULT_DIM, path: Optional[str] = None, capacity: int = 1024,
+                 shared: bool = False):
+        """
+        参数:
+            dim: 声纹维度
+            path: 持久化文件路径前缀（None 表示只在内存中）
+            capacity: 初始行容量
+            shared: 多个进程共享同一份持久化文件（需要 path）
+        """
+        if shared and not path:
+            raise ValueError("A shared voiceprint index requires a persistence path")
+        self.dim = dim
+        self.path = path
+        self.shared = shared
+        self._matrix = np.empty((capacity, dim), dtype=np.float32)
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+
+        if path and os.path.exists(self._matrix_path):
+            with self._file_lock(exclusive=False):
+                if not self._ids:
+                    self.load()
+
+    @classmethod
+    def from_env(cls) -> "VoiceprintIndex":
+        """
+        从环境变量构造索引
+
+        pre-fork 多 worker（AI_WORKERS > 1）时索引在 worker 之间共享，必须设置 VOICEPRINT_INDEX_PATH，
+        否则每个 worker 各有一份内存索引，登记互不可见，启动时直接报错
+        """
+        path = os.getenv("VOICEPRINT_INDEX_PATH") or None
+        shared = int(os.getenv("AI_WORKERS", "1")) > 1
+        if shared and not path:
+            raise ValueError("AI_WORKERS > 1 requires VOICEPRINT_INDEX_PATH so workers share one voiceprint index")
+        return cls(dim=int(os.getenv("VOICEPRINT_DIM", str(DEFAULT_DIM))), path=path, shared=shared)
+
+    @property
+    def _matrix_path(self) -> str:
+        return f"{self.path}.npy"
+
+    @property
+    def _ids_path(self) -> str:
+        return f"{self.path}.ids.json"
+
+    @property
+    def _lock_path(self) -> str:
+        return f"{self.path}.lock"
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool) -> Iterator[None]:
+        """
+        共享模式下在 .lock 文件上加 flock，并在其它进程写入后重新加载
+
+        每次重新打开锁文件: fork 继承的文件描述符共享同一把 flock，不能跨进程复用
+        """
+        if not self.shared:
+            yield
+            return
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd = os.open(self._lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            generation = int(os.pread(fd, 32, 0).strip() or b"0")
+            if generation != self._generation:
+                self.load()
+                self._generation = generation
+            yield
+            if exclusive:
+                # 修改立即落盘，代数 +1 通知其它进程
+                self._write()
+                self._generation += 1
+                os.ftruncate(fd, 0)
+                os.pwrite(fd, str(self._generation).encode(), 0)
+        finally:
+            os.close(fd)
+
+    def __len__(self) -> int:
+        with self._file_lock(exclusive=False):
+            return len(self._ids)
+
+    def __contains__(self, voice_id: str) -> bool:
+        with self._file_lock(exclusive=False):
+            return voice_id in self._rows
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "size": len(self._ids),
+            "dim": self.dim,
+            "megabytes": round(len(self._ids) * self.dim * 4 / (1024 * 1024), 2),
+            "persistent": self.path is not None,
+            "shared": self.shared,
+        }
+
+    def add(self, voice_id: str, embedding: Sequence[float]) -> None:
+        """登记（或覆盖）一个声纹"""
+        vector = normalize(embedding, self.dim)
+        with self._file_lock(exclusive=True), self._lock:
+            row = self._rows.get(voice_id)
+            if row is None:
+                row = len(self._ids)
+                if row == self._matrix.shape[0]:
+                    self._grow(max(1024, row * 2))
+                self._ids.append(voice_id)
+                self._rows[voice_id] = row
+            self._matrix[row] = vector
+
+    def add_many(self, voice_ids: Sequence[str], embeddings: np.ndarray) -> None:
+        """批量登记（不检查重复 id，用于导入和基准测试）"""
+        matrix = np.asarray(embeddings, dtype=np.float32).reshape(len(voice_ids), self.dim)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        if not np.all(norms > 0):
+            raise ValueError("Embeddings must have non-zero norm")
+        with self._file_lock(exclusive=True), self._lock:
+            start = len(self._ids)
+            end = start + len(voice_ids)
+            if end > self._matrix.shape[0]:
+                self._grow(max(end, start * 2))
+            np.divide(matrix, norms, out=self._matrix[start:end])
+            for offset, voice_id in enumerate(voice_ids):
+                self._rows[voice_id] = start + offset
+            self._ids.extend(voice_ids)
+
+    def remove(self, voice_id: str) -> bool:
+        """删除一个声纹，返回是否存在"""
+        with self._file_lock(exclusive=True), self._lock:
+            row = self._rows.pop(voice_id, None)
+            if row is None:
+                return False
+            last = len(self._ids) - 1
+            if row != last:
+                # 用最后一行填补空位
+                moved_id = self._ids[last]
+                self._matrix[row] = self._matrix[last]
+                self._ids[row] = moved_id
+                self._rows[moved_id] = row
+            self._ids.pop()
+            return True
+
+    def search(
+        self,
+        embedding: Sequence[float],
+        top_k: int = 5,
+        threshold: Optional[float] = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        检索与给定声纹最相似的已登记声纹
+
+        参数:
+            embedding: 查询声纹
+            top_k: 返回的最大结果数
+            threshold: 只返回相似度不低于该值的结果
+
+        返回:
+            按相似度降序的 [(voice_id, similarity), ...]
+        """
+        query = normalize(embedding, self.dim)
+        with self._file_lock(exclusive=False), self._lock:
+            count = len(self._ids)
+            if count == 0 or top_k <= 0:
+                return []
+            scores = self._matrix[:count] @ query
+
+            k = min(top_k, count)
+            if k < count:
+                candidates = np.argpartition(scores, count - k)[count - k:]
+            else:
+                candidates = np.arange(count)
+            candidates = candidates[np.argsort(scores[candidates])[::-1]]
+            results = [(self._ids[i], float(scores[i])) for i in candidates]
+
+        if threshold is not None:
+            results = [(voice_id, score) for voice_id, score in results if score >= threshold]
+        return results
+
+    def _grow(self, capacity: int) -> None:
+        """扩容（复制到新的内存矩阵；mmap 打开的索引在第一次扩容后脱离文件）"""
+        matrix = np.empty((capacity, self.dim), dtype=np.float32)
+        count = len(self._ids)
+        matrix[:count] = self._matrix[:count]
+        self._matrix = matrix
+
+    def save(self) -> None:
+        """
+        写入持久化文件（先写临时文件再原子替换）
+
+        共享模式下每次修改已在文件锁内落盘，这里是空操作
+        """
+        if self.path and not self.shared:
+            self._write()
+
+    def _write(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._lock:
+            count = len(self._ids)
+            matrix_tmp = f"{self._matrix_path}.tmp"
+            ids_tmp = f"{self._ids_path}.tmp"
+
+            stored = np.lib.format.open_memmap(matrix_tmp, mode="w+", dtype=np.float32, shape=(count, self.dim))
+            stored[:] = self._matrix[:count]
+            stored.flush()
+            del stored
+            with open(ids_tmp, "w", encoding="utf-8") as f:
+                json.dump(self._ids, f)
+
+            os.replace(matrix_tmp, self._matrix_path)
+            os.replace(ids_tmp, self._ids_path)
+        logger.info(f"Saved voiceprint index ({count} entries) to {self._matrix_path}")
+
+    def load(self) -> None:
+        """以 copy-on-write mmap 方式打开持久化文件"""
+        matrix = np.load(self._matrix_path, mmap_mode="c")
+        with open(self._ids_path, encoding="utf-8") as f:
+            ids = json.load(f)
+
+        if matrix.ndim != 2 or matrix.shape[1] != self.dim or matrix.shape[0] != len(ids):
+            raise ValueError(f"Voiceprint index {self._matrix_path} does not match its ids or dim {self.dim}")
+
+        with self._lock:
+            self._matrix = matrix
+            self._ids = ids
+            self._rows = {voice_id: row for row, voice_id in enumerate(ids)}
+        logger.info(f"Loaded voiceprint index ({len(ids)} entries) from {self._matrix_path}")
+
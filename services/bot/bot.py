@@ -32,8 +32,10 @@ DB_PASS = os.getenv("POSTGRES_PASSWORD", "")
 DB_NAME = os.getenv("POSTGRES_DB", "echorank_crawler")
 
 # Voiceprint Test State (In-memory for demo)
-# user_id -> first_embedding
+# user_id -> first_embedding (encoded payload as returned by /voiceprint)
 voice_test_state = {}
+# Embedding wire format requested from the AI service: json | f32 | f16 | int8
+VOICEPRINT_ENCODING = os.getenv("VOICEPRINT_ENCODING", "f16")
 
 # Logging Setup
 logging.basicConfig(
@@ -781,7 +783,11 @@ async def handle_voice_test(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         async with httpx.AsyncClient(timeout=60.0) as client:
             with open(file_path, "rb") as f:
-                 resp = await client.post("http://127.0.0.1:8001/voiceprint", files={"audio": f})
+                 resp = await client.post(
+                     "http://127.0.0.1:8001/voiceprint",
+                     params={"encoding": VOICEPRINT_ENCODING},
+                     files={"audio": f}
+                 )
             
             if resp.status_code != 200:
                 raise Exception(f"AI Service Error: {resp.text}")